@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'OnlineShop.settings')
+# Katalog a kosik asynchronnimi pohledy (viewer.async_views)
+os.environ.setdefault('SHOP_ROOT_URLCONF', 'OnlineShop.asgi_urls')
 
 application = get_asgi_application()
@@ -0,0 +1,18 @@
+"""
+URL konfigurace pro beh pod ASGI (OnlineShop.asgi) - katalog televizi a kosik obsluhuji asynchronni
+pohledy z viewer.async_views (stejne adresy i nazvy), vse ostatni je shodne s OnlineShop.urls.
+"""
+from django.urls import path
+
+from OnlineShop import urls
+from viewer.async_views import AsyncAddToCartView, AsyncCartView, AsyncTVDetailView, AsyncTVListView
+
+# Drive nez synchronni vzory se stejnou adresou - vyhrava prvni shoda
+urlpatterns = [
+    path('tv/list/', AsyncTVListView.as_view(), name='tv_list'),
+    path('tv/<int:pk>', AsyncTVDetailView.as_view(), name='tv_detail'),
+    path('cart/add/<int:product_id>/', AsyncAddToCartView.as_view(), name='add_to_cart'),
+    path('cart/add/mobile/<int:product_id>/', AsyncAddToCartView.as_view(product_type='mobile_phone'),
+         name='add_mobile_to_cart'),
+    path('cart/', AsyncCartView.as_view(), name='view_cart'),
+] + urls.urlpatterns
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,7 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'viewer.instrumentation.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'viewer.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -52,11 +55,13 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'OnlineShop.urls'
+# Pod ASGI se nastavi OnlineShop.asgi_urls s asynchronnimi pohledy (viz OnlineShop/asgi.py)
+ROOT_URLCONF = os.environ.get('SHOP_ROOT_URLCONF', 'OnlineShop.urls')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates s merenim casu vykresleni (viewer.instrumentation)
+        'BACKEND': 'viewer.instrumentation.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -65,6 +70,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'viewer.context_processors.shop_roles',
+                'viewer.context_processors.category_navigation',
             ],
         },
     },
@@ -76,12 +83,98 @@ WSGI_APPLICATION = 'OnlineShop.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Profil databaze z promennych prostredi. Vychozi je SQLite v souboru db.sqlite3, SHOP_DB_ENGINE=postgresql
+# prepne na PostgreSQL (potrebuje balicek psycopg2). Spojeni se drzi mezi requesty (SHOP_DB_CONN_MAX_AGE
+# sekund, 0 = nove spojeni pro kazdy request) a pred pouzitim se overi (CONN_HEALTH_CHECKS).
+SHOP_DB_ENGINE = os.environ.get('SHOP_DB_ENGINE', 'sqlite')
+SHOP_DB_CONN_MAX_AGE = int(os.environ.get('SHOP_DB_CONN_MAX_AGE', 600))
+
+if SHOP_DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('SHOP_DB_NAME', 'onlineshop'),
+            'USER': os.environ.get('SHOP_DB_USER', ''),
+            'PASSWORD': os.environ.get('SHOP_DB_PASSWORD', ''),
+            'HOST': os.environ.get('SHOP_DB_HOST', ''),
+            'PORT': os.environ.get('SHOP_DB_PORT', ''),
+            'CONN_MAX_AGE': SHOP_DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # Pool spojeni pred databazi (PgBouncer v rezimu transaction) - serverove kurzory
+            # z .iterator() by mezi transakcemi nepresly, SHOP_DB_POOLER=1 je vypne
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('SHOP_DB_POOLER') == '1',
+            'OPTIONS': {'connect_timeout': int(os.environ.get('SHOP_DB_CONNECT_TIMEOUT', 5))},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SHOP_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': SHOP_DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # Jak dlouho ceka zapis na zamek databaze (busy timeout), nez skonci "database is locked"
+            'OPTIONS': {'timeout': int(os.environ.get('SHOP_SQLITE_TIMEOUT', 20))},
+        }
+    }
+
+if SHOP_DB_ENGINE != 'postgresql':
+    # Testy nad databazi v souboru - soubezne testy skladu a fronty uloh (vlakna a procesy) in-memory SQLite
+    # nepusti. SHOP_DB_TEST_NAME zmeni umisteni souboru.
+    DATABASES['default']['TEST'] = {'NAME': os.environ.get(
+        'SHOP_DB_TEST_NAME', os.path.join(tempfile.gettempdir(), 'online-shop-test.sqlite3'))}
+
+# Repliky pro cteni katalogu a historie objednavek (viewer.routers). SHOP_DB_REPLICAS je carkou oddeleny
+# seznam souboru SQLite (lokalne je plni sync_sqlite_replicas), resp. hostitelu PostgreSQL - aliasy
+# replica1, replica2, ... Klient po svem zapisu cte SHOP_REPLICA_PIN_SECONDS sekund z primarni databaze,
+# zpozdeni repliky musi byt kratsi. V testech je replika zrcadlem 'default'.
+SHOP_DB_REPLICAS = []
+for index, replica in enumerate(filter(None, os.environ.get('SHOP_DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST' if SHOP_DB_ENGINE == 'postgresql' else 'NAME': replica.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    SHOP_DB_REPLICAS.append(alias)
+SHOP_REPLICA_PIN_SECONDS = int(os.environ.get('SHOP_REPLICA_PIN_SECONDS', 15))
+DATABASE_ROUTERS = ['viewer.routers.ReplicaRouter']
+
+# PRAGMA pro kazde nove spojeni SQLite (viewer.signals.configure_sqlite). WAL: cteni neblokuji zapis
+# a zapis necte; synchronous=NORMAL je s WAL bezpecne (po padu OS se ztrati nanejvys posledni transakce);
+# mmap a vetsi cache stranek zrychli cteni. SHOP_SQLITE_TUNING=0 vrati vychozi nastaveni SQLite.
+if os.environ.get('SHOP_SQLITE_TUNING', '1') == '1':
+    SHOP_SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': int(os.environ.get('SHOP_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': -int(os.environ.get('SHOP_SQLITE_CACHE_KB', 32 * 1024)),
+        'temp_store': 'MEMORY',
+    }
+    if not os.environ.get('SHOP_DB_NAME'):
+        # Databaze dodavana v repozitari (db.sqlite3) zustava v rezimu DELETE - WAL se zapise do hlavicky
+        # souboru a vedle nej vznikaji soubory -wal a -shm. WAL pro vlastni databazi pres SHOP_DB_NAME.
+        del SHOP_SQLITE_PRAGMAS['journal_mode']
+else:
+    SHOP_SQLITE_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+
+# Cache (stránky katalogu, facety, strom kategorií, role) - bez externích služeb: lokální paměť procesu, nebo soubory
+# sdílené mezi procesy (SHOP_CACHE_BACKEND=file)
+if os.environ.get('SHOP_CACHE_BACKEND') == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('SHOP_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'online-shop',
+        }
     }
-}
 
 
 # Password validation
@@ -127,4 +220,49 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Produktove feedy pro srovnavace cen (viewer.feeds) - adresa webu pro odkazy a stari hotoveho souboru v sekundach
+SHOP_FEED_BASE_URL = os.environ.get('SHOP_FEED_BASE_URL', '')
+SHOP_FEED_MAX_AGE = int(os.environ.get('SHOP_FEED_MAX_AGE', 3 * 60 * 60))
+# Rezervace kusu v kosiku (viewer.stock) - po teto dobe v sekundach je vrati expire_reservations
+SHOP_RESERVATION_TTL = int(os.environ.get('SHOP_RESERVATION_TTL', 15 * 60))
+# Mereni vykonu po pohledech (viewer.instrumentation): podil podrobne merenych requestu (0-1), hranice
+# pomaleho requestu v ms a kolikrat opakovany dotaz se hlasi jako N+1
+SHOP_PERF_SAMPLE_RATE = float(os.environ.get('SHOP_PERF_SAMPLE_RATE', 0.05))
+SHOP_PERF_SLOW_MS = int(os.environ.get('SHOP_PERF_SLOW_MS', 1000))
+SHOP_PERF_REPEATED_QUERIES = int(os.environ.get('SHOP_PERF_REPEATED_QUERIES', 5))
+# /metrics jen s tokenem (Authorization: Bearer), pro obsluhu nebo pri DEBUG - verejne jen s SHOP_METRICS_PUBLIC=1
+SHOP_METRICS_TOKEN = os.environ.get('SHOP_METRICS_TOKEN', '')
+SHOP_METRICS_PUBLIC = os.environ.get('SHOP_METRICS_PUBLIC') == '1'
+# Fronta uloh na pozadi (viewer.jobs, prikaz run_workers): pocet pokusu, odklad prvniho opakovani v sekundach
+# (kazdy dalsi dvojnasobny, nanejvys SHOP_JOBS_MAX_RETRY_DELAY), po kolika sekundach se uloha workeru, ktery
+# neodpovida, vrati do fronty a kolik dni se drzi hotove ulohy
+SHOP_JOBS_MAX_ATTEMPTS = int(os.environ.get('SHOP_JOBS_MAX_ATTEMPTS', 5))
+SHOP_JOBS_RETRY_DELAY = int(os.environ.get('SHOP_JOBS_RETRY_DELAY', 30))
+SHOP_JOBS_MAX_RETRY_DELAY = int(os.environ.get('SHOP_JOBS_MAX_RETRY_DELAY', 60 * 60))
+SHOP_JOBS_LOCK_TIMEOUT = int(os.environ.get('SHOP_JOBS_LOCK_TIMEOUT', 10 * 60))
+SHOP_JOBS_KEEP_DAYS = int(os.environ.get('SHOP_JOBS_KEEP_DAYS', 7))
+
+# Potvrzeni objednavek posila worker (viewer.tasks) - bez SMTP serveru se e-maily vypisuji na konzoli
+EMAIL_BACKEND = os.environ.get('SHOP_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('SHOP_EMAIL_HOST', 'localhost')
+DEFAULT_FROM_EMAIL = os.environ.get('SHOP_EMAIL_FROM', 'obchod@localhost')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'viewer.instrumentation.JSONFormatter'},
+    },
+    'handlers': {
+        'performance': {'class': 'logging.StreamHandler', 'formatter': 'json'},
+    },
+    'loggers': {
+        # Jeden radek JSON na mereny request (INFO), pomale requesty a N+1 jako WARNING
+        'viewer.instrumentation': {
+            'handlers': ['performance'],
+            'level': os.environ.get('SHOP_PERF_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
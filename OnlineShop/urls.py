@@ -13,24 +13,28 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 
 from viewer.views import (BaseView, TVDetailView, TVListView, TVCreateView, TVUpdateView, TVDeleteView,
                           FilteredTelevisionListView, ProfileView, SubmittableLoginView, CustomLogoutView,
                           SubmittablePasswordChangeView, MobileListView, CreateOrderView, OrderSuccessView,
                           OrderListView, OrderDetailView, AddToCartView, RemoveFromCartView, CartView, CheckoutView,
-                          edit_profile, signup, BrandCreateView)
+                          edit_profile, signup, BrandCreateView, SearchView, ProductFeedView, CategoryProductsView,
+                          serve_media, MetricsView)
+from viewer.api import MobilePhoneAPIView, TelevisionAPIView
 from viewer.models import (Profile, Television, Brand, TVOperationSystem, TVDisplayResolution, TVDisplayTechnology,
                            MobilePhone, MobileDisplay, MobileConstruction, MobileUserMemory, MobileRAM,
-                           MobileOperationSystem, Order
+                           MobileOperationSystem, OrderItem, Job
                            )
 
 from django.conf import settings
-from django.conf.urls.static import static
 
 admin.site.register([Television, Brand, TVDisplayResolution, TVDisplayTechnology, TVOperationSystem, MobilePhone,
-                     MobileDisplay, MobileConstruction, MobileUserMemory, MobileRAM, MobileOperationSystem, Profile, Order])
+                     MobileDisplay, MobileConstruction, MobileUserMemory, MobileRAM, MobileOperationSystem, Profile,
+                     OrderItem, Job])
 
 urlpatterns = [
     path('', BaseView.as_view(), name='home'),
@@ -48,24 +52,35 @@ urlpatterns = [
     path('tv/create/', TVCreateView.as_view(), name='tv_create'),
     path('tv/update/<pk>', TVUpdateView.as_view(), name='tv_update'),
     path('tv/delete/<pk>', TVDeleteView.as_view(), name='tv_delete'),
-    path('tv/<pk>', TVDetailView.as_view(), name='tv_detail'),
+    path('tv/<int:pk>', TVDetailView.as_view(), name='tv_detail'),
     path('tv/detail/<str:smart_tv>/', FilteredTelevisionListView.as_view(), name='filtered_smart_tv'),
     path('tv/technology/<str:technology>/', FilteredTelevisionListView.as_view(), name='filtered_tv_by_technology'),
     path('tv/resolution/<str:resolution>/', FilteredTelevisionListView.as_view(), name='filtered_tv_by_resolution'),
     path('tv/oper-system/<str:op_system>/', FilteredTelevisionListView.as_view(), name='filtered_tv_by_op_system'),
     path('tv/brand/<str:brand>/technology/<str:technology>/', FilteredTelevisionListView.as_view(),
          name='filtered_tv_by_brand_and_technology'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('category/<int:pk>/', CategoryProductsView.as_view(), name='category_products'),
     # ----------------Mobil sekce----------------
     path('mobile', MobileListView.as_view(), name='mobile_list'),
     # ----------------Cart & Order sekce----------------
-    path('cart/add/<int:television_id>/', AddToCartView.as_view(), name='add_to_cart'),
-    path('cart/remove/<int:television_id>/', RemoveFromCartView.as_view(), name='remove_from_cart'),
+    path('cart/add/<int:product_id>/', AddToCartView.as_view(), name='add_to_cart'),
+    path('cart/remove/<int:product_id>/', RemoveFromCartView.as_view(), name='remove_from_cart'),
+    path('cart/add/mobile/<int:product_id>/', AddToCartView.as_view(product_type='mobile_phone'),
+         name='add_mobile_to_cart'),
+    path('cart/remove/mobile/<int:product_id>/', RemoveFromCartView.as_view(product_type='mobile_phone'),
+         name='remove_mobile_from_cart'),
     path('cart/', CartView.as_view(), name='view_cart'),
     path('checkout/', CheckoutView.as_view(), name='checkout'),
     path('order/create/<int:television_id>/', CreateOrderView.as_view(), name='create_order'),
     path('order/success/<uuid:order_id>/', OrderSuccessView.as_view(), name='order_success'),
     path('orders/', OrderListView.as_view(), name='order_list'),
     path('order/<uuid:order_id>/', OrderDetailView.as_view(), name='order_detail'),
+    # ----------------API----------------
+    path('api/televisions/', TelevisionAPIView.as_view(), name='api_televisions'),
+    path('api/mobiles/', MobilePhoneAPIView.as_view(), name='api_mobiles'),
+    path('feeds/products.<str:feed_format>', ProductFeedView.as_view(), name='product_feed'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 
 
 
@@ -73,4 +88,7 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media,
+                {'document_root': settings.MEDIA_ROOT}),
+    ]
@@ -1,3 +1,74 @@
-from django.contrib import admin
+import time
 
-# Register your models here.
+from django.contrib import admin, messages
+
+from viewer.models import Order, OrderItem, OrderStatusChange
+from viewer.order_status import STATUSES, transition_orders
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    fields = ['product_name', 'quantity', 'unit_price']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+class OrderStatusChangeInline(admin.TabularInline):
+    model = OrderStatusChange
+    fields = ['changed_at', 'from_status', 'to_status', 'changed_by', 'source']
+    readonly_fields = fields
+    ordering = ['changed_at', 'pk']
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+def transition_action(target):
+    """Akce administrace 'Změnit stav na ...' - hromadny prechod oznacenych objednavek."""
+
+    def action(modeladmin, request, queryset):
+        started = time.perf_counter()
+        changed, skipped = transition_orders(queryset, target, user=request.user, source='admin')
+        elapsed = time.perf_counter() - started
+        modeladmin.message_user(request, f'{changed} objednávek převedeno do stavu {STATUSES[target]} '
+                                         f'za {elapsed:.2f} s.')
+        if skipped:
+            modeladmin.message_user(request, f'{skipped} objednávek přeskočeno - z jejich stavu přechod '
+                                             f'do {STATUSES[target]} není povolený.', messages.WARNING)
+
+    action.__name__ = f'transition_to_{target}'
+    return admin.action(description=f'Změnit stav na {STATUSES[target]}',
+                        permissions=['change'])(action)
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ['order_id', 'user', 'status', 'total', 'order_date', 'updated_at']
+    list_filter = ['status', 'order_date']
+    search_fields = ['=order_id', 'user__username', 'last_name']
+    list_select_related = ['user']
+    # Stav se meni jen prechody (akce nad seznamem), aby vznikl zaznam v historii
+    readonly_fields = ['order_id', 'status', 'total', 'order_date', 'updated_at']
+    exclude = ['television', 'mobile_phone']
+    inlines = [OrderItemInline, OrderStatusChangeInline]
+    actions = [transition_action(status) for status in STATUSES if status != 'submitted']
+
+
+@admin.register(OrderStatusChange)
+class OrderStatusChangeAdmin(admin.ModelAdmin):
+    list_display = ['order', 'from_status', 'to_status', 'changed_at', 'changed_by', 'source']
+    list_filter = ['to_status', 'source']
+    list_select_related = ['order', 'changed_by']
+    raw_id_fields = ['order']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,157 @@
+import json
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+
+from viewer.caching import ConditionalGetMixin, listing_validators
+from viewer.models import MobilePhone, Television
+from viewer.pagination import InvalidCursor, KeysetPaginator
+from viewer.routers import ReadReplicaMixin
+from viewer.views import MOBILE_SORT_OPTIONS, TV_SORT_OPTIONS
+
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+STREAM_CHUNK_SIZE = 2000
+
+# Nazev pole v API -> cesta v ORM. Vybrana pole jdou primo do .values(), takze se nacitaji
+# jen pozadovane sloupce a JOIN na ciselnik jen tehdy, kdyz je jeho pole vyzadano.
+TELEVISION_FIELDS = {
+    'id': 'id',
+    'brand': 'brand__brand_name',
+    'model': 'brand_model',
+    'description': 'description',
+    'released_year': 'tv_released_year',
+    'screen_size': 'tv_screen_size',
+    'smart_tv': 'smart_tv',
+    'refresh_rate': 'refresh_rate',
+    'technology': 'display_technology__name',
+    'resolution': 'display_resolution__name',
+    'operation_system': 'operation_system__name',
+    'price': 'price',
+    'image': 'image',
+    'updated_at': 'updated_at',
+}
+
+MOBILE_PHONE_FIELDS = {
+    'id': 'id',
+    'brand': 'brand__brand_name',
+    'model': 'mobile_model',
+    'description': 'description',
+    'released_year': 'mobile_released_year',
+    'screen_size': 'mobile_screen_size',
+    'smart_phone': 'smart_phone',
+    'ram': 'ram__size',
+    'user_memory': 'user_memory__size',
+    'construction': 'construction__name',
+    'display': 'display__name',
+    'price': 'price',
+    'image': 'image',
+    'updated_at': 'updated_at',
+}
+
+
+class ApiError(ValueError):
+    pass
+
+
+class ProductAPIView(ReadReplicaMixin, ConditionalGetMixin, View):
+    """
+    Read-only JSON API katalogu.
+
+    - `?fields=id,brand,price` - jen vybrana pole (bez parametru vsechna),
+    - filtry stejne jako ve vypisu, `?sort=` podle `sort_options`,
+    - strankovani `?cursor=` (odkazy `next` a `previous` v odpovedi), velikost `?limit=`,
+    - `?format=ndjson` - cely (vyfiltrovany) katalog jako JSON po radcich; radky se ctou
+      pres `.iterator()` a posilaji prubezne, pamet tedy nezavisi na velikosti katalogu.
+    """
+    model = None
+    api_fields = {}
+    sort_options = {}
+    default_sort = 'price'
+
+    def get_validators(self):
+        return listing_validators(self.model)
+
+    def filter_queryset(self, queryset):
+        return queryset
+
+    def get_fields(self):
+        requested = [name.strip() for name in self.request.GET.get('fields', '').split(',') if name.strip()]
+        unknown = [name for name in requested if name not in self.api_fields]
+        if unknown:
+            raise ApiError(f'Neznama pole: {", ".join(unknown)}')
+        return requested or list(self.api_fields)
+
+    def get_page_size(self):
+        try:
+            limit = int(self.request.GET.get('limit', API_PAGE_SIZE))
+        except ValueError:
+            raise ApiError('Parametr limit musi byt cislo.')
+        return max(1, min(limit, API_MAX_PAGE_SIZE))
+
+    def serialize(self, row, fields):
+        item = {name: row[self.api_fields[name]] for name in fields}
+        if item.get('image'):
+            item['image'] = default_storage.url(item['image'])
+        return item
+
+    def get_page_url(self, cursor):
+        query = self.request.GET.copy()
+        query['cursor'] = cursor
+        return self.request.build_absolute_uri(f'{self.request.path}?{query.urlencode()}')
+
+    def get(self, request, *args, **kwargs):
+        try:
+            fields = self.get_fields()
+            page_size = self.get_page_size()
+        except ApiError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+
+        sort = request.GET.get('sort')
+        ordering = self.sort_options[sort if sort in self.sort_options else self.default_sort]
+        # Sloupce razeni musi byt ve vyberu i kdyz o ne klient nezada - z nich se sklada kurzor
+        paths = {self.api_fields[name] for name in fields} | {field.lstrip('-') for field in ordering}
+        queryset = self.filter_queryset(self.model.objects.all()).values(*paths)
+
+        if request.GET.get('format') == 'ndjson':
+            rows = queryset.order_by(*ordering).iterator(chunk_size=STREAM_CHUNK_SIZE)
+            lines = (json.dumps(self.serialize(row, fields), cls=DjangoJSONEncoder) + '\n' for row in rows)
+            return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+        paginator = KeysetPaginator(queryset, ordering, page_size)
+        try:
+            page = paginator.page(request.GET.get('cursor'))
+        except InvalidCursor as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+        return JsonResponse({
+            'results': [self.serialize(row, fields) for row in page],
+            'next': self.get_page_url(page.next_cursor) if page.has_next() else None,
+            'previous': self.get_page_url(page.previous_cursor) if page.has_previous() else None,
+        })
+
+
+class TelevisionAPIView(ProductAPIView):
+    model = Television
+    api_fields = TELEVISION_FIELDS
+    sort_options = TV_SORT_OPTIONS
+
+    def filter_queryset(self, queryset):
+        # Stejne filtry jako TVListView
+        return queryset.filter_catalog(
+            brands=self.request.GET.getlist('brand'),
+            technologies=self.request.GET.getlist('technology'),
+            resolutions=self.request.GET.getlist('resolution'),
+            op_systems=self.request.GET.getlist('os'),
+        )
+
+
+class MobilePhoneAPIView(ProductAPIView):
+    model = MobilePhone
+    api_fields = MOBILE_PHONE_FIELDS
+    sort_options = MOBILE_SORT_OPTIONS
+
+    def filter_queryset(self, queryset):
+        brands = self.request.GET.getlist('brand')
+        return queryset.filter(brand__brand_name__in=brands) if brands else queryset
@@ -0,0 +1,167 @@
+"""
+Asynchronni verze nejvytizenejsich pohledu (katalog televizi a kosik) pro beh pod ASGI - viz
+OnlineShop.asgi_urls. Dotazy jdou pres asynchronni ORM, takze cekani na databazi neblokuje
+event loop. Django 4.1 ma ale jen asynchronni rozhrani ORM (databazove ovladace jsou synchronni
+a dotaz bezi ve vlakne) a nema asynchronni session ani request.auser() - ty se vyhodnoti ve vlakne
+pres sync_to_async, stejne jako vykresleni sablony a zapis do kosiku v transakci.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.mixins import AccessMixin
+from django.core.cache import cache
+from django.http import Http404
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.views.generic import View
+
+from viewer.caching import (PAGE_CACHE_TIMEOUT, ConditionalGetMixin, acatalog_generation, alisting_validators,
+                            aobject_validators, cached_page, has_pending_messages, page_cache_entry, page_cache_key)
+from viewer.cart import CART_SESSION_KEY, acart_totals, cart_items, get_cart_id
+from viewer.checkout import PRODUCT_MODELS
+from viewer.models import Television
+from viewer.pagination import KeysetPaginationMixin
+from viewer.routers import ReadReplicaMixin
+from viewer.stock import OutOfStock, reserve_item
+from viewer.views import (OUT_OF_STOCK_MESSAGE, TV_SORT_OPTIONS, add_to_cart_redirect, tv_list_context,
+                          tv_list_queryset)
+
+# Sablona i context processory mohou sahat do databaze (lina role, kategorie v menu)
+arender = sync_to_async(render)
+
+
+async def aget_user(request):
+    """Vyhodnoti liny request.user (session a uzivatel z databaze) mimo event loop."""
+    user = request.user
+    await sync_to_async(lambda: user.is_authenticated)()
+    return user
+
+
+async def aget_cart_id(request):
+    """get_cart_id() bez zakladani kosiku - session se nacita z databaze lina."""
+    return await sync_to_async(request.session.get)(CART_SESSION_KEY)
+
+
+class AsyncLoginRequiredMixin(AccessMixin):
+    async def dispatch(self, request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncCatalogMixin(ConditionalGetMixin):
+    """
+    ConditionalGetMixin a AnonymousPageCacheMixin pro asynchronni pohled. Pohled definuje
+    `aget_validators()`, ktera vraci (last_modified, verze) nebo None.
+    """
+    page_cache_timeout = PAGE_CACHE_TIMEOUT
+
+    async def aget_validators(self):
+        return None
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await aget_user(request)
+        validators = await self.aget_validators() if request.method in ('GET', 'HEAD') else None
+        if validators is None:
+            return await self.dispatch_cached(request, user, *args, **kwargs)
+
+        last_modified, version = validators
+        self.content_version = version
+        etag = await sync_to_async(self.get_etag)(version)
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await self.dispatch_cached(request, user, *args, **kwargs)
+        return self.patch_validators(response, etag, last_modified)
+
+    async def dispatch_cached(self, request, user, *args, **kwargs):
+        # Primo View.dispatch - synchronni dispatch z ConditionalGetMixin se preskoci
+        handle = super(ConditionalGetMixin, self).dispatch
+        if (request.method not in ('GET', 'HEAD') or user.is_authenticated
+                or await sync_to_async(has_pending_messages)(request)):
+            return await handle(request, *args, **kwargs)
+
+        key = page_cache_key(type(self).__name__, kwargs, request.GET, generation=await acatalog_generation())
+        version = getattr(self, 'content_version', None)
+        response = cached_page(await cache.aget(key), version)
+        if response is not None:
+            return response
+
+        response = await handle(request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(key, page_cache_entry(version, response), self.page_cache_timeout)
+        return response
+
+
+class AsyncTVListView(ReadReplicaMixin, AsyncCatalogMixin, KeysetPaginationMixin, View):
+    template_name = 'tv_list.html'
+    paginate_by = 20
+    sort_options = TV_SORT_OPTIONS
+    default_sort = 'price'
+
+    async def aget_validators(self):
+        return await alisting_validators(Television)
+
+    async def get(self, request):
+        paginator, page, object_list, is_paginated = await self.apaginate_queryset(
+            tv_list_queryset(request), self.paginate_by)
+        context = {
+            'view': self,
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': is_paginated,
+            'object_list': object_list,
+        }
+        context.update(self.get_pagination_context(page))
+        context.update(await sync_to_async(tv_list_context)(request, getattr(self, 'content_version', None)))
+        return await arender(request, self.template_name, context)
+
+
+class AsyncTVDetailView(ReadReplicaMixin, AsyncCatalogMixin, View):
+    template_name = 'tv_detail.html'
+
+    async def aget_validators(self):
+        return await aobject_validators(Television.objects.filter(pk=self.kwargs['pk']))
+
+    async def get(self, request, pk):
+        try:
+            television = await Television.objects.for_detail().aget(pk=pk)
+        except Television.DoesNotExist:
+            raise Http404
+        return await arender(request, self.template_name, {
+            'view': self,
+            'object': television,
+            'television': television,
+        })
+
+
+class AsyncCartView(AsyncLoginRequiredMixin, View):
+    template_name = 'order/cart.html'
+
+    async def get(self, request):
+        cart_id = await aget_cart_id(request)
+        items = [item async for item in cart_items(cart_id)] if cart_id is not None else []
+        total_items, total_price = await acart_totals(cart_id) if cart_id is not None else (0, 0)
+        return await arender(request, self.template_name, {
+            'items': items,
+            'total_price': total_price,
+            'total_items': total_items,
+        })
+
+
+class AsyncAddToCartView(AsyncLoginRequiredMixin, View):
+    product_type = 'television'
+
+    async def get(self, request, product_id):
+        model = PRODUCT_MODELS[self.product_type]
+        if not await model.objects.filter(pk=product_id).aexists():
+            raise Http404
+        # Zalozeni kosiku a rezervace skladu jsou transakce - ty umi jen synchronni ORM
+        try:
+            await sync_to_async(self.reserve)(request, product_id)
+        except OutOfStock:
+            messages.error(request, OUT_OF_STOCK_MESSAGE)
+        return add_to_cart_redirect(request, self.product_type, product_id)
+
+    def reserve(self, request, product_id):
+        reserve_item(get_cart_id(request, create=True), self.product_type, product_id)
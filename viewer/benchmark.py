@@ -0,0 +1,480 @@
+"""
+Vykonnostni testy kritickych cest obchodu - synteticky katalog, scenare requestu, mereni
+(propustnost, p50/p99, pocet dotazu) a porovnani s ulozenym vysledkem (viz prikaz benchmark).
+"""
+import asyncio
+import platform
+import random
+import statistics
+import threading
+import time
+from contextvars import ContextVar
+from decimal import Decimal
+from urllib.parse import urlencode
+
+import django
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from viewer.models import (Brand, MobileConstruction, MobileDisplay, MobilePhone, MobileRAM, MobileUserMemory, Order,
+                           OrderItem, Profile, Stock, Television, TVDisplayResolution, TVDisplayTechnology,
+                           TVOperationSystem)
+from viewer.products import sync_products
+
+SEED_BATCH_SIZE = 1000
+# Zasoba syntetickych produktu - sklad se pri nakupech pouziva, ale nikdy nedojde
+SEED_STOCK = 10 ** 9
+
+# Pocitadlo dotazu mereneho requestu - kontext se predava i do vlaken asynchronniho ORM
+_query_counter = ContextVar('viewer_benchmark_queries', default=None)
+
+TV_TECHNOLOGIES = ['LED', 'OLED', 'QLED', 'Mini LED']
+TV_RESOLUTIONS = ['HD Ready', 'Full HD', '4K Ultra HD', '8K']
+TV_OPERATION_SYSTEMS = ['Android TV', 'Tizen', 'webOS', 'Google TV']
+MOBILE_CONSTRUCTIONS = ['Dotykový', 'Výklopný']
+MOBILE_DISPLAYS = ['AMOLED', 'LCD', 'OLED']
+
+# Metriky porovnavane s vychozim vysledkem: nazev -> True, kdyz je vic lepe
+COMPARED_METRICS = {'throughput_rps': True, 'p50_ms': False, 'p99_ms': False}
+
+
+class BenchmarkData:
+    """Id vygenerovanych dat, ze kterych si scenare vybiraji (nahodne, ale se stalym seedem)."""
+
+    def __init__(self, television_ids, mobile_ids, user_ids, filter_paths, sizes):
+        self.television_ids = television_ids
+        self.mobile_ids = mobile_ids
+        self.user_ids = user_ids
+        self.filter_paths = filter_paths
+        self.sizes = sizes
+
+
+def _lookups(model, field, values):
+    return [model.objects.get_or_create(**{field: value})[0] for value in values]
+
+
+def seed_catalog(brands=20, televisions=2000, mobiles=1000, users=50, orders=2000, seed=0):
+    """
+    Vygeneruje synteticky katalog - znacky, televize a mobily (se spolecnym katalogem a skladem),
+    zakazniky s profilem a historii objednavek. Se stejnym `seed` vznikaji stejna data.
+    Hromadne vkladani bez signalu, spolecny katalog se doplni jako pri importu.
+    """
+    rng = random.Random(seed)
+    technologies = _lookups(TVDisplayTechnology, 'name', TV_TECHNOLOGIES)
+    resolutions = _lookups(TVDisplayResolution, 'name', TV_RESOLUTIONS)
+    op_systems = _lookups(TVOperationSystem, 'name', TV_OPERATION_SYSTEMS)
+    rams = _lookups(MobileRAM, 'size', [4, 6, 8, 12])
+    memories = _lookups(MobileUserMemory, 'size', [64, 128, 256, 512])
+    constructions = _lookups(MobileConstruction, 'name', MOBILE_CONSTRUCTIONS)
+    displays = _lookups(MobileDisplay, 'name', MOBILE_DISPLAYS)
+
+    Brand.objects.bulk_create([Brand(brand_name=f'Bench {index:03d}') for index in range(brands)],
+                              batch_size=SEED_BATCH_SIZE)
+    brand_objects = list(Brand.objects.filter(brand_name__startswith='Bench ').order_by('pk'))
+
+    Television.objects.bulk_create([
+        Television(brand=rng.choice(brand_objects), brand_model=f'TV {index:06d}',
+                   tv_released_year=rng.randint(2015, 2024), tv_screen_size=rng.choice([32, 43, 55, 65, 75]),
+                   smart_tv=rng.random() < 0.8, refresh_rate=rng.choice([50, 60, 100, 120]),
+                   display_technology=rng.choice(technologies), display_resolution=rng.choice(resolutions),
+                   operation_system=rng.choice(op_systems), description='Syntetická televize',
+                   price=Decimal(rng.randint(3000, 80000)))
+        for index in range(televisions)
+    ], batch_size=SEED_BATCH_SIZE)
+    MobilePhone.objects.bulk_create([
+        MobilePhone(brand=rng.choice(brand_objects), mobile_model=f'Phone {index:06d}',
+                    mobile_released_year=rng.randint(2018, 2024), mobile_screen_size=Decimal('0.61'),
+                    ram=rng.choice(rams), user_memory=rng.choice(memories), construction=rng.choice(constructions),
+                    display=rng.choice(displays), description='Syntetický mobil',
+                    price=Decimal(rng.randint(2000, 40000)))
+        for index in range(mobiles)
+    ], batch_size=SEED_BATCH_SIZE)
+    television_ids = list(Television.objects.filter(brand__in=brand_objects).order_by('pk')
+                          .values_list('pk', flat=True))
+    mobile_ids = list(MobilePhone.objects.filter(brand__in=brand_objects).order_by('pk').values_list('pk', flat=True))
+    sync_products('television', television_ids)
+    sync_products('mobile_phone', mobile_ids)
+    Stock.objects.bulk_create(
+        [Stock(product_type='television', product_id=pk, quantity=SEED_STOCK) for pk in television_ids]
+        + [Stock(product_type='mobile_phone', product_id=pk, quantity=SEED_STOCK) for pk in mobile_ids],
+        batch_size=SEED_BATCH_SIZE)
+
+    User.objects.bulk_create([User(username=f'bench-{index:04d}') for index in range(users)],
+                             batch_size=SEED_BATCH_SIZE)
+    user_ids = list(User.objects.filter(username__startswith='bench-').order_by('pk').values_list('pk', flat=True))
+    Profile.objects.bulk_create([Profile(user_id=pk, first_name='Jan', last_name='Novák', city='Praha')
+                                 for pk in user_ids], batch_size=SEED_BATCH_SIZE)
+    _seed_orders(rng, user_ids, television_ids, orders)
+
+    filter_paths = [reverse('filtered_smart_tv', args=['smart'])]
+    filter_paths += [reverse('filtered_tv_by_technology', args=[name]) for name in TV_TECHNOLOGIES]
+    filter_paths += [reverse('filtered_tv_by_resolution', args=[name]) for name in TV_RESOLUTIONS]
+    filter_paths += [reverse('filtered_tv_by_op_system', args=[name]) for name in TV_OPERATION_SYSTEMS]
+    sizes = {'brands': brands, 'televisions': televisions, 'mobiles': mobiles, 'users': users, 'orders': orders,
+             'seed': seed}
+    return BenchmarkData(television_ids, mobile_ids, user_ids, filter_paths, sizes)
+
+
+def _seed_orders(rng, user_ids, television_ids, count):
+    if not user_ids or not television_ids:
+        return
+    statuses = [status for status, _ in Order.ORDER_STATUS_CHOICES]
+    lines = []
+    orders = []
+    for _ in range(count):
+        order_lines = [(rng.choice(television_ids), rng.randint(1, 2), Decimal(rng.randint(3000, 80000)))
+                       for _ in range(rng.randint(1, 3))]
+        orders.append(Order(user_id=rng.choice(user_ids), status=rng.choice(statuses), first_name='Jan',
+                            last_name='Novák', total=sum(quantity * price for _, quantity, price in order_lines)))
+        lines.append(order_lines)
+    Order.objects.bulk_create(orders, batch_size=SEED_BATCH_SIZE)
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, television_id=television_id, product_name=f'TV {television_id}',
+                  quantity=quantity, unit_price=price)
+        for order, order_lines in zip(orders, lines) for television_id, quantity, price in order_lines
+    ], batch_size=SEED_BATCH_SIZE)
+
+
+class Scenario:
+    """
+    Jeden typ requestu. `path(data, rng)` vybere URL, `prepare` (nemeri se) pripravi stav
+    session - napr. kosik pred nakupem. Odpoved s jinym stavem nez `expected` je chyba.
+    """
+
+    def __init__(self, name, path, method='GET', form=None, prepare=None, expected=(200,)):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.form = form
+        self.prepare = prepare
+        self.expected = expected
+
+
+def _fill_cart(driver, session, data, rng):
+    driver.request(session, 'GET', reverse('add_to_cart', args=[rng.choice(data.television_ids)]))
+
+
+SCENARIOS = {scenario.name: scenario for scenario in [
+    Scenario('tv_list', lambda data, rng: reverse('tv_list')),
+    Scenario('tv_detail', lambda data, rng: reverse('tv_detail', args=[rng.choice(data.television_ids)])),
+    Scenario('tv_filtered', lambda data, rng: rng.choice(data.filter_paths)),
+    Scenario('add_to_cart', lambda data, rng: reverse('add_to_cart', args=[rng.choice(data.television_ids)]),
+             expected=(302,)),
+    Scenario('cart', lambda data, rng: reverse('view_cart'), prepare=_fill_cart),
+    Scenario('checkout', lambda data, rng: reverse('checkout'), method='POST',
+             form={'first_name': 'Jan', 'last_name': 'Novák', 'city': 'Praha'}, prepare=_fill_cart,
+             expected=(302,)),
+    Scenario('order_list', lambda data, rng: reverse('order_list')),
+]}
+
+
+class ClientDriver:
+    """Requesty pres django.test.Client - jedno vlakno, stejna cesta jako testy."""
+    name = 'client'
+
+    def session(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def request(self, client, method, path, form=None):
+        response = client.post(path, form) if method == 'POST' else client.get(path)
+        return response.status_code
+
+
+def _session_cookies(user):
+    """Cookies prihlaseneho zakaznika (session a CSRF) a CSRF token pro POST."""
+    client = Client()
+    client.force_login(user)
+    csrf_request = HttpRequest()
+    token = get_token(csrf_request)
+    client.cookies['csrftoken'] = csrf_request.META['CSRF_COOKIE']
+    return '; '.join(f'{key}={morsel.value}' for key, morsel in client.cookies.items()), token
+
+
+class WSGIDriver:
+    """
+    Requesty primo do WSGI aplikace v procesu (bez HTTP serveru a bez instrumentace test klienta),
+    soubezne z vice vlaken. Session a CSRF token kazdeho zakaznika se pripravi predem v cookies.
+    """
+    name = 'wsgi'
+
+    def __init__(self):
+        self.application = WSGIHandler()
+        self.factory = RequestFactory()
+
+    def session(self, user):
+        cookie, token = _session_cookies(user)
+        return {'HTTP_COOKIE': cookie, 'HTTP_X_CSRFTOKEN': token}
+
+    def request(self, headers, method, path, form=None):
+        if method == 'POST':
+            request = self.factory.post(path, form or {}, **headers)
+        else:
+            request = self.factory.get(path, **headers)
+        status = []
+        response = self.application(request.environ, lambda status_line, _headers: status.append(status_line))
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return int(status[0].split()[0])
+
+
+class ASGIDriver:
+    """
+    Requesty primo do ASGI aplikace v procesu s asynchronnimi pohledy (OnlineShop.asgi_urls) - jako
+    jeden worker ASGI serveru: soubezne requesty jsou korutiny v jednom event loopu, synchronni kod
+    (middleware, sablony, transakce) bezi ve spolecnem vlakne.
+    """
+    name = 'asgi'
+    urlconf = 'OnlineShop.asgi_urls'
+    is_async = True
+
+    def __init__(self):
+        self.application = ASGIHandler()
+
+    def session(self, user):
+        cookie, token = _session_cookies(user)
+        return [(b'cookie', cookie.encode()), (b'x-csrftoken', token.encode())]
+
+    def request(self, headers, method, path, form=None):
+        return async_to_sync(self.arequest)(headers, method, path, form)
+
+    async def arequest(self, headers, method, path, form=None):
+        path, _, query = path.partition('?')
+        body = urlencode(form or {}).encode() if method == 'POST' else b''
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': headers + [(b'host', b'testserver'),
+                                  (b'content-type', b'application/x-www-form-urlencoded'),
+                                  (b'content-length', str(len(body)).encode())],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+        messages = [{'type': 'http.disconnect'}, {'type': 'http.request', 'body': body, 'more_body': False}]
+        status = []
+
+        async def receive():
+            return messages.pop() if len(messages) > 1 else messages[0]
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await self.application(scope, receive, send)
+        return status[0]
+
+
+DRIVERS = {'client': ClientDriver, 'wsgi': WSGIDriver, 'asgi': ASGIDriver}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+
+def count_query(execute, sql, params, many, context):
+    """execute_wrapper - zapocita dotaz requestu, ktery se prave meri (podle kontextu)."""
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.count += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(sender, connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def _timed_request(driver, session, scenario, data, rng):
+    if scenario.prepare:
+        scenario.prepare(driver, session, data, rng)
+    path = scenario.path(data, rng)
+    counter = QueryCounter()
+    token = _query_counter.set(counter)
+    try:
+        started = time.perf_counter()
+        status = driver.request(session, scenario.method, path, scenario.form)
+        elapsed = time.perf_counter() - started
+    finally:
+        _query_counter.reset(token)
+    return elapsed, counter.count, status in scenario.expected
+
+
+async def _atimed_request(driver, session, scenario, data, rng):
+    if scenario.prepare:
+        await sync_to_async(scenario.prepare)(driver, session, data, rng)
+    path = scenario.path(data, rng)
+    counter = QueryCounter()
+    token = _query_counter.set(counter)
+    try:
+        started = time.perf_counter()
+        status = await driver.arequest(session, scenario.method, path, scenario.form)
+        elapsed = time.perf_counter() - started
+    finally:
+        _query_counter.reset(token)
+    return elapsed, counter.count, status in scenario.expected
+
+
+def run_scenario(driver, scenario, data, users, requests=200, warmup=20, concurrency=1, seed=0):
+    """
+    `requests` merenych requestu scenare rozdelenych mezi `concurrency` vlaken (u asynchronniho
+    driveru korutin), kazde s vlastnimi zakazniky; pred merenim `warmup` requestu na zahrati cache.
+    Vraci metriky scenare.
+    """
+    sessions = [driver.session(user) for user in users]
+    if getattr(driver, 'is_async', False):
+        return async_to_sync(_arun_scenario)(driver, scenario, data, sessions, requests, warmup, concurrency, seed)
+
+    rng = random.Random(seed)
+    for index in range(warmup):
+        _timed_request(driver, sessions[index % len(sessions)], scenario, data, rng)
+
+    results = []
+    lock = threading.Lock()
+
+    def worker(worker_index):
+        worker_rng = random.Random(seed * 1000 + worker_index)
+        worker_sessions = sessions[worker_index::concurrency] or sessions
+        # Spojeni vlakna (vcetne PRAGMA pri pripojeni) se otevre pred merenim
+        connections[DEFAULT_DB_ALIAS].ensure_connection()
+        try:
+            for index in range(worker_index, requests, concurrency):
+                result = _timed_request(driver, worker_sessions[index % len(worker_sessions)], scenario, data,
+                                        worker_rng)
+                with lock:
+                    results.append(result)
+        finally:
+            if concurrency > 1:
+                connections.close_all()
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        worker(0)
+    elapsed = time.perf_counter() - started
+    return summarize(results, elapsed)
+
+
+async def _arun_scenario(driver, scenario, data, sessions, requests, warmup, concurrency, seed):
+    rng = random.Random(seed)
+    for index in range(warmup):
+        await _atimed_request(driver, sessions[index % len(sessions)], scenario, data, rng)
+
+    results = []
+
+    async def worker(worker_index):
+        worker_rng = random.Random(seed * 1000 + worker_index)
+        worker_sessions = sessions[worker_index::concurrency] or sessions
+        for index in range(worker_index, requests, concurrency):
+            results.append(await _atimed_request(driver, worker_sessions[index % len(worker_sessions)], scenario,
+                                                 data, worker_rng))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(results, elapsed)
+
+
+def summarize(results, elapsed):
+    durations = sorted(duration for duration, _, _ in results)
+    queries = [count for _, count, _ in results]
+    if not durations:
+        return {'requests': 0}
+    p99 = statistics.quantiles(durations, n=100, method='inclusive')[98] if len(durations) > 1 else durations[0]
+    return {
+        'requests': len(durations),
+        'errors': sum(1 for _, _, ok in results if not ok),
+        'throughput_rps': round(len(durations) / elapsed, 1),
+        'p50_ms': round(statistics.median(durations) * 1000, 2),
+        'p99_ms': round(p99 * 1000, 2),
+        'mean_ms': round(statistics.fmean(durations) * 1000, 2),
+        'max_ms': round(durations[-1] * 1000, 2),
+        'queries_mean': round(statistics.fmean(queries), 1),
+        'queries_max': max(queries),
+    }
+
+
+def run_benchmark(data, scenarios=None, driver='client', requests=200, warmup=20, concurrency=1, seed=0):
+    """Spusti scenare (vychozi vsechny) nad vygenerovanymi daty a vrati vysledek pro JSON."""
+    driver_instance = DRIVERS[driver]()
+    users = list(User.objects.filter(pk__in=data.user_ids).order_by('pk'))
+    results = {}
+    # Dotazy se pocitaji na vsech spojenich - i tech, ktera otevrou vlakna driveru
+    connection_created.connect(_install_query_counter)
+    for connection in connections.all():
+        _install_query_counter(None, connection)
+    try:
+        with override_settings(ROOT_URLCONF=getattr(driver_instance, 'urlconf', settings.ROOT_URLCONF)):
+            for name in scenarios or SCENARIOS:
+                results[name] = run_scenario(driver_instance, SCENARIOS[name], data, users, requests=requests,
+                                             warmup=warmup, concurrency=concurrency, seed=seed)
+    finally:
+        connection_created.disconnect(_install_query_counter)
+        for connection in connections.all():
+            if count_query in connection.execute_wrappers:
+                connection.execute_wrappers.remove(count_query)
+    return {
+        'meta': {
+            'driver': driver,
+            'concurrency': concurrency,
+            'requests': requests,
+            'warmup': warmup,
+            'dataset': data.sizes,
+            'database': connections['default'].vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'created_at': timezone.now().isoformat(),
+        },
+        'scenarios': results,
+    }
+
+
+def find_regressions(results, baseline, threshold=0.2):
+    """
+    Zhorseni proti `baseline` o vic nez `threshold` (podil, 0.2 = 20 %) v propustnosti, p50 nebo p99;
+    pocet dotazu se nesmi zvysit vubec (novy dotaz ve smycce je chyba, ne sum mereni).
+    Scenare, ktere v jednom z vysledku chybi, se preskoci.
+    """
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous or not current.get('requests') or not previous.get('requests'):
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before, after = previous[metric], current[metric]
+            if not before:
+                continue
+            change = (before - after if higher_is_better else after - before) / before
+            if change > threshold:
+                regressions.append(f'{name}: {metric} {before} -> {after} ({change:+.0%})')
+        if current['queries_max'] > previous['queries_max']:
+            regressions.append(f'{name}: queries_max {previous["queries_max"]} -> {current["queries_max"]}')
+        if current['errors'] > previous['errors']:
+            regressions.append(f'{name}: errors {previous["errors"]} -> {current["errors"]}')
+    return regressions
@@ -0,0 +1,186 @@
+import hashlib
+import time
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from viewer.categories import acategory_tree_version, category_tree_version
+from viewer.permissions import get_shop_roles
+
+CATALOG_GENERATION_CACHE_KEY = 'viewer:catalog_generation'
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+
+def catalog_generation():
+    """Cislo generace katalogu - je soucasti klicu cache, takze zvyseni zneplatni vsechny stranky naraz."""
+    generation = cache.get(CATALOG_GENERATION_CACHE_KEY)
+    if generation is None:
+        cache.add(CATALOG_GENERATION_CACHE_KEY, int(time.time()), None)
+        generation = cache.get(CATALOG_GENERATION_CACHE_KEY)
+    return generation
+
+
+async def acatalog_generation():
+    generation = await cache.aget(CATALOG_GENERATION_CACHE_KEY)
+    if generation is None:
+        await cache.aadd(CATALOG_GENERATION_CACHE_KEY, int(time.time()), None)
+        generation = await cache.aget(CATALOG_GENERATION_CACHE_KEY)
+    return generation
+
+
+def bump_catalog_generation():
+    try:
+        cache.incr(CATALOG_GENERATION_CACHE_KEY)
+    except ValueError:
+        catalog_generation()
+
+
+def page_cache_key(view_name, kwargs, query, generation=None):
+    """Klic podle pohledu, parametru z URL a normalizovanych GET parametru (poradi nehraje roli)."""
+    params = sorted((key, sorted(value for value in values if value)) for key, values in query.lists())
+    normalized = repr((sorted(kwargs.items()), [param for param in params if param[1]]))
+    digest = hashlib.sha1(normalized.encode()).hexdigest()
+    if generation is None:
+        generation = catalog_generation()
+    return f'viewer:page:{generation}:{view_name}:{digest}'
+
+
+def has_pending_messages(request):
+    """Flash zpravy se vykresli do stranky (base.html) - takova stranka do sdilene cache nepatri."""
+    return len(messages.get_messages(request)) > 0
+
+
+def page_cache_entry(version, response):
+    """Hodnota do cache stranek: verze obsahu, vsechny hlavicky a telo odpovedi."""
+    return version, list(response.items()), response.content
+
+
+def cached_page(entry, version):
+    """
+    Odpoved z hodnoty v cache - jen pokud vznikla pro stejnou verzi obsahu (validatory z databaze),
+    jinak None. Generace katalogu v klici je v LocMemCache jen v jednom procesu, verze z databaze
+    zachyti zmenu provedenou v kteremkoli procesu.
+    """
+    if entry is None or entry[0] != version:
+        return None
+    _, headers, content = entry
+    response = HttpResponse(content)
+    for name, value in headers:
+        response[name] = value
+    return response
+
+
+class AnonymousPageCacheMixin:
+    """
+    Hotove HTML stranky katalogu pro neprihlasene uzivatele se drzi v cache. Prihlaseni vidi
+    kosik a tlacitka pro spravu, ti dostanou stranku vzdy cerstve vykreslenou, stejne jako
+    navstevnik s cekajici flash zpravou.
+    Katalog se zneplatni zvysenim generace ze signalu (viz viewer.signals); s ConditionalGetMixin
+    se navic ulozena stranka pouzije jen pro stejne validatory, jake ma aktualni ETag.
+    """
+    page_cache_timeout = PAGE_CACHE_TIMEOUT
+
+    def dispatch(self, request, *args, **kwargs):
+        if (request.method not in ('GET', 'HEAD') or request.user.is_authenticated
+                or has_pending_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = page_cache_key(type(self).__name__, kwargs, request.GET)
+        version = getattr(self, 'content_version', None)
+        response = cached_page(cache.get(key), version)
+        if response is not None:
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            if hasattr(response, 'render'):
+                response.render()
+            cache.set(key, page_cache_entry(version, response), self.page_cache_timeout)
+        return response
+
+
+def listing_validators(model):
+    """
+    Validatory pro vypis katalogu jednim levnym dotazem: nejnovejsi updated_at (index) a pocet
+    radku (zachyti i smazani). Generace katalogu pokryva zmeny ciselniku bez produktu.
+    """
+    aggregate = model.objects.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    return aggregate['last_modified'], (aggregate['last_modified'], aggregate['count'], catalog_generation())
+
+
+async def alisting_validators(model):
+    aggregate = await model.objects.aaggregate(last_modified=Max('updated_at'), count=Count('id'))
+    return aggregate['last_modified'], (aggregate['last_modified'], aggregate['count'], await acatalog_generation())
+
+
+def object_validators(queryset):
+    """
+    Validatory pro detail - updated_at jednoho radku; None, pokud objekt neexistuje (vyresi pohled).
+    Stranka zobrazuje i ciselniky a navigaci kategorii, proto verze nese generaci katalogu a verzi stromu.
+    """
+    try:
+        last_modified = queryset.values_list('updated_at', flat=True).first()
+    except (ValueError, ValidationError):
+        return None
+    if last_modified is None:
+        return None
+    return last_modified, (last_modified, catalog_generation(), category_tree_version())
+
+
+async def aobject_validators(queryset):
+    try:
+        last_modified = await queryset.values_list('updated_at', flat=True).afirst()
+    except (ValueError, ValidationError):
+        return None
+    if last_modified is None:
+        return None
+    return last_modified, (last_modified, await acatalog_generation(), await acategory_tree_version())
+
+
+class ConditionalGetMixin:
+    """
+    Podmineny GET - odpoved nese ETag a Last-Modified a opakovana navsteva s If-None-Match /
+    If-Modified-Since dostane 304 bez dotazu na obsah a bez vykresleni sablony.
+    Pohled definuje `get_validators()`, ktera vraci (last_modified, verze) nebo None.
+    """
+    private_cache = False
+
+    def get_validators(self):
+        return None
+
+    def get_etag(self, version):
+        user = self.request.user
+        viewer = ('anonymous',) if not user.is_authenticated else (
+            user.pk, user.is_superuser, sorted(get_shop_roles(self.request)))
+        params = sorted((key, sorted(values)) for key, values in self.request.GET.lists())
+        source = repr((type(self).__name__, sorted(self.kwargs.items()), params, viewer, version))
+        return quote_etag(hashlib.sha1(source.encode()).hexdigest())
+
+    def dispatch(self, request, *args, **kwargs):
+        validators = self.get_validators() if request.method in ('GET', 'HEAD') else None
+        if validators is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        last_modified, version = validators
+        # Verze obsahu pro AnonymousPageCacheMixin - stranka v cache musi odpovidat ETagu
+        self.content_version = version
+        etag = self.get_etag(version)
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        return self.patch_validators(response, etag, last_modified)
+
+    def patch_validators(self, response, etag, last_modified):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            # Kazdy pozadavek se musi overit, obsah se ale stahuje jen pri zmene
+            patch_cache_control(response, no_cache=True, private=self.private_cache or None)
+        return response
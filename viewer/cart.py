@@ -0,0 +1,95 @@
+from django.db import connection
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from viewer.models import Cart, CartItem
+
+# V session je jen id kosiku, polozky a ceny jsou v databazi
+CART_SESSION_KEY = 'cart_id'
+LEGACY_CART_SESSION_KEY = 'cart'
+
+
+def _line_total():
+    return ExpressionWrapper(F('quantity') * Coalesce('television__price', 'mobile_phone__price'),
+                             output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def get_cart_id(request, create=False):
+    """Id kosiku ze session; s `create=True` kosik zalozi, pokud jeste neexistuje."""
+    cart_id = request.session.get(CART_SESSION_KEY)
+    if cart_id is None and create:
+        cart_id = Cart.objects.create(user=request.user if request.user.is_authenticated else None).pk
+        request.session[CART_SESSION_KEY] = cart_id
+        # Kosik ze starsi verze (cely obsah v session) se prenese do databaze
+        for television_id, item in request.session.pop(LEGACY_CART_SESSION_KEY, {}).items():
+            add_item(cart_id, 'television', int(television_id), int(item['quantity']))
+    return cart_id
+
+
+def add_item(cart_id, product_type, product_id, quantity=1):
+    """Prida produkt do kosiku jednim UPSERTem - nova polozka, nebo navyseni mnozstvi."""
+    table = connection.ops.quote_name(CartItem._meta.db_table)
+    column = connection.ops.quote_name(CartItem._meta.get_field(product_type).column)
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (cart_id, {column}, quantity, reserved) VALUES (%s, %s, %s, 0) '
+                f'ON CONFLICT (cart_id, {column}) DO UPDATE SET quantity = {table}.quantity + excluded.quantity',
+                [cart_id, product_id, quantity],
+            )
+        return
+    # Databaze bez ON CONFLICT
+    lookup = {'cart_id': cart_id, f'{product_type}_id': product_id}
+    if not CartItem.objects.filter(**lookup).update(quantity=F('quantity') + quantity):
+        CartItem.objects.create(quantity=quantity, **lookup)
+
+
+def remove_item(cart_id, product_type, product_id):
+    """Snizi mnozstvi o jeden kus, posledni kus polozku odstrani."""
+    lookup = {'cart_id': cart_id, f'{product_type}_id': product_id}
+    if not CartItem.objects.filter(quantity__gt=1, **lookup).update(quantity=F('quantity') - 1):
+        CartItem.objects.filter(**lookup).delete()
+
+
+def cart_items(cart_id):
+    """Polozky kosiku i s produkty a cenou radku spoctenou v databazi."""
+    return (CartItem.objects.filter(cart_id=cart_id)
+            .select_related('television__brand', 'mobile_phone__brand')
+            .annotate(line_total=_line_total())
+            .order_by('pk'))
+
+
+def _totals():
+    return {
+        'total_items': Coalesce(Sum('quantity'), 0),
+        'total_price': Coalesce(Sum(_line_total()), Value(0),
+                                output_field=DecimalField(max_digits=12, decimal_places=2)),
+    }
+
+
+def cart_totals(cart_id):
+    """Celkovy pocet kusu a cena (Decimal) jednim agregacnim dotazem."""
+    totals = CartItem.objects.filter(cart_id=cart_id).aggregate(**_totals())
+    return totals['total_items'], totals['total_price']
+
+
+async def acart_totals(cart_id):
+    """cart_totals() pro asynchronni pohledy."""
+    totals = await CartItem.objects.filter(cart_id=cart_id).aaggregate(**_totals())
+    return totals['total_items'], totals['total_price']
+
+
+def cart_lines(cart_id):
+    """Polozky kosiku jako (typ produktu, id, mnozstvi) pro viewer.checkout.place_order."""
+    for television_id, mobile_phone_id, quantity in (CartItem.objects.filter(cart_id=cart_id)
+                                                     .values_list('television_id', 'mobile_phone_id', 'quantity')):
+        if television_id is not None:
+            yield 'television', television_id, quantity
+        else:
+            yield 'mobile_phone', mobile_phone_id, quantity
+
+
+def clear_cart(request):
+    cart_id = request.session.pop(CART_SESSION_KEY, None)
+    if cart_id is not None:
+        Cart.objects.filter(pk=cart_id).delete()
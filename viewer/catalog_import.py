@@ -0,0 +1,188 @@
+import csv
+import json
+import logging
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from viewer.caching import bump_catalog_generation
+from viewer.facets import invalidate_facet_index
+from viewer.models import (Brand, MobileConstruction, MobileDisplay, MobilePhone, MobileRAM, MobileUserMemory,
+                           Television, TVDisplayResolution, TVDisplayTechnology, TVOperationSystem)
+from viewer.products import sync_products
+from viewer.search import get_search_backend
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 2000
+
+
+class ImportSchema:
+    """
+    Popis importu jednoho typu produktu. `columns`: sloupec souboru -> pole modelu,
+    `lookups`: sloupec souboru -> (FK pole, model ciselniku, pole s nazvem). Nazvy sloupcu
+    odpovidaji poli JSON API (viewer.api). Prirozeny klic produktu je (znacka, `model_field`).
+    """
+
+    def __init__(self, model, model_field, columns, lookups):
+        self.model = model
+        self.model_field = model_field
+        self.natural_key = ('brand_id', model_field)
+        self.columns = columns
+        self.lookups = lookups
+
+    @property
+    def update_fields(self):
+        fields = [field for field in self.columns.values() if field not in self.natural_key]
+        fields += [f'{field}_id' for field, *_ in self.lookups.values() if f'{field}_id' not in self.natural_key]
+        return fields + ['updated_at']
+
+
+IMPORT_SCHEMAS = {
+    'television': ImportSchema(
+        Television,
+        model_field='brand_model',
+        columns={'model': 'brand_model', 'released_year': 'tv_released_year', 'screen_size': 'tv_screen_size',
+                 'smart_tv': 'smart_tv', 'refresh_rate': 'refresh_rate', 'description': 'description',
+                 'price': 'price'},
+        lookups={'brand': ('brand', Brand, 'brand_name'),
+                 'technology': ('display_technology', TVDisplayTechnology, 'name'),
+                 'resolution': ('display_resolution', TVDisplayResolution, 'name'),
+                 'operation_system': ('operation_system', TVOperationSystem, 'name')},
+    ),
+    'mobile_phone': ImportSchema(
+        MobilePhone,
+        model_field='mobile_model',
+        columns={'model': 'mobile_model', 'released_year': 'mobile_released_year',
+                 'screen_size': 'mobile_screen_size', 'smart_phone': 'smart_phone', 'description': 'description',
+                 'price': 'price'},
+        lookups={'brand': ('brand', Brand, 'brand_name'),
+                 'ram': ('ram', MobileRAM, 'size'),
+                 'user_memory': ('user_memory', MobileUserMemory, 'size'),
+                 'construction': ('construction', MobileConstruction, 'name'),
+                 'display': ('display', MobileDisplay, 'name')},
+    ),
+}
+
+
+def read_rows(path, file_format=None):
+    """Radky souboru dodavatele jako slovniky - CSV s hlavickou nebo JSONL; cte se prubezne."""
+    file_format = file_format or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as file:
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class CatalogImporter:
+    """
+    Hromadny import produktu. Ciselniky se nactou jednou do slovniku nazev -> id (nove hodnoty
+    se zalozi hromadne po davkach), produkty se zapisuji po davkach jednim
+    `bulk_create(update_conflicts=True)` podle prirozeneho klice (znacka, model) v transakci.
+
+    `bulk_create` neposila signaly, proto se vyhledavaci index, spolecny katalog (Product),
+    facety a generace cache aktualizuji explicitne.
+    """
+
+    def __init__(self, product_type, batch_size=IMPORT_BATCH_SIZE):
+        self.product_type = product_type
+        self.schema = IMPORT_SCHEMAS[product_type]
+        self.batch_size = batch_size
+        self.lookup_maps = {
+            column: dict(lookup_model.objects.values_list(name_field, 'pk'))
+            for column, (_, lookup_model, name_field) in self.schema.lookups.items()
+        }
+        self.fields = {column: self.schema.model._meta.get_field(field_name)
+                       for column, field_name in self.schema.columns.items()}
+        self.lookup_objects = {}
+        self.imported = 0
+        self.errors = []
+
+    def run(self, rows):
+        batch = []
+        for line, row in enumerate(rows, start=1):
+            try:
+                batch.append(self.clean_row(row))
+            except (KeyError, ValidationError) as exc:
+                self.errors.append((line, exc))
+                logger.warning('Import row %s skipped: %r', line, exc)
+                continue
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch)
+                batch = []
+        if batch:
+            self.write_batch(batch)
+        if self.imported:
+            invalidate_facet_index()
+            bump_catalog_generation()
+        return self.imported
+
+    def clean_row(self, row):
+        """Hodnoty jednoho radku prevedene a zvalidovane podle poli modelu (bez dotazu do databaze)."""
+        values = {}
+        for column, field in self.fields.items():
+            raw = row.get(column)
+            if raw in (None, '') and field.has_default():
+                continue
+            if isinstance(raw, str) and field.get_internal_type() == 'BooleanField':
+                raw = raw.strip().lower() in ('1', 't', 'true', 'yes', 'ano')
+            values[field.name] = field.clean('' if raw is None else raw, None)
+        for column, (field_name, lookup_model, name_field) in self.schema.lookups.items():
+            values[field_name] = lookup_model._meta.get_field(name_field).clean(row[column], None)
+        return values
+
+    def resolve_lookups(self, batch):
+        """Chybejici hodnoty ciselniku z davky se zalozi jednim bulk_create a doplni do slovniku."""
+        for column, (field_name, lookup_model, name_field) in self.schema.lookups.items():
+            known = self.lookup_maps[column]
+            missing = {values[field_name] for values in batch} - known.keys()
+            if missing:
+                lookup_model.objects.bulk_create([lookup_model(**{name_field: name}) for name in missing],
+                                                 ignore_conflicts=True)
+                known.update(lookup_model.objects.filter(**{f'{name_field}__in': missing})
+                             .values_list(name_field, 'pk'))
+
+    @transaction.atomic
+    def write_batch(self, batch):
+        self.resolve_lookups(batch)
+        model = self.schema.model
+        products = {}
+        for values in batch:
+            fields = dict(values)
+            for column, (field_name, *_) in self.schema.lookups.items():
+                fields[f'{field_name}_id'] = self.lookup_maps[column][fields.pop(field_name)]
+            # Stejny produkt vicekrat v jedne davce - plati posledni radek
+            products[fields['brand_id'], fields[self.schema.model_field]] = model(**fields)
+
+        model.objects.bulk_create(products.values(), update_conflicts=True, unique_fields=self.schema.natural_key,
+                                  update_fields=self.schema.update_fields)
+        self.imported += len(batch)
+        self.index_batch(products)
+        sync_products(self.product_type, [product.pk for product in products.values()])
+
+    def index_batch(self, products):
+        """
+        Doplni produktum z davky id (SQLite je u UPSERTu nevraci) a ciselniky z pameti a preda je
+        vyhledavacimu indexu, aby se nemusely znovu nacitat pres for_detail().
+        """
+        model_field = self.schema.model_field
+        for brand_id, name, pk in self.schema.model.objects.filter(**{
+                'brand_id__in': {brand_id for brand_id, _ in products},
+                f'{model_field}__in': {name for _, name in products}}).values_list('brand_id', model_field, 'pk'):
+            if (brand_id, name) in products:
+                products[brand_id, name].pk = pk
+        for product in products.values():
+            for column, (field_name, *_) in self.schema.lookups.items():
+                setattr(product, field_name, self.lookup_object(column, getattr(product, f'{field_name}_id')))
+        get_search_backend().index_objects(self.product_type, products.values())
+
+    def lookup_object(self, column, pk):
+        objects = self.lookup_objects.setdefault(column, {})
+        if pk not in objects:
+            _, lookup_model, name_field = self.schema.lookups[column]
+            names = {value: key for key, value in self.lookup_maps[column].items()}
+            objects[pk] = lookup_model(pk=pk, **{name_field: names[pk]})
+        return objects[pk]
@@ -0,0 +1,132 @@
+import time
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from viewer.models import Category, category_path_range
+
+CATEGORY_TREE_CACHE_KEY = 'viewer:category_tree'
+CATEGORY_TREE_VERSION_CACHE_KEY = 'viewer:category_tree_version'
+CATEGORY_TREE_CACHE_TIMEOUT = 5 * 60
+CATEGORY_FIELDS = ('id', 'name', 'parent_id', 'path', 'depth')
+
+
+class CategoryNode:
+    def __init__(self, id, name, parent_id, path, depth):
+        self.id = id
+        self.name = name
+        self.parent_id = parent_id
+        self.path = path
+        self.depth = depth
+        self.parent = None
+        self.children = []
+
+    def __str__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        return reverse('category_products', args=[self.id])
+
+
+class CategoryTree:
+    """
+    Navigacni strom kategorii postaveny v pameti z radku v cache - navigace v hlavicce
+    i drobeckova navigace se obejdou bez dotazu do databaze.
+    """
+
+    def __init__(self, rows):
+        self.nodes = {row['id']: CategoryNode(**row) for row in rows.values()}
+        self.roots = []
+        for node in sorted(self.nodes.values(), key=lambda node: node.name.lower()):
+            parent = self.nodes.get(node.parent_id)
+            node.parent = parent
+            (parent.children if parent else self.roots).append(node)
+
+    def __iter__(self):
+        return iter(self.roots)
+
+    def get(self, category_id):
+        return self.nodes.get(category_id)
+
+    def breadcrumbs(self, category_id):
+        """Predci kategorie od korene vcetne ni."""
+        node = self.nodes.get(category_id)
+        crumbs = []
+        while node:
+            crumbs.append(node)
+            node = node.parent
+        return crumbs[::-1]
+
+
+def _load_rows(queryset):
+    return {row['id']: row for row in queryset.values(*CATEGORY_FIELDS)}
+
+
+def category_tree_version():
+    """Verze stromu je soucasti klice - kazda zmena kategorie ulozi strom pod novy klic."""
+    version = cache.get(CATEGORY_TREE_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(CATEGORY_TREE_VERSION_CACHE_KEY, int(time.time()), None)
+        version = cache.get(CATEGORY_TREE_VERSION_CACHE_KEY)
+    return version
+
+
+async def acategory_tree_version():
+    version = await cache.aget(CATEGORY_TREE_VERSION_CACHE_KEY)
+    if version is None:
+        await cache.aadd(CATEGORY_TREE_VERSION_CACHE_KEY, int(time.time()), None)
+        version = await cache.aget(CATEGORY_TREE_VERSION_CACHE_KEY)
+    return version
+
+
+def _tree_cache_key(version):
+    return f'{CATEGORY_TREE_CACHE_KEY}:{version}'
+
+
+def category_tree():
+    key = _tree_cache_key(category_tree_version())
+    rows = cache.get(key)
+    if rows is None:
+        rows = _load_rows(Category.objects.all())
+        cache.set(key, rows, CATEGORY_TREE_CACHE_TIMEOUT)
+    return CategoryTree(rows)
+
+
+def _change_category_tree(change):
+    """
+    Zmena stromu pod novou verzi. Verze se zvysi vzdy (atomicky incr), upraveny strom se ale ulozi
+    jen tehdy, kdyz mezi nactenim a zvysenim verze strom nezmenil nikdo jiny - jinak by se jedna
+    ze soubeznych zmen ztratila, strom se proto pri prvnim pouziti sestavi znovu z databaze.
+    Procesy s vlastni cache (LocMemCache) se zmenu dozvi nejpozdeji po CATEGORY_TREE_CACHE_TIMEOUT.
+    """
+    version = category_tree_version()
+    rows = cache.get(_tree_cache_key(version))
+    try:
+        new_version = cache.incr(CATEGORY_TREE_VERSION_CACHE_KEY)
+    except ValueError:  # verze mezitim vypadla z cache
+        return
+    if rows is not None and new_version == version + 1:
+        change(rows)
+        cache.add(_tree_cache_key(new_version), rows, CATEGORY_TREE_CACHE_TIMEOUT)
+
+
+def update_category_tree(category):
+    """
+    Prubezna uprava stromu v cache po ulozeni kategorie: znovu se nacte jen jeji podstrom
+    (presunem se meni cesty potomku), zbytek stromu zustava. Bez stromu v cache neni co upravovat,
+    sestavi se cely pri prvnim pouziti.
+    """
+    if not category.path:
+        return
+    _change_category_tree(lambda rows: rows.update(_load_rows(Category.objects.subtree(category))))
+
+
+def remove_from_category_tree(category):
+    """Smazana kategorie a jeji podstrom (mazou se kaskadou) zmizi ze stromu v cache."""
+    start, end = category_path_range(category.path)
+
+    def remove(rows):
+        for category_id in [category_id for category_id, row in rows.items() if start <= row['path'] < end]:
+            del rows[category_id]
+
+    _change_category_tree(remove)
@@ -0,0 +1,103 @@
+import logging
+from collections import Counter
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+
+from viewer.jobs import enqueue_order_tasks
+from viewer.models import CartItem, Order, OrderItem
+from viewer.products import PRODUCT_TYPES
+from viewer.stock import cart_reservations, lock_stock, return_stock, take_stock
+
+logger = logging.getLogger(__name__)
+
+# Typ polozky v kosiku -> model produktu (a zaroven nazev FK na OrderItem a M2M pole na Order)
+PRODUCT_MODELS = {key: product_type.model for key, product_type in PRODUCT_TYPES.items()}
+
+
+class ProductsUnavailable(Exception):
+    """Produkty z kosiku uz neexistuji - `missing` je [(typ produktu, id)]."""
+
+    def __init__(self, missing):
+        self.missing = missing
+        super().__init__(', '.join(f'{product_type} #{product_id}' for product_type, product_id in missing))
+
+
+def order_item_field(product_type):
+    """FK z OrderItem na produkt daneho typu - typ bez nej nejde objednat, polozka by zustala bez produktu."""
+    try:
+        field = OrderItem._meta.get_field(product_type)
+    except FieldDoesNotExist:
+        field = None
+    if field is None or not field.many_to_one:
+        raise LookupError(f'OrderItem has no foreign key for product type {product_type!r}.')
+    return field
+
+
+@transaction.atomic
+def place_order(order, lines, cart_id=None):
+    """
+    Ulozi objednavku a jeji polozky v jedne transakci. Ceny a nazvy produktu se nactou jednim
+    dotazem na typ produktu primo ze zdrojovych tabulek (Television, MobilePhone) - spolecny katalog
+    Product je jen denormalizovana kopie pro vypisy a po QuerySet.update() muze mit starou cenu.
+    Polozky (OrderItem i radky M2M tabulek) se zapisi pres `bulk_create`, takze pocet dotazu
+    nezavisi na velikosti kosiku. Cena se do polozek kopiruje v okamziku nakupu a jejich soucet se
+    ulozi do Order.total.
+
+    Kusy se odectou ze skladu (viz viewer.stock); rezervace kosiku `cart_id` se zapoctou a spotrebuji.
+    Pri nedostatku vyvola OutOfStock a objednavka se neulozi. Stejne tak ProductsUnavailable, pokud
+    nektery produkt z `lines` mezitim zmizel - objednavka bez nej by zakaznika tise ochudila.
+
+    Vedlejsi ucinky (potvrzeni zakaznikovi, ...) se jen zaradi do fronty uloh (viz viewer.jobs) ve stejne
+    transakci - ulozi se, prave kdyz se ulozi objednavka.
+    """
+    lock_stock()
+    reserved = cart_reservations(cart_id) if cart_id is not None else {}
+    quantities = {}
+    for product_type, product_id, quantity in lines:
+        quantities.setdefault(product_type, Counter())[product_id] += quantity
+    item_fields = {product_type: order_item_field(product_type) for product_type in quantities}
+
+    items, m2m_ids, ordered = [], {}, {}
+    for product_type, counter in quantities.items():
+        for product_id, product in PRODUCT_TYPES[product_type].order_products(counter.keys()).items():
+            item = OrderItem(product_name=PRODUCT_TYPES[product_type].product_name(product),
+                             unit_price=product.price, quantity=counter.pop(product_id))
+            setattr(item, item_fields[product_type].attname, product_id)
+            items.append(item)
+            m2m_ids.setdefault(product_type, []).append(product_id)
+            ordered[product_type, product_id] = item.quantity
+    missing = [(product_type, product_id) for product_type, counter in quantities.items() for product_id in counter]
+    if missing:
+        error = ProductsUnavailable(missing)
+        logger.warning('Products from cart no longer exist: %s', error)
+        raise error
+
+    # Rezervovane kusy uz ze skladu odectene jsou - dobira se jen zbytek, prebytek se vraci
+    take_stock({key: quantity - reserved.get(key, 0) for key, quantity in ordered.items()})
+    return_stock({key: quantity - ordered.get(key, 0) for key, quantity in reserved.items()
+                  if quantity > ordered.get(key, 0)})
+    if reserved:
+        CartItem.objects.filter(cart_id=cart_id, reserved__gt=0).update(reserved=0, reserved_until=None)
+
+    order.status = 'submitted'
+    order.total = sum((item.line_total for item in items), Decimal('0'))
+    order.save()
+
+    for item in items:
+        item.order = order
+    OrderItem.objects.bulk_create(items)
+
+    for product_type, product_ids in m2m_ids.items():
+        try:
+            field = Order._meta.get_field(product_type)
+        except FieldDoesNotExist:  # puvodni M2M vazby maji jen televize a mobily
+            continue
+        through = field.remote_field.through
+        product_column = f'{field.m2m_reverse_field_name()}_id'
+        through.objects.bulk_create(
+            through(order_id=order.pk, **{product_column: product_id}) for product_id in product_ids
+        )
+    enqueue_order_tasks(order)
+    return order
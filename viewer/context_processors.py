@@ -0,0 +1,17 @@
+from django.utils.functional import SimpleLazyObject
+
+from viewer.categories import category_tree
+from viewer.permissions import get_shop_roles, is_tv_admin
+
+
+def shop_roles(request):
+    """Role uzivatele pro sablony (is_tv_admin) - vyhodnoti se az pri pouziti v sablone."""
+    return {
+        'shop_roles': SimpleLazyObject(lambda: get_shop_roles(request)),
+        'is_tv_admin': SimpleLazyObject(lambda: is_tv_admin(request)),
+    }
+
+
+def category_navigation(request):
+    """Strom kategorii pro navigaci v hlavicce - z cache, nacte se az pri vykresleni."""
+    return {'category_tree': SimpleLazyObject(category_tree)}
@@ -0,0 +1,84 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from viewer.models import Brand, Television, TVDisplayResolution, TVDisplayTechnology, TVOperationSystem
+
+FACET_INDEX_CACHE_KEY = 'viewer:tv_facet_index'
+FACET_INDEX_TIMEOUT = 60 * 60
+
+# (GET parametr, nadpis v panelu, cesta k nazvu pres Television, ciselnik, pole s nazvem)
+TV_FACETS = (
+    ('brand', 'Značky', 'brand__brand_name', Brand, 'brand_name'),
+    ('technology', 'Technologie', 'display_technology__name', TVDisplayTechnology, 'name'),
+    ('resolution', 'Rozlišení displeje', 'display_resolution__name', TVDisplayResolution, 'name'),
+    ('os', 'Operační systém', 'operation_system__name', TVOperationSystem, 'name'),
+)
+
+
+def build_facet_index():
+    """
+    Sestavi index facet jednim agregovanym dotazem - pocet televizi pro kazdou kombinaci
+    (znacka, technologie, rozliseni, OS). Kombinaci je malo, takze pocty pro libovolny vyber
+    filtru se pak dopocitaji v Pythonu bez dalsich dotazu.
+    """
+    paths = [path for _, _, path, _, _ in TV_FACETS]
+    combinations = [
+        (tuple(row[path] for path in paths), row['count'])
+        for row in Television.objects.values(*paths).annotate(count=Count('id')).order_by()
+    ]
+    # I hodnoty bez televizi, aby se v panelu zobrazily s nulou
+    values = {
+        param: list(model.objects.order_by(field).values_list(field, flat=True))
+        for param, _, _, model, field in TV_FACETS
+    }
+    return {'combinations': combinations, 'values': values}
+
+
+def get_facet_index(version=None):
+    """
+    Index z cache. S `version` (validatory vypisu, viz viewer.caching.listing_validators) se index
+    postaveny pro jinou verzi katalogu sestavi znovu - i po zmene v jinem procesu.
+    """
+    entry = cache.get(FACET_INDEX_CACHE_KEY)
+    if entry is None or (version is not None and entry[0] != version):
+        entry = version, build_facet_index()
+        cache.set(FACET_INDEX_CACHE_KEY, entry, FACET_INDEX_TIMEOUT)
+    return entry[1]
+
+
+def invalidate_facet_index():
+    cache.delete(FACET_INDEX_CACHE_KEY)
+
+
+def tv_facets(selected, version=None):
+    """
+    Vrati facety pro postranni panel TVListView. `selected` je slovnik {parametr: [hodnoty]},
+    `version` verze katalogu pro get_facet_index().
+    Pocet u hodnoty odpovida vysledku, kdyby ji uzivatel zaskrtl - ostatni facety
+    se uplatni, vlastni vyber dane facety ne (zaskrtnuti v ramci facety se scitaji).
+    """
+    index = get_facet_index(version)
+    selected_sets = [set(selected.get(param) or ()) for param, *_ in TV_FACETS]
+
+    counters = [Counter() for _ in TV_FACETS]
+    for combination, count in index['combinations']:
+        misses = [i for i, chosen in enumerate(selected_sets) if chosen and combination[i] not in chosen]
+        if not misses:
+            for i, counter in enumerate(counters):
+                counter[combination[i]] += count
+        elif len(misses) == 1:
+            counters[misses[0]][combination[misses[0]]] += count
+
+    return [
+        {
+            'param': param,
+            'label': label,
+            'options': [
+                {'value': value, 'count': counters[i][value], 'selected': value in selected_sets[i]}
+                for value in index['values'][param]
+            ],
+        }
+        for i, (param, label, *_) in enumerate(TV_FACETS)
+    ]
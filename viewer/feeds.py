@@ -0,0 +1,204 @@
+import csv
+import io
+import os
+import tempfile
+import time
+import uuid
+import zlib
+from datetime import timedelta
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from viewer.jobs import enqueue
+from viewer.models import FeedEntry
+from viewer.products import PRODUCT_TYPES
+from viewer.search import product_document
+
+FEED_COLUMNS = ('type', 'id', 'brand', 'title', 'description', 'specs', 'price', 'url', 'image')
+FEED_FORMATS = {
+    'csv': 'text/csv',
+    'xml': 'application/xml',
+}
+FEED_DIR = 'feeds'
+FEED_CHUNK_SIZE = 2000
+FEED_LOCK_TIMEOUT = 10 * 60
+# Jak dlouho request ceka na prvni verzi feedu, kterou generuje jiny proces (s)
+FEED_WAIT_TIMEOUT = 30
+FEED_WAIT_INTERVAL = 0.5
+
+
+def feed_name(feed_format):
+    return f'{FEED_DIR}/products.{feed_format}.gz'
+
+
+def _absolute_url(path):
+    return getattr(settings, 'SHOP_FEED_BASE_URL', '').rstrip('/') + path
+
+
+def product_values(product_type, product):
+    """Hodnoty sloupcu FEED_COLUMNS - nazvy znacky a specifikaci z jednoho dotazu pres for_detail()."""
+    title, description, specs = product_document(product)
+    url = PRODUCT_TYPES[product_type].get_url(product.pk)
+    return (product_type, product.pk, product.brand.brand_name, title, description, specs, product.price,
+            _absolute_url(url), _absolute_url(product.image.url) if product.image else '')
+
+
+def _csv_row(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def _xml_item(values):
+    fields = ''.join(f'<{column}>{escape(str(value))}</{column}>' for column, value in zip(FEED_COLUMNS, values))
+    return f'<product>{fields}</product>\n'
+
+
+def refresh_feed_entries(full=False, batch_size=FEED_CHUNK_SIZE):
+    """
+    Inkrementalni aktualizace FeedEntry: serializuji se jen nove produkty a produkty s jinym
+    updated_at nez pri minulem generovani (prejmenovani ciselniku updated_at posouva, viz signaly).
+    Produkty se ctou po davkach podle id (`pk > posledni`), takze mezi davkami nezustava otevreny
+    kurzor a pamet drzi jen jednu davku. Vraci pocet prepsanych a smazanych radku.
+    """
+    changed = removed = 0
+    for product_type in PRODUCT_TYPES:
+        model = PRODUCT_TYPES[product_type].model
+        products = model.objects.for_detail().order_by('pk')
+        if not full:
+            products = products.exclude(Exists(FeedEntry.objects.filter(
+                product_type=product_type, product_id=OuterRef('pk'), updated_at=OuterRef('updated_at'))))
+
+        last_pk = 0
+        while True:
+            batch = list(products.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            entries = []
+            for product in batch:
+                values = product_values(product_type, product)
+                entries.append(FeedEntry(product_type=product_type, product_id=product.pk,
+                                         updated_at=product.updated_at, csv_row=_csv_row(values),
+                                         xml_item=_xml_item(values)))
+            changed += _save_entries(entries)
+
+        removed += FeedEntry.objects.filter(product_type=product_type).exclude(
+            Exists(model.objects.filter(pk=OuterRef('product_id')))).delete()[0]
+    return changed, removed
+
+
+def _save_entries(entries):
+    with transaction.atomic():
+        FeedEntry.objects.bulk_create(entries, update_conflicts=True, unique_fields=['product_type', 'product_id'],
+                                      update_fields=['updated_at', 'csv_row', 'xml_item'])
+    return len(entries)
+
+
+def feed_chunks(feed_format):
+    """Obsah feedu po kouscich (str) - hlavicka, ulozene radky v poradi typu a id, paticka."""
+    column = 'csv_row' if feed_format == 'csv' else 'xml_item'
+    yield _csv_row(FEED_COLUMNS) if feed_format == 'csv' else '<?xml version="1.0" encoding="UTF-8"?>\n<products>\n'
+    rows = (FeedEntry.objects.order_by('product_type', 'product_id')
+            .values_list(column, flat=True).iterator(chunk_size=FEED_CHUNK_SIZE))
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= FEED_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+    if feed_format == 'xml':
+        yield '</products>\n'
+
+
+def gzip_chunks(chunks):
+    """Prubezna komprese - gzip data z generatoru textu, bez drzeni celeho feedu v pameti."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip hlavicka
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _replace_stored(temporary_name, name):
+    """
+    Prepise `name` souborem `temporary_name` atomicky (os.replace) - request, ktery feed prave
+    otevira, dostane starou nebo novou verzi, nikdy chybejici soubor. Uloziste bez lokalnich cest
+    prejmenovani neumi: smaze se stary soubor a nova verze se ulozi pod nazvem, ktery vrati save().
+    """
+    try:
+        os.replace(default_storage.path(temporary_name), default_storage.path(name))
+        return name
+    except NotImplementedError:
+        with default_storage.open(temporary_name) as stored:
+            default_storage.delete(name)
+            name = default_storage.save(name, stored)
+        default_storage.delete(temporary_name)
+        return name
+
+
+def write_feed(feed_format):
+    """Zapise feed jako gzip do uloziste (media/feeds/) pres docasny soubor, hotovy nahradi zivy feed."""
+    with tempfile.TemporaryFile() as temporary:
+        for data in gzip_chunks(feed_chunks(feed_format)):
+            temporary.write(data)
+        temporary.seek(0)
+        name = feed_name(feed_format)
+        temporary_name = default_storage.save(f'{name}.{uuid.uuid4().hex}.tmp', File(temporary))
+    return _replace_stored(temporary_name, name)
+
+
+def _feed_lock(feed_format):
+    return f'viewer:feed_lock:{feed_format}'
+
+
+def rebuild_feed(feed_format):
+    """
+    Inkrementalne pregeneruje feed a vrati jeho nazev. Pregenerovava jen jeden proces - pokud uz
+    feed generuje jiny, vrati None.
+    """
+    lock = _feed_lock(feed_format)
+    if not cache.add(lock, 1, FEED_LOCK_TIMEOUT):
+        return None
+    try:
+        refresh_feed_entries()
+        return write_feed(feed_format)
+    finally:
+        cache.delete(lock)
+
+
+def ensure_feed(feed_format):
+    """
+    Vrati nazev hotoveho feedu v ulozisti. Feed starsi nez SHOP_FEED_MAX_AGE se posle hned a jeho
+    pregenerovani se zaradi do fronty uloh (refresh_feed, viz viewer.tasks) - request na nej neceka.
+    Synchronne se generuje jen chybejici feed; pokud ho uz generuje jiny proces, pocka se na nej
+    (nejvyse FEED_WAIT_TIMEOUT, pak si ho request vygeneruje sam).
+    """
+    name = feed_name(feed_format)
+    if default_storage.exists(name):
+        modified = default_storage.get_modified_time(name)
+        if timezone.now() - modified >= timedelta(seconds=settings.SHOP_FEED_MAX_AGE):
+            # Klic podle casu zmeny souboru - kazda zastarala verze se zaradi jen jednou
+            enqueue('refresh_feed', {'feed_format': feed_format},
+                    key=f'refresh_feed:{feed_format}:{modified.timestamp():.0f}')
+        return name
+    rebuilt = rebuild_feed(feed_format)
+    if rebuilt is not None:
+        return rebuilt
+    lock = _feed_lock(feed_format)
+    deadline = time.monotonic() + FEED_WAIT_TIMEOUT
+    while cache.get(lock) and time.monotonic() < deadline:
+        time.sleep(FEED_WAIT_INTERVAL)
+        if default_storage.exists(name):
+            return name
+    refresh_feed_entries()
+    return write_feed(feed_format)
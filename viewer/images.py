@@ -0,0 +1,90 @@
+import json
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Sirky zmensenin v px - vetsi nez original se negeneruji (mensi obrazek ma jen jednu variantu v puvodni sirce)
+VARIANT_WIDTHS = (160, 320, 640, 960)
+VARIANT_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+VARIANTS_DIR = 'variants'
+MANIFEST_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def manifest_name(name):
+    return posixpath.join(VARIANTS_DIR, f'{name}.json')
+
+
+def variant_name(name, width, extension):
+    stem = posixpath.splitext(name)[0]
+    return posixpath.join(VARIANTS_DIR, f'{stem}_{width}w.{extension}')
+
+
+def _manifest_cache_key(name):
+    return f'viewer:image_manifest:{name}'
+
+
+def generate_variants(name, force=False):
+    """
+    Vytvori zmenseniny obrazku `name` (cesta v MEDIA) ve WebP a JPEG a vedle nich manifest
+    s rozmery. Vraci manifest, nebo None, pokud obrazek nejde nacist.
+    """
+    if not force and default_storage.exists(manifest_name(name)):
+        return read_manifest(name)
+    try:
+        with default_storage.open(name) as original:
+            image = ImageOps.exif_transpose(Image.open(original))
+            image.load()
+    except (OSError, UnidentifiedImageError):
+        logger.warning('Cannot create variants for image %s.', name)
+        return None
+
+    width, height = image.size
+    widths = [w for w in VARIANT_WIDTHS if w < width] or [width]
+    manifest = {'width': width, 'height': height, 'variants': []}
+    for variant_width in widths:
+        variant_height = round(height * variant_width / width)
+        resized = image
+        if variant_width != width:
+            resized = image.resize((variant_width, variant_height), Image.Resampling.LANCZOS)
+        for extension, pillow_format, options in VARIANT_FORMATS:
+            converted = resized.convert('RGB') if extension == 'jpeg' and resized.mode != 'RGB' else resized
+            buffer = BytesIO()
+            converted.save(buffer, pillow_format, **options)
+            target = variant_name(name, variant_width, extension)
+            default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+            manifest['variants'].append({'name': target, 'width': variant_width, 'height': variant_height,
+                                         'format': extension})
+
+    default_storage.delete(manifest_name(name))
+    default_storage.save(manifest_name(name), ContentFile(json.dumps(manifest).encode()))
+    cache.set(_manifest_cache_key(name), manifest, MANIFEST_CACHE_TIMEOUT)
+    return manifest
+
+
+def read_manifest(name):
+    try:
+        with default_storage.open(manifest_name(name)) as manifest:
+            return json.load(manifest)
+    except (OSError, ValueError):
+        return None
+
+
+def get_manifest(name):
+    """Manifest zmensenin - z cache, z disku, nebo se zmenseniny vytvori az ted (lazy)."""
+    manifest = cache.get(_manifest_cache_key(name))
+    if manifest is None:
+        manifest = read_manifest(name) or generate_variants(name)
+        if manifest is not None:
+            cache.set(_manifest_cache_key(name), manifest, MANIFEST_CACHE_TIMEOUT)
+    return manifest
@@ -0,0 +1,300 @@
+"""
+Mereni vykonu requestu po pohledech - doba odpovedi, SQL (pocet, cas, opakovane dotazy = podezreni
+na N+1), vykresleni sablon a velikost odpovedi. Vystup: strukturovany log, hlavicka Server-Timing
+a text pro Prometheus (/metrics). Podrobne se meri jen vzorek requestu (SHOP_PERF_SAMPLE_RATE).
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+# Hranice histogramu doby odpovedi v sekundach
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+UNRESOLVED_VIEW = '<unresolved>'
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+
+# Mereni probihajiciho requestu (jen u vzorku) - pro dotazy a cas sablon
+_current_request = ContextVar('viewer_request_metrics', default=None)
+
+
+def sql_fingerprint(sql):
+    """Dotaz bez konkretnich hodnot - IN se ruznym poctem parametru a cisla v SQL splynou."""
+    return _NUMBER_RE.sub('N', _IN_LIST_RE.sub('IN (...)', sql))
+
+
+class QueryRecorder:
+    """execute_wrapper - pocet a cas dotazu a kolikrat se opakoval stejny dotaz."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[sql_fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """Dotazy navic - kazde opakovani jiz provedeneho dotazu."""
+        return sum(count - 1 for count in self.fingerprints.values())
+
+    def repeated(self, threshold):
+        """Dotazy provedene aspon `threshold`krat - typicky dotaz ve smycce (N+1)."""
+        return [(fingerprint, count) for fingerprint, count in self.fingerprints.most_common() if count >= threshold]
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = QueryRecorder()
+        self.template_seconds = 0.0
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current_request.get()
+        if metrics is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_seconds += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Sablonovy backend Django, ktery u mereneho requestu scita cas vykresleni. Meri se jen sablona
+    vykreslovana pohledem - vlozene sablony ({% include %}, {% extends %}) jsou v jejim case.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+# Metriky z mereneho vzorku: (nazev, atribut ViewStats, typ, popis)
+SAMPLED_METRICS = [
+    ('shop_sampled_requests_total', 'sampled', 'counter', 'Requests measured in detail (sample).'),
+    ('shop_db_queries_total', 'queries', 'counter', 'SQL queries in sampled requests.'),
+    ('shop_db_query_seconds_total', 'query_seconds', 'counter', 'SQL time in sampled requests.'),
+    ('shop_db_duplicate_queries_total', 'duplicate_queries', 'counter',
+     'Repeated identical SQL queries in sampled requests (N+1 candidates).'),
+    ('shop_template_render_seconds_total', 'template_seconds', 'counter', 'Template render time in sampled requests.'),
+    ('shop_response_bytes_total', 'response_bytes', 'counter', 'Response body size of sampled requests.'),
+]
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = Counter()  # podle stavoveho kodu
+        self.duration_buckets = [0] * len(DURATION_BUCKETS)
+        self.duration_sum = 0.0
+        self.sampled = 0
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.duplicate_queries = 0
+        self.template_seconds = 0.0
+        self.response_bytes = 0
+
+
+class MetricsRegistry:
+    """Souhrnne metriky procesu po pohledech. Kazdy proces serveru ma vlastni (jako Prometheus klient)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def clear(self):
+        with self.lock:
+            self.views = {}
+
+    def record(self, view, status, duration, metrics=None, response_bytes=0):
+        with self.lock:
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = ViewStats()
+            stats.requests[status] += 1
+            stats.duration_sum += duration
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.duration_buckets[index] += 1
+            if metrics is not None:
+                stats.sampled += 1
+                stats.queries += metrics.queries.count
+                stats.query_seconds += metrics.queries.seconds
+                stats.duplicate_queries += metrics.queries.duplicates
+                stats.template_seconds += metrics.template_seconds
+                stats.response_bytes += response_bytes
+
+    def render_prometheus(self):
+        """Metriky v textovem formatu Prometheus (exposition format 0.0.4)."""
+        with self.lock:
+            views = sorted(self.views.items())
+            lines = [
+                '# HELP shop_requests_total Requests by view and status code.',
+                '# TYPE shop_requests_total counter',
+            ]
+            for view, stats in views:
+                for status, count in sorted(stats.requests.items()):
+                    lines.append(f'shop_requests_total{{view="{view}",status="{status}"}} {count}')
+            lines += [
+                '# HELP shop_request_duration_seconds Response time by view.',
+                '# TYPE shop_request_duration_seconds histogram',
+            ]
+            for view, stats in views:
+                for bound, count in zip(DURATION_BUCKETS, stats.duration_buckets):
+                    lines.append(f'shop_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {count}')
+                total = sum(stats.requests.values())
+                lines.append(f'shop_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {total}')
+                lines.append(f'shop_request_duration_seconds_sum{{view="{view}"}} {stats.duration_sum:.6f}')
+                lines.append(f'shop_request_duration_seconds_count{{view="{view}"}} {total}')
+            for name, attribute, kind, help_text in SAMPLED_METRICS:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                for view, stats in views:
+                    value = getattr(stats, attribute)
+                    lines.append(f'{name}{{view="{view}"}} {value:.6f}' if isinstance(value, float)
+                                 else f'{name}{{view="{view}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNRESOLVED_VIEW
+    return match.view_name or match._func_path
+
+
+def server_timing(duration, metrics):
+    return (f'total;dur={duration * 1000:.1f}, '
+            f'db;dur={metrics.queries.seconds * 1000:.1f};desc="{metrics.queries.count} queries", '
+            f'tpl;dur={metrics.template_seconds * 1000:.1f}')
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    execute_wrapper na kazdem spojeni (viz viewer.signals.instrument_connection) - dotaz zapocita
+    merenemu requestu podle kontextu, takze i dotazum asynchronniho ORM z jinych vlaken.
+    """
+    metrics = _current_request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.queries(execute, sql, params, many, context)
+
+
+class PerformanceMiddleware:
+    """
+    Doba odpovedi kazdeho requestu do histogramu podle pohledu (levne). Vzorek requestu
+    (SHOP_PERF_SAMPLE_RATE) se meri podrobne: SQL (record_query), cas sablon, velikost odpovedi;
+    dostane hlavicku Server-Timing a zaznam do logu. Pomaly request (SHOP_PERF_SLOW_MS) a opakovane
+    dotazy (SHOP_PERF_REPEATED_QUERIES) se loguji jako varovani.
+    Patri na zacatek MIDDLEWARE, aby merila i ostatni middleware. Umi WSGI i ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            # Stejne jako MiddlewareMixin - handler pak middleware vola jako korutinu
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_request.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_request.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    def start(self):
+        metrics = RequestMetrics() if random.random() < settings.SHOP_PERF_SAMPLE_RATE else None
+        return metrics, _current_request.set(metrics), time.perf_counter()
+
+    def finish(self, request, response, metrics, started):
+        duration = time.perf_counter() - started
+        view = view_name(request)
+        response_bytes = 0 if response.streaming else len(response.content)
+        REGISTRY.record(view, response.status_code, duration, metrics, response_bytes)
+        if metrics is not None:
+            response['Server-Timing'] = server_timing(duration, metrics)
+            self.log(request, response, view, duration, metrics, response_bytes)
+        elif duration * 1000 > settings.SHOP_PERF_SLOW_MS:
+            logger.warning('Slow request %s %s (%s): %.0f ms', request.method, request.path, view, duration * 1000,
+                           extra={'performance': {'view': view, 'method': request.method,
+                                                  'status': response.status_code,
+                                                  'duration_ms': round(duration * 1000, 2)}})
+        return response
+
+    def log(self, request, response, view, duration, metrics, response_bytes):
+        record = {
+            'view': view,
+            'method': request.method,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'queries': metrics.queries.count,
+            'query_ms': round(metrics.queries.seconds * 1000, 2),
+            'duplicate_queries': metrics.queries.duplicates,
+            'template_ms': round(metrics.template_seconds * 1000, 2),
+            'response_bytes': response_bytes,
+        }
+        repeated = metrics.queries.repeated(settings.SHOP_PERF_REPEATED_QUERIES)
+        if repeated:
+            record['repeated_queries'] = [{'sql': fingerprint[:300], 'count': count} for fingerprint, count in repeated]
+            logger.warning('Repeated queries (N+1?) in %s: %s', view,
+                           ', '.join(f'{count}x {fingerprint[:120]}' for fingerprint, count in repeated),
+                           extra={'performance': record})
+        level = logging.WARNING if duration * 1000 > settings.SHOP_PERF_SLOW_MS else logging.INFO
+        logger.log(level, '%s %s (%s) %s: %.1f ms, %d queries (%.1f ms), templates %.1f ms, %d bytes',
+                   request.method, request.path, view, response.status_code, record['duration_ms'],
+                   record['queries'], record['query_ms'], record['template_ms'], response_bytes,
+                   extra={'performance': record})
+
+
+class JSONFormatter(logging.Formatter):
+    """Zaznam logu jako jeden radek JSON - i s namerenymi hodnotami z `extra={'performance': ...}`."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        performance = getattr(record, 'performance', None)
+        if performance is not None:
+            entry.update(performance)
+        return json.dumps(entry, ensure_ascii=False, default=str)
@@ -0,0 +1,183 @@
+"""
+Fronta uloh na pozadi v databazi - bez brokeru, zpracovava ji prikaz run_workers (vic procesu).
+Vedlejsi ucinky objednavky (potvrzeni zakaznikovi, ...) se zaradi ve stejne transakci jako
+objednavka a request na ne neceka. Uloha se provede aspon jednou - po padu workeru uprostred
+ulohy se spusti znovu, ulohy proto maji byt idempotentni.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+import uuid
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from viewer.models import Job
+
+logger = logging.getLogger(__name__)
+
+CLAIM_BATCH_SIZE = 10
+# Jak casto necinny worker vraci do fronty ulohy spadlych workeru a maze stare hotove ulohy (s)
+MAINTENANCE_INTERVAL = 60
+MAX_ERROR_LENGTH = 4000
+
+
+class Task:
+    """
+    Registrovana uloha - `func(**payload)`. Ulohy s `per_order=True` se zaradi ke kazde nove
+    objednavce (viz enqueue_order_tasks) s parametrem order_id.
+    """
+
+    def __init__(self, name, func, max_attempts=None, per_order=False):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.per_order = per_order
+
+
+TASKS = {}
+
+
+def register_task(name, max_attempts=None, per_order=False):
+    def register(func):
+        TASKS[name] = Task(name, func, max_attempts=max_attempts, per_order=per_order)
+        return func
+    return register
+
+
+def enqueue(task_name, payload=None, key=None, delay=0):
+    """
+    Zaradi ulohu do fronty. S klicem `key` nejvyse jednou - dalsi zarazeni se stejnym klicem se
+    ignoruje (jednim INSERTem, bez zavodu mezi procesy). V transakci se uloha ulozi az s ni.
+    """
+    task = TASKS[task_name]
+    Job.objects.bulk_create([Job(
+        task=task_name, payload=payload or {}, idempotency_key=key,
+        max_attempts=task.max_attempts or settings.SHOP_JOBS_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )], ignore_conflicts=True)
+
+
+def order_task_key(task_name, order_id):
+    return f'{task_name}:{order_id}'
+
+
+def enqueue_order_tasks(order):
+    """Ulohy k nove objednavce - klic podle Order.order_id, takze kazda probehne pro objednavku jednou."""
+    for task in TASKS.values():
+        if task.per_order:
+            enqueue(task.name, {'order_id': str(order.order_id)}, key=order_task_key(task.name, order.order_id))
+
+
+def worker_name():
+    return f'{socket.gethostname()[:40]}:{os.getpid()}'
+
+
+def claim_jobs(limit=CLAIM_BATCH_SIZE):
+    """
+    Vezme si az `limit` pripravenych uloh. PostgreSQL preskoci radky zamcene jinymi workery
+    (SKIP LOCKED); jinde (SQLite) rozhodne podminka na stav v UPDATE - radek prevezme jen jeden
+    worker, ostatni si vezmou dalsi davku.
+    """
+    ready = (Job.objects.filter(status=Job.QUEUED, run_at__lte=timezone.now())
+             .order_by('run_at', 'pk').values_list('pk', flat=True))
+    token = f'{worker_name()}:{uuid.uuid4().hex[:8]}'
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    # SQLite bez transakce - cteni a nasledny zapis v jedne transakci by pri soubehu hned skoncil
+    # "database is locked" (viz viewer.stock.lock_stock)
+    with transaction.atomic() if skip_locked else nullcontext():
+        if skip_locked:
+            ready = ready.select_for_update(skip_locked=True)
+        ids = list(ready[:limit])
+        if not ids:
+            return []
+        Job.objects.filter(pk__in=ids, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=token, locked_at=timezone.now(), attempts=F('attempts') + 1)
+    return list(Job.objects.filter(locked_by=token, status=Job.RUNNING).order_by('run_at', 'pk'))
+
+
+def retry_delay(attempts):
+    """Odklad dalsiho pokusu - zdvojnasobuje se az do SHOP_JOBS_MAX_RETRY_DELAY sekund."""
+    return min(settings.SHOP_JOBS_RETRY_DELAY * 2 ** (attempts - 1), settings.SHOP_JOBS_MAX_RETRY_DELAY)
+
+
+def run_job(job):
+    """Provede prevzatou ulohu; chyba naplanuje dalsi pokus, nebo ulohu po poslednim pokusu oznaci jako failed."""
+    task = TASKS.get(job.task)
+    started = time.perf_counter()
+    try:
+        if task is None:
+            raise LookupError(f'Unknown task {job.task!r}.')
+        task.func(**job.payload)
+    except Exception as exc:
+        error = traceback.format_exc()[-MAX_ERROR_LENGTH:]
+        if job.attempts >= job.max_attempts:
+            logger.error('Job %s failed after %d attempts: %s', job, job.attempts, exc)
+            changes = {'status': Job.FAILED}
+        else:
+            delay = retry_delay(job.attempts)
+            logger.warning('Job %s failed (attempt %d/%d), retry in %d s: %s', job, job.attempts, job.max_attempts,
+                           delay, exc)
+            changes = {'status': Job.QUEUED, 'run_at': timezone.now() + timedelta(seconds=delay)}
+        Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(locked_at=None, last_error=error, **changes)
+        return False
+    # Jen pokud ulohu mezitim neprevzal jiny worker (release_stale_jobs)
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(status=Job.DONE, locked_at=None, last_error='')
+    logger.info('Job %s done in %.0f ms.', job, (time.perf_counter() - started) * 1000)
+    return True
+
+
+def release_stale_jobs():
+    """
+    Ulohy, na kterych worker bezi dele nez SHOP_JOBS_LOCK_TIMEOUT (spadl nebo byl ukoncen),
+    se vrati do fronty - nebo skonci jako failed, pokud uz vycerpaly pokusy.
+    """
+    stale = Job.objects.filter(status=Job.RUNNING,
+                               locked_at__lt=timezone.now() - timedelta(seconds=settings.SHOP_JOBS_LOCK_TIMEOUT))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(status=Job.FAILED, locked_at=None,
+                                                                  last_error='Worker timed out.')
+    requeued = stale.update(status=Job.QUEUED, locked_at=None, run_at=timezone.now())
+    return requeued + failed
+
+
+def purge_finished_jobs():
+    """Smaze hotove ulohy starsi nez SHOP_JOBS_KEEP_DAYS (neuspesne zustavaji pro kontrolu)."""
+    cutoff = timezone.now() - timedelta(days=settings.SHOP_JOBS_KEEP_DAYS)
+    return Job.objects.filter(status=Job.DONE, updated_at__lt=cutoff).delete()[0]
+
+
+def queue_stats():
+    return dict(Job.objects.values_list('status').annotate(count=Count('id')).order_by())
+
+
+def work(stop=None, batch_size=CLAIM_BATCH_SIZE, poll_interval=1.0, once=False):
+    """
+    Smycka jednoho workeru - bere davky pripravenych uloh, dokud `stop` (threading/multiprocessing
+    Event) neni nastaveny. S `once=True` skonci, jakmile ve fronte nic pripraveneho neni - predtim
+    ale jednou provede udrzbu (i z cronu se tak vraci ulohy spadlych workeru a mazou stare hotove).
+    Vraci pocet zpracovanych uloh.
+    """
+    processed = 0
+    next_maintenance = 0
+    while stop is None or not stop.is_set():
+        jobs = claim_jobs(batch_size)
+        for job in jobs:
+            run_job(job)
+            processed += 1
+        if not jobs:
+            if time.monotonic() >= next_maintenance:
+                released = release_stale_jobs()
+                purge_finished_jobs()
+                next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+                if once and released:
+                    continue  # vracene ulohy se zpracuji jeste v tomto behu
+            if once:
+                break
+            time.sleep(poll_interval)
+    return processed
@@ -0,0 +1,38 @@
+"""Docasna data pro zatezove prikazy (stress_checkout, db_load_test) - po behu se zase smazou."""
+from django.contrib.auth.models import User
+
+from viewer.models import (Brand, Cart, Job, Order, Stock, Television, TVDisplayResolution, TVDisplayTechnology,
+                           TVOperationSystem)
+
+
+def create_workload(name, user_count, stock=None):
+    """Televize s vlastnimi ciselniky (a zasobou `stock`, None = bez skladu) a `user_count` zakazniku."""
+    television = Television.objects.create(
+        brand=Brand.objects.create(brand_name=name), brand_model=name,
+        display_technology=TVDisplayTechnology.objects.create(name=name),
+        display_resolution=TVDisplayResolution.objects.create(name=name),
+        operation_system=TVOperationSystem.objects.create(name=name),
+        tv_released_year=2020, tv_screen_size=55, refresh_rate=100, price=10_000,
+    )
+    if stock is not None:
+        Stock.objects.create(product_type='television', product_id=television.pk, quantity=stock)
+    users = [User.objects.create(username=f'{name}-{index}') for index in range(user_count)]
+    return television, users
+
+
+def delete_workload(television, users):
+    order_ids = [str(order_id) for order_id in Order.objects.filter(user__in=users).values_list('order_id', flat=True)]
+    Job.objects.filter(payload__order_id__in=order_ids).delete()
+    Order.objects.filter(user__in=users).delete()
+    Cart.objects.filter(user__in=users).delete()
+    User.objects.filter(pk__in=[user.pk for user in users]).delete()
+    lookups = (television.brand, television.display_technology, television.display_resolution,
+               television.operation_system)
+    Stock.objects.filter(product_type='television', product_id=television.pk).delete()
+    television.delete()
+    for lookup in lookups:
+        lookup.delete()
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[max(0, int(len(sorted_values) * fraction) - 1)]
@@ -0,0 +1,109 @@
+import json
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import setup_databases, teardown_databases, override_settings
+
+from viewer.benchmark import DRIVERS, SCENARIOS, find_regressions, run_benchmark, seed_catalog
+
+
+class Command(BaseCommand):
+    help = ('Vykonnostni testy kritickych cest (katalog, kosik, pokladna, historie objednavek) nad synteticky '
+            'vygenerovanymi daty v docasne testovaci databazi. Vypise propustnost, p50/p99 a pocet dotazu, '
+            'vysledek ulozi jako JSON a s --baseline skonci chybou, kdyz se nektera metrika zhorsi vic nez '
+            'o --threshold.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--driver', choices=sorted(DRIVERS), default='client',
+                            help='client = django.test.Client, wsgi = primo WSGI aplikace (i soubezne), '
+                                 'asgi = ASGI aplikace s asynchronnimi pohledy (i soubezne).')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Soubezne requesty - vlakna u --driver wsgi, korutiny u --driver asgi.')
+        parser.add_argument('--requests', type=int, default=200, help='Merenych requestu na scenar.')
+        parser.add_argument('--warmup', type=int, default=20, help='Nemerenych requestu pred merenim.')
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                            help='Spustit jen vybrane scenare (lze opakovat).')
+        parser.add_argument('--brands', type=int, default=20)
+        parser.add_argument('--televisions', type=int, default=2000)
+        parser.add_argument('--mobiles', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0, help='Seed generatoru dat i vyberu requestu.')
+        parser.add_argument('--output', help='Ulozit vysledek jako JSON do souboru (- = standardni vystup).')
+        parser.add_argument('--baseline', help='JSON drivejsiho behu, se kterym se vysledek porovna.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Pripustne zhorseni propustnosti a latence jako podil (0.2 = 20 %%).')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] > 1 and options['driver'] == 'client':
+            raise CommandError('Soubezne requesty umi jen --driver wsgi a asgi.')
+        baseline = self.load_baseline(options)
+
+        # Vlastni testovaci databaze (a repliky jako jeji zrcadla) - mereni nezavisi na datech
+        # vyvojove databaze a nic v ni nezmeni
+        old_config = setup_databases(verbosity=0, interactive=False, aliases=set(connections),
+                                     serialized_aliases=set())
+        try:
+            # Synchronni cast ASGI bezi ve vlakne event loopu, vlakna ma jen WSGI
+            if (options['concurrency'] > 1 and options['driver'] == 'wsgi' and connection.vendor == 'sqlite'
+                    and connection.is_in_memory_db()):
+                raise CommandError('SQLite in-memory databaze neni sdilena mezi vlakny - '
+                                   'nastavte SHOP_DB_TEST_NAME.')
+            results = self.measure(options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        self.report(results)
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(results, indent=2))
+        elif options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+        if baseline is not None:
+            self.compare(results, baseline, options['threshold'])
+
+    def load_baseline(self, options):
+        if not options['baseline']:
+            return None
+        try:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read baseline {options["baseline"]}: {exc}')
+        return baseline
+
+    def measure(self, options):
+        started = time.perf_counter()
+        cache.clear()
+        data = seed_catalog(brands=options['brands'], televisions=options['televisions'],
+                            mobiles=options['mobiles'], users=options['users'], orders=options['orders'],
+                            seed=options['seed'])
+        self.stderr.write(f'Dataset {data.sizes} seeded in {time.perf_counter() - started:.1f} s.')
+        # Jako pri testech: bez DEBUG (connection.queries by merily i sebe) a s hostem test klienta
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            return run_benchmark(data, scenarios=options['scenario'], driver=options['driver'],
+                                 requests=options['requests'], warmup=options['warmup'],
+                                 concurrency=options['concurrency'], seed=options['seed'])
+
+    def report(self, results):
+        meta = results['meta']
+        self.stdout.write(f'{meta["driver"]} driver, concurrency {meta["concurrency"]}, {meta["database"]}')
+        self.stdout.write(f'{"scenario":<12} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"queries":>8} {"errors":>6}')
+        for name, metrics in results['scenarios'].items():
+            if not metrics['requests']:
+                continue
+            self.stdout.write(f'{name:<12} {metrics["throughput_rps"]:>8} {metrics["p50_ms"]:>8} '
+                              f'{metrics["p99_ms"]:>8} {metrics["queries_max"]:>8} {metrics["errors"]:>6}')
+
+    def compare(self, results, baseline, threshold):
+        # Vysledky jineho driveru, soubeznosti nebo dat nejsou srovnatelne
+        for key in ('driver', 'concurrency', 'dataset'):
+            if baseline.get('meta', {}).get(key) != results['meta'][key]:
+                raise CommandError(f'Baseline was measured with a different {key}: '
+                                   f'{baseline.get("meta", {}).get(key)} != {results["meta"][key]}')
+        regressions = find_regressions(results, baseline, threshold)
+        if regressions:
+            raise CommandError('Performance regression: ' + '; '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'No regression over {threshold:.0%} against the baseline.'))
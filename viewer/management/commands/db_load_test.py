@@ -0,0 +1,105 @@
+import random
+import statistics
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connection
+
+from viewer.cart import cart_lines
+from viewer.checkout import place_order
+from viewer.management.commands._workload import create_workload, delete_workload, percentile
+from viewer.models import Cart, Order, Product, Television
+from viewer.stock import reserve_item
+
+
+class Command(BaseCommand):
+    help = ('Zatez databaze smisenym provozem - vypis katalogu, detail produktu a nakupy z kosiku '
+            'ze soubeznych vlaken po dobu --duration. Vypise propustnost pro aktualni profil databaze '
+            '(pro srovnani spustte napr. se SHOP_SQLITE_TUNING=0 SHOP_DB_CONN_MAX_AGE=0).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10.0, help='Delka behu v sekundach.')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Podil nakupu mezi operacemi.')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError('SQLite in-memory databaze neni sdilena mezi spojenimi - pouzijte soubor.')
+        self.stdout.write(f'Database profile: {self.describe_profile()}')
+        television, users = create_workload(f'load-{uuid.uuid4().hex[:8]}', options['workers'])
+        try:
+            results = self.run(television, users, options)
+        finally:
+            delete_workload(television, users)
+        self.report(results, options)
+
+    def describe_profile(self):
+        profile = [connection.vendor, f'CONN_MAX_AGE={connection.settings_dict["CONN_MAX_AGE"]}']
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size'):
+                    cursor.execute(f'PRAGMA {pragma}')
+                    profile.append(f'{pragma}={cursor.fetchone()[0]}')
+        return ', '.join(profile)
+
+    def read(self, television):
+        list(Product.objects.for_listing().order_by('price', 'id')[:20])
+        Television.objects.for_detail().get(pk=television.pk)
+
+    def write(self, television, user):
+        cart = Cart.objects.create(user=user)
+        reserve_item(cart.pk, 'television', television.pk)
+        place_order(Order(user=user), cart_lines(cart.pk), cart_id=cart.pk)
+        cart.delete()
+
+    def run(self, television, users, options):
+        deadline = time.perf_counter() + options['duration']
+        lock = threading.Lock()
+        results = {'read': [], 'write': [], 'errors': []}
+
+        def worker(user, seed):
+            operations = random.Random(seed)
+            try:
+                while time.perf_counter() < deadline:
+                    kind = 'write' if operations.random() < options['write_ratio'] else 'read'
+                    # Hranice requestu - s CONN_MAX_AGE=0 se spojeni zavre a pristi operace otevre nove
+                    close_old_connections()
+                    started = time.perf_counter()
+                    try:
+                        if kind == 'read':
+                            self.read(television)
+                        else:
+                            self.write(television, user)
+                    except DatabaseError as exc:
+                        with lock:
+                            results['errors'].append(str(exc))
+                        continue
+                    finally:
+                        close_old_connections()
+                    with lock:
+                        results[kind].append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user, index)) for index, user in enumerate(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def report(self, results, options):
+        for kind in ('read', 'write'):
+            durations = sorted(results[kind])
+            if not durations:
+                continue
+            self.stdout.write(
+                f'{kind}: {len(durations) / options["duration"]:.0f} ops/s, '
+                f'median {statistics.median(durations) * 1000:.1f} ms, '
+                f'p95 {percentile(durations, 0.95) * 1000:.1f} ms, max {durations[-1] * 1000:.1f} ms')
+        total = len(results['read']) + len(results['write'])
+        self.stdout.write(f'total: {total / options["duration"]:.0f} ops/s, {len(results["errors"])} errors')
+        if results['errors']:
+            self.stderr.write(f'First error: {results["errors"][0]}')
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from viewer.stock import SWEEP_BATCH_SIZE, expire_reservations, purge_orphaned_stock
+
+
+class Command(BaseCommand):
+    help = ('Vrati do skladu kusy z propadlych rezervaci v kosicich a uklidi sklad smazanych produktu '
+            '(spoustet pravidelne, napr. z cronu).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE)
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Bezet stale a opakovat kazdych N sekund (0 = jeden pruchod).')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            released = expire_reservations(batch_size=options['batch_size'])
+            removed = purge_orphaned_stock()
+            self.stdout.write(f'{released} reservations released, {removed} stock rows of deleted products removed '
+                              f'in {time.perf_counter() - started:.2f} s.')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
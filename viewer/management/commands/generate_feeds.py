@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from viewer.feeds import FEED_FORMATS, refresh_feed_entries, write_feed
+
+
+class Command(BaseCommand):
+    help = 'Vygeneruje produktove feedy (CSV a XML, gzip) pro srovnavace cen - jen zmenene produkty se serializuji.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(FEED_FORMATS), action='append', dest='formats',
+                            help='Jen zvoleny format (lze opakovat), jinak vsechny.')
+        parser.add_argument('--full', action='store_true', help='Znovu serializovat vsechny produkty.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        changed, removed = refresh_feed_entries(full=options['full'])
+        self.stdout.write(f'{changed} products serialized, {removed} removed '
+                          f'in {time.perf_counter() - started:.2f} s.')
+        for feed_format in options['formats'] or FEED_FORMATS:
+            started = time.perf_counter()
+            name = write_feed(feed_format)
+            self.stdout.write(self.style.SUCCESS(f'{name} written in {time.perf_counter() - started:.2f} s.'))
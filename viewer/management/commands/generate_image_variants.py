@@ -0,0 +1,37 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+
+from viewer.images import generate_variants
+from viewer.models import MobilePhone, Profile, Television
+
+
+class Command(BaseCommand):
+    help = 'Vytvori zmenseniny (WebP/JPEG) pro vsechny existujici obrazky produktu a profilu.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Pocet paralelnich procesu.')
+        parser.add_argument('--force', action='store_true', help='Prepsat i existujici zmenseniny.')
+
+    def handle(self, *args, **options):
+        names = set()
+        for model, field in ((Television, 'image'), (MobilePhone, 'image'), (Profile, 'avatar')):
+            names.update(model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+                         .values_list(field, flat=True))
+
+        started = time.perf_counter()
+        generate = partial(generate_variants, force=options['force'])
+        if options['workers'] > 1:
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                manifests = list(executor.map(generate, sorted(names), chunksize=8))
+        else:
+            manifests = [generate(name) for name in sorted(names)]
+
+        failed = manifests.count(None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(names) - failed} images ({failed} failed) in {time.perf_counter() - started:.2f} s.'
+        ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from viewer.catalog_import import IMPORT_BATCH_SIZE, IMPORT_SCHEMAS, CatalogImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Hromadny import televizi nebo mobilu ze souboru dodavatele (CSV s hlavickou nebo JSONL).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Soubor .csv nebo .jsonl')
+        parser.add_argument('--type', choices=list(IMPORT_SCHEMAS), default='television', dest='product_type')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Jinak podle pripony souboru.')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        importer = CatalogImporter(options['product_type'], batch_size=options['batch_size'])
+        started = time.perf_counter()
+        try:
+            imported = importer.run(read_rows(options['path'], options['format']))
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read {options["path"]}: {exc}')
+        elapsed = time.perf_counter() - started
+
+        for line, error in importer.errors[:20]:
+            self.stderr.write(f'Row {line}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{imported} rows imported, {len(importer.errors)} skipped in {elapsed:.2f} s '
+            f'({imported / elapsed if elapsed else 0:.0f} rows/s).'
+        ))
@@ -0,0 +1,14 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from viewer.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Znovu sestavi vyhledavaci index produktu (televize a mobily).'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        get_search_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt in {time.perf_counter() - started:.2f} s.'))
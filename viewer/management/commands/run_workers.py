@@ -0,0 +1,81 @@
+import multiprocessing
+import signal
+import time
+from contextlib import contextmanager
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from viewer.jobs import CLAIM_BATCH_SIZE, queue_stats, work
+
+
+@contextmanager
+def stop_on_signals(stop):
+    """Ctrl+C a SIGTERM jen nastavi `stop` - worker dokonci rozdelanou davku uloh a skonci."""
+    previous = {signum: signal.signal(signum, lambda *args: stop.set()) for signum in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        yield
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+def worker_process(stop, processed, batch_size, poll_interval, once):
+    # Proces spusteny metodou spawn si Django nastavi sam, pri fork uz nastavene je
+    django.setup()
+    # Ctrl+C z terminalu dostane cela skupina procesu - ukonceni ridi rodic pres `stop`
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    try:
+        count = work(stop, batch_size=batch_size, poll_interval=poll_interval, once=once)
+    finally:
+        connections.close_all()
+    with processed.get_lock():
+        processed.value += count
+
+
+class Command(BaseCommand):
+    help = ('Zpracovava frontu uloh na pozadi (viewer.jobs) - potvrzeni objednavek a dalsi vedlejsi ucinky. '
+            'Bezi stale v --processes procesech, dokud neprijde Ctrl+C nebo SIGTERM; s --once zpracuje '
+            'pripravene ulohy a skonci.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help='Pocet soubeznych procesu workeru.')
+        parser.add_argument('--batch-size', type=int, default=CLAIM_BATCH_SIZE,
+                            help='Kolik uloh si worker vezme najednou.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Pauza v sekundach, kdyz ve fronte nic neni.')
+        parser.add_argument('--once', action='store_true',
+                            help='Zpracovat pripravene ulohy a skoncit (napr. z cronu).')
+
+    def handle(self, *args, **options):
+        if options['processes'] < 1:
+            raise CommandError('--processes must be at least 1.')
+        if options['processes'] > 1 and connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError('SQLite in-memory databaze neni sdilena mezi procesy - pouzijte soubor.')
+        started = time.perf_counter()
+        if options['processes'] == 1:
+            stop = multiprocessing.Event()
+            with stop_on_signals(stop):
+                processed = work(stop, batch_size=options['batch_size'], poll_interval=options['poll_interval'],
+                                 once=options['once'])
+        else:
+            processed = self.run_pool(options)
+        self.stdout.write(f'{processed} jobs processed by {options["processes"]} workers '
+                          f'in {time.perf_counter() - started:.2f} s, queue: {queue_stats()}')
+
+    def run_pool(self, options):
+        stop = multiprocessing.Event()
+        processed = multiprocessing.Value('i', 0)
+        # Spojeni rodice se do procesu workeru nesmi zdedit (fork)
+        connections.close_all()
+        workers = [multiprocessing.Process(target=worker_process, args=(
+            stop, processed, options['batch_size'], options['poll_interval'], options['once']))
+            for _ in range(options['processes'])]
+        with stop_on_signals(stop):
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        return processed.value
@@ -0,0 +1,113 @@
+import statistics
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+
+from viewer.cart import cart_lines
+from viewer.checkout import place_order
+from viewer.management.commands._workload import create_workload, delete_workload, percentile
+from viewer.models import Cart, CartItem, Order, OrderItem, Stock
+from viewer.stock import OutOfStock, reserve_item
+
+
+class Command(BaseCommand):
+    help = ('Zatezovy test skladu: soubezne nakupy jednoho produktu s omezenou zasobou proti nastavene '
+            'databazi. Overi, ze se neprodalo vic kusu, nez bylo skladem, a ze nakupy necekaly na zamky.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=16, help='Pocet soubeznych vlaken (spojeni).')
+        parser.add_argument('--orders', type=int, default=200, help='Celkovy pocet pokusu o nakup.')
+        parser.add_argument('--stock', type=int, default=50, help='Pocatecni zasoba produktu.')
+        parser.add_argument('--quantity', type=int, default=1, help='Kusu v jednom nakupu.')
+        parser.add_argument('--direct', action='store_true',
+                            help='Nakup bez kosiku (bez rezervace), jen place_order().')
+        parser.add_argument('--max-wait', type=float, default=5.0,
+                            help='Nejdelsi pripustna doba jednoho nakupu v sekundach.')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError('SQLite in-memory databaze neni sdilena mezi spojenimi - pouzijte soubor.')
+        television, users = create_workload(f'stress-{uuid.uuid4().hex[:8]}', options['workers'], options['stock'])
+        try:
+            outcomes, durations = self.run(television, users, options)
+            self.report(television, options, outcomes, durations)
+        finally:
+            delete_workload(television, users)
+
+    def checkout(self, television, user, options):
+        if options['direct']:
+            place_order(Order(user=user), [('television', television.pk, options['quantity'])])
+            return
+        # Kosiky se mazou az na konci (delete_workload), meri se jen rezervace a nakup
+        cart = Cart.objects.create(user=user)
+        reserve_item(cart.pk, 'television', television.pk, options['quantity'])
+        place_order(Order(user=user), cart_lines(cart.pk), cart_id=cart.pk)
+
+    def run(self, television, users, options):
+        remaining = iter(range(options['orders']))
+        lock = threading.Lock()
+        outcomes, durations = [], []
+
+        def worker(user):
+            try:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            return
+                    started = time.perf_counter()
+                    try:
+                        self.checkout(television, user, options)
+                        outcome = 'sold'
+                    except OutOfStock:
+                        outcome = 'out_of_stock'
+                    except DatabaseError as exc:  # hlavne "database is locked", deadlock
+                        outcome = f'error: {exc}'
+                    with lock:
+                        outcomes.append(outcome)
+                        durations.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - started
+        return outcomes, durations
+
+    def report(self, television, options, outcomes, durations):
+        sold = OrderItem.objects.filter(television=television).aggregate(total=Sum('quantity'))['total'] or 0
+        left = Stock.objects.get(product_type='television', product_id=television.pk).quantity
+        reserved = CartItem.objects.filter(television=television).aggregate(total=Sum('reserved'))['total'] or 0
+        errors = [outcome for outcome in outcomes if outcome.startswith('error')]
+        if not durations:
+            raise CommandError('No checkout finished.')
+        durations.sort()
+
+        self.stdout.write(
+            f'{len(outcomes)} checkouts by {options["workers"]} workers in {self.elapsed:.2f} s: '
+            f'{outcomes.count("sold")} sold, {outcomes.count("out_of_stock")} out of stock, {len(errors)} errors')
+        self.stdout.write(f'stock {options["stock"]} -> sold {sold} units, {left} left, {reserved} still reserved')
+        self.stdout.write(f'checkout time median {statistics.median(durations) * 1000:.1f} ms, '
+                          f'p95 {percentile(durations, 0.95) * 1000:.1f} ms, '
+                          f'max {durations[-1] * 1000:.1f} ms')
+
+        problems = []
+        if sold + left + reserved != options['stock'] or sold > options['stock']:
+            problems.append(f'oversold or lost units: {sold} sold + {left} left + {reserved} reserved '
+                            f'!= {options["stock"]}')
+        if sold != outcomes.count('sold') * options['quantity']:
+            problems.append(f'{sold} units in orders, but {outcomes.count("sold")} successful checkouts')
+        if errors:
+            problems.append(f'{len(errors)} checkouts failed in the database, e.g. {errors[0]}')
+        if durations[-1] > options['max_wait']:
+            problems.append(f'slowest checkout took {durations[-1]:.2f} s (limit {options["max_wait"]} s)')
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('No overselling, no lock errors.'))
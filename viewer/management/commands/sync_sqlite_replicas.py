@@ -0,0 +1,39 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ('Zkopiruje primarni SQLite databazi do souboru replik (SHOP_DB_REPLICAS) - lokalni nahrada '
+            'replikace pro vyzkouseni cteni z repliky. S --interval bezi stale a repliky zaostavaji '
+            'nanejvys o zadany pocet sekund.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Opakovat kazdych N sekund (0 = jedna kopie).')
+
+    def handle(self, *args, **options):
+        if not settings.SHOP_DB_REPLICAS:
+            raise CommandError('Nejsou nastavene zadne repliky (SHOP_DB_REPLICAS).')
+        primary = connections['default']
+        if primary.vendor != 'sqlite' or primary.is_in_memory_db():
+            raise CommandError('Repliky se kopiruji jen z SQLite databaze v souboru.')
+        while True:
+            started = time.perf_counter()
+            for alias in settings.SHOP_DB_REPLICAS:
+                self.copy(primary.settings_dict['NAME'], connections[alias].settings_dict['NAME'])
+            self.stdout.write(f'{len(settings.SHOP_DB_REPLICAS)} replicas synced '
+                              f'in {time.perf_counter() - started:.2f} s.')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def copy(self, source_name, target_name):
+        # Online backup API - konzistentni snimek i behem zapisu do primarni databaze, ctenari
+        # repliky po dokonceni vidi novy stav
+        with closing(sqlite3.connect(source_name)) as source, closing(sqlite3.connect(target_name)) as target:
+            source.backup(target)
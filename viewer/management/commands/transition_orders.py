@@ -0,0 +1,69 @@
+import sys
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from viewer.models import Order
+from viewer.order_status import STATUSES, TRANSITION_BATCH_SIZE, allowed_sources, transition_orders
+
+
+class Command(BaseCommand):
+    help = ('Hromadny prechod objednavek do stavu --to (napr. processing -> dispatched po expedici). '
+            'Vyber podle --from a/nebo souboru s cisly objednavek (Order.order_id, jedno na radek). '
+            'Objednavky, ze kterych prechod neni povoleny, se preskoci. Kazda zmena se zapise do historie.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', required=True, choices=sorted(STATUSES), help='Cilovy stav.')
+        parser.add_argument('--from', dest='from_statuses', action='append', choices=sorted(STATUSES),
+                            help='Jen objednavky v tomto stavu (lze opakovat).')
+        parser.add_argument('--order-ids-file', help='Soubor s cisly objednavek (- = standardni vstup).')
+        parser.add_argument('--batch-size', type=int, default=TRANSITION_BATCH_SIZE,
+                            help='Objednavek v jedne transakci (jeden UPDATE a jeden INSERT historie).')
+        parser.add_argument('--dry-run', action='store_true', help='Jen spocitat, kolik objednavek by se zmenilo.')
+
+    def handle(self, *args, **options):
+        if not options['from_statuses'] and not options['order_ids_file']:
+            raise CommandError('Select orders with --from and/or --order-ids-file.')
+        orders = Order.objects.all()
+        if options['from_statuses']:
+            orders = orders.filter(status__in=options['from_statuses'])
+        if options['order_ids_file']:
+            # Po davkach - seznam cisel v jednom IN by narazil na limit parametru databaze
+            order_ids = self.read_order_ids(options['order_ids_file'])
+            selections = [orders.filter(order_id__in=order_ids[start:start + options['batch_size']])
+                          for start in range(0, len(order_ids), options['batch_size'])]
+        else:
+            selections = [orders]
+
+        if options['dry_run']:
+            sources = allowed_sources(options['to'])
+            eligible = sum(selection.filter(status__in=sources).count() for selection in selections)
+            total = sum(selection.count() for selection in selections)
+            self.stdout.write(f'{eligible} orders would change to {options["to"]}, {total - eligible} would be skipped.')
+            return
+
+        started = time.perf_counter()
+        changed = skipped = 0
+        for selection in selections:
+            selection_changed, selection_skipped = transition_orders(
+                selection, options['to'], source='command', batch_size=options['batch_size'])
+            changed += selection_changed
+            skipped += selection_skipped
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{changed} orders changed to {options["to"]}, {skipped} skipped (transition not allowed) '
+                          f'in {elapsed:.2f} s ({changed / elapsed if elapsed else 0:.0f} orders/s).')
+
+    def read_order_ids(self, path):
+        try:
+            if path == '-':
+                lines = sys.stdin.read().splitlines()
+            else:
+                with open(path) as order_ids_file:
+                    lines = order_ids_file.read().splitlines()
+        except OSError as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+        try:
+            return [uuid.UUID(line.strip()) for line in lines if line.strip()]
+        except ValueError as exc:
+            raise CommandError(f'Invalid order id in {path}: {exc}')
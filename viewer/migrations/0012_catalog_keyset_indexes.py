@@ -0,0 +1,29 @@
+# Generated by Django 4.1.1 on 2026-10-18 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0011_alter_order_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mobilephone',
+            index=models.Index(fields=['price', 'id'], name='mobile_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mobilephone',
+            index=models.Index(fields=['mobile_released_year', 'id'], name='mobile_year_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='television',
+            index=models.Index(fields=['price', 'id'], name='tv_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='television',
+            index=models.Index(fields=['tv_released_year', 'id'], name='tv_year_id_idx'),
+        ),
+    ]
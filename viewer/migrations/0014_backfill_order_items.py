@@ -0,0 +1,35 @@
+from decimal import Decimal
+
+from django.db import migrations
+
+
+def backfill_order_items(apps, schema_editor):
+    """Starsi objednavky mely jen M2M vazby - mnozstvi 1 a aktualni cena produktu jsou nejlepsi odhad."""
+    Order = apps.get_model('viewer', 'Order')
+    OrderItem = apps.get_model('viewer', 'OrderItem')
+
+    for order in Order.objects.prefetch_related('television__brand', 'mobile_phone__brand').iterator(chunk_size=500):
+        items = [
+            OrderItem(order=order, television=television, quantity=1, unit_price=television.price,
+                      product_name=f'{television.brand.brand_name} {television.brand_model}')
+            for television in order.television.all()
+        ] + [
+            OrderItem(order=order, mobile_phone=mobile, quantity=1, unit_price=mobile.price,
+                      product_name=f'{mobile.brand.brand_name} {mobile.mobile_model}')
+            for mobile in order.mobile_phone.all()
+        ]
+        if items:
+            OrderItem.objects.bulk_create(items)
+            order.total = sum((item.unit_price for item in items), Decimal('0'))
+            order.save(update_fields=['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0013_order_items'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_items, migrations.RunPython.noop),
+    ]
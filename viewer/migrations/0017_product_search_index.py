@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # Index FTS5 jen na SQLite - jine databaze pouzivaji backend nastaveny v SHOP_SEARCH_BACKEND
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS viewer_product_search "
+        "USING fts5(title, description, specs, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS viewer_product_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0016_order_history_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.1.1 on 2026-10-18 01:26
+
+from django.db import migrations, models
+import viewer.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0017_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mobilephone',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='television',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='mobilephone',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to=viewer.models.ContentHashedUploadTo('mobile_phone_images', 'image')),
+        ),
+        migrations.AlterField(
+            model_name='television',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to=viewer.models.ContentHashedUploadTo('television_images', 'image')),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.1 on 2026-10-18 01:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0018_updated_at_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_type', models.CharField(max_length=20)),
+                ('product_id', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField()),
+                ('csv_row', models.TextField()),
+                ('xml_item', models.TextField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('product_type', 'product_id'), name='feed_entry_unique_product'),
+        ),
+    ]
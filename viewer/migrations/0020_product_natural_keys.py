@@ -0,0 +1,21 @@
+# Generated by Django 4.1.1 on 2026-10-18 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0019_feed_entries'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='mobilephone',
+            constraint=models.UniqueConstraint(fields=('brand', 'mobile_model'), name='mobile_unique_brand_model'),
+        ),
+        migrations.AddConstraint(
+            model_name='television',
+            constraint=models.UniqueConstraint(fields=('brand', 'brand_model'), name='tv_unique_brand_model'),
+        ),
+    ]
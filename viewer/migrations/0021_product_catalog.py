@@ -0,0 +1,48 @@
+# Generated by Django 4.1.1 on 2026-10-18 02:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('viewer', '0020_product_natural_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_type', models.CharField(max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('name', models.CharField(max_length=120)),
+                ('description', models.TextField(blank=True)),
+                ('released_year', models.IntegerField()),
+                ('price', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='')),
+                ('updated_at', models.DateTimeField(db_index=True)),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='products', to='viewer.brand')),
+                ('categories', models.ManyToManyField(blank=True, related_name='products', to='viewer.category')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['released_year', 'id'], name='product_year_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['content_type', 'object_id'], name='product_content_object_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('product_type', 'object_id'), name='product_unique_object'),
+        ),
+    ]
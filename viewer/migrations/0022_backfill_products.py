@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# (typ, model, pole nazvu, pole roku, nazev FK v M2M tabulce kategorii)
+SOURCES = (
+    ('television', 'Television', 'brand_model', 'tv_released_year', 'television_id'),
+    ('mobile_phone', 'MobilePhone', 'mobile_model', 'mobile_released_year', 'mobilephone_id'),
+)
+
+
+def backfill_products(apps, schema_editor):
+    """Radky spolecneho katalogu pro existujici televize a mobily, vcetne kategorii."""
+    Product = apps.get_model('viewer', 'Product')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    through = Product.categories.through
+
+    for product_type, model_name, model_field, year_field, category_column in SOURCES:
+        model = apps.get_model('viewer', model_name)
+        content_type = ContentType.objects.get_or_create(app_label='viewer', model=model_name.lower())[0]
+        Product.objects.bulk_create(
+            (Product(product_type=product_type, object_id=source.pk, content_type=content_type,
+                     brand_id=source.brand_id, name=f'{source.brand.brand_name} {getattr(source, model_field)}',
+                     description=source.description, released_year=getattr(source, year_field), price=source.price,
+                     image=source.image, updated_at=source.updated_at)
+             for source in model.objects.select_related('brand').iterator(chunk_size=2000)),
+            batch_size=2000,
+        )
+        product_ids = dict(Product.objects.filter(product_type=product_type).values_list('object_id', 'pk'))
+        categories = model.categories.through.objects.values_list(category_column, 'category_id')
+        through.objects.bulk_create(
+            (through(product_id=product_ids[object_id], category_id=category_id)
+             for object_id, category_id in categories.iterator(chunk_size=2000)),
+            batch_size=2000,
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('viewer', '0021_product_catalog'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_products, migrations.RunPython.noop),
+    ]
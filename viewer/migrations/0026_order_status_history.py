@@ -0,0 +1,32 @@
+# Generated by Django 4.1.1 on 2026-10-18 02:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('viewer', '0025_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('submitted', 'Submitted'), ('pending_payment', 'Pending Payment'), ('processing', 'Processing'), ('on_hold', 'On Hold'), ('dispatched', 'Dispatched'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('refunded', 'Refunded'), ('returned', 'Returned'), ('completed', 'Completed')], max_length=20)),
+                ('to_status', models.CharField(choices=[('submitted', 'Submitted'), ('pending_payment', 'Pending Payment'), ('processing', 'Processing'), ('on_hold', 'On Hold'), ('dispatched', 'Dispatched'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('refunded', 'Refunded'), ('returned', 'Returned'), ('completed', 'Completed')], max_length=20)),
+                ('changed_at', models.DateTimeField()),
+                ('source', models.CharField(blank=True, max_length=20)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='viewer.order')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='orderstatuschange',
+            index=models.Index(fields=['order', 'changed_at'], name='order_status_change_idx'),
+        ),
+    ]
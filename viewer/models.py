@@ -1,11 +1,39 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Exists, F, OuterRef, Value
+from django.db.models.functions import Concat, Substr
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator, MinLengthValidator, RegexValidator
+from django.utils.deconstruct import deconstructible
 import datetime
+import hashlib
+import os
 import uuid
 
 
+@deconstructible
+class ContentHashedUploadTo:
+    """
+    Nazev nahraneho souboru podle hashe obsahu (napr. television_images/3f2a9c1b7d4e5f60.jpg).
+    Zmena obrazku = nova URL, takze prohlizece a CDN mohou soubory cachovat navzdy.
+    """
+
+    def __init__(self, directory, field_name):
+        self.directory = directory
+        self.field_name = field_name
+
+    def __call__(self, instance, filename):
+        file = getattr(instance, self.field_name)
+        digest = hashlib.sha256()
+        for chunk in file.chunks():
+            digest.update(chunk)
+        file.seek(0)
+        extension = os.path.splitext(filename)[1].lower()
+        return f'{self.directory}/{digest.hexdigest()[:16]}{extension}'
+
+
 class Brand(models.Model):
     brand_name = models.CharField(max_length=50, unique=True)
 
@@ -35,12 +63,108 @@ class TVOperationSystem(models.Model):
         return self.name
 
 
+CATEGORY_PATH_SEGMENT = 7
+
+
+def category_path_range(path):
+    """
+    Hranice podstromu kategorie pro dotaz `path >= od AND path < do` - rozsah v indexu misto
+    LIKE 'cesta%' (ten SQLite kvuli case-insensitive LIKE indexem neprojde). Segmenty cesty
+    jsou cislice ukoncene '/', a '0' nasleduje v ASCII hned za '/'.
+    """
+    return path, path[:-1] + '0'
+
+
+class CategoryQuerySet(models.QuerySet):
+    def subtree(self, category, include_self=True):
+        """Kategorie a vsechny jeji podkategorie - jeden rozsahovy dotaz nad indexem `path`."""
+        start, end = category_path_range(category.path)
+        queryset = self.filter(path__gte=start, path__lt=end)
+        return queryset if include_self else queryset.exclude(pk=category.pk)
+
+
 class Category(models.Model):
+    """
+    Strom kategorii s materializovanou cestou: `path` je retezec id predku vcetne vlastniho id
+    (napr. '0000001/0000004/0000009/'), takze podstrom je jeden rozsah v indexu a predci se
+    ctou primo z cesty. Cestu a hloubku pocita save(), presun kategorie prepise cesty celeho
+    podstromu jednim UPDATE.
+    """
     name = models.CharField(max_length=100)
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(editable=False, default=0)
+
+    objects = CategoryQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['path']
 
     def __str__(self):
         return self.name
 
+    @property
+    def path_ids(self):
+        """Id predku od korene vcetne sebe - bez dotazu, z cesty."""
+        return [int(segment) for segment in self.path.split('/')[:-1]]
+
+    def clean(self):
+        if self.pk and self.parent_id and self.pk in Category.objects.get(pk=self.parent_id).path_ids:
+            raise ValidationError({'parent': 'Kategorii nelze přesunout pod její podkategorii.'})
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            old_path, old_depth = (Category.objects.filter(pk=self.pk).values_list('path', 'depth').first()
+                                   if self.pk else None) or ('', 0)
+            parent_path = (Category.objects.values_list('path', flat=True).get(pk=self.parent_id)
+                           if self.parent_id else '')
+            if old_path and parent_path.startswith(old_path):
+                raise ValueError('Kategorii nelze presunout pod jeji podkategorii.')
+            if self.pk is None:
+                # Cesta obsahuje vlastni id - nova kategorie se ulozi dvakrat
+                self.path, self.depth = '', 0
+                super().save(*args, **kwargs)
+                args, kwargs = (), {'update_fields': ['path', 'depth']}
+
+            self.path = f'{parent_path}{self.pk:0{CATEGORY_PATH_SEGMENT}d}/'
+            self.depth = self.path.count('/') - 1
+            if old_path and self.path != old_path:
+                # Presun - potomci dostanou novy zacatek cesty, zbytek cesty zustava
+                start, end = category_path_range(old_path)
+                Category.objects.filter(path__gt=start, path__lt=end).update(
+                    path=Concat(Value(self.path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + (self.depth - old_depth),
+                )
+            super().save(*args, **kwargs)
+
+
+class TelevisionQuerySet(models.QuerySet):
+    """Sdilene querysety katalogu - kazdy pohled nacte souvisejici tabulky jednim JOINem."""
+
+    LISTING_FIELDS = ('id', 'brand__brand_name', 'brand_model', 'description', 'tv_screen_size', 'tv_released_year',
+                      'price', 'image')
+
+    def filter_catalog(self, brands=None, technologies=None, resolutions=None, op_systems=None):
+        """Filtry postranniho panelu katalogu - prazdny seznam znamena bez omezeni."""
+        queryset = self
+        if brands:
+            queryset = queryset.filter(brand__brand_name__in=brands)
+        if technologies:
+            queryset = queryset.filter(display_technology__name__in=technologies)
+        if resolutions:
+            queryset = queryset.filter(display_resolution__name__in=resolutions)
+        if op_systems:
+            queryset = queryset.filter(operation_system__name__in=op_systems)
+        return queryset
+
+    def for_listing(self):
+        """Pro vypisy televizi - jen znacka a sloupce, ktere sablony seznamu opravdu zobrazuji."""
+        return self.select_related('brand').only(*self.LISTING_FIELDS)
+
+    def for_detail(self):
+        """Pro detail televize - vsechny specifikace (technologie, rozliseni, OS) v jednom dotazu."""
+        return self.select_related('brand', 'display_technology', 'display_resolution', 'operation_system')
+
 
 class Television(models.Model):
     brand = models.ForeignKey(Brand, on_delete=models.CASCADE)
@@ -58,7 +182,23 @@ class Television(models.Model):
     description = models.TextField(blank=True)
     categories = models.ManyToManyField(Category, related_name="televisions", blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)], default=0.00)
-    image = models.ImageField(upload_to='television_images/', blank=True, null=True)
+    image = models.ImageField(upload_to=ContentHashedUploadTo('television_images', 'image'), blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Radek spolecneho katalogu se smaze spolu s televizi (i pri hromadnem mazani querysetu)
+    catalog_entries = GenericRelation('Product', related_query_name='television')
+
+    objects = TelevisionQuerySet.as_manager()
+
+    class Meta:
+        # Indexy pro strankovani katalogu podle klice (cena, id) a (rok vydani, id)
+        indexes = [
+            models.Index(fields=['price', 'id'], name='tv_price_id_idx'),
+            models.Index(fields=['tv_released_year', 'id'], name='tv_year_id_idx'),
+        ]
+        # Prirozeny klic produktu - podle nej import katalogu pozna existujici televizi (UPSERT)
+        constraints = [
+            models.UniqueConstraint(fields=['brand', 'brand_model'], name='tv_unique_brand_model'),
+        ]
 
     def __str__(self):
         return f'{self.brand} -  {self.brand_model} - {self.tv_screen_size}"'
@@ -99,6 +239,18 @@ class MobileDisplay(models.Model):
         return self.name
 
 
+class MobilePhoneQuerySet(models.QuerySet):
+    LISTING_FIELDS = ('id', 'brand__brand_name', 'mobile_model', 'description', 'mobile_released_year', 'price',
+                      'image')
+
+    def for_listing(self):
+        """Pro vypisy mobilu - jen znacka a sloupce, ktere sablona seznamu zobrazuje."""
+        return self.select_related('brand').only(*self.LISTING_FIELDS)
+
+    def for_detail(self):
+        return self.select_related('brand', 'ram', 'user_memory', 'construction', 'display')
+
+
 class MobilePhone(models.Model):
     brand = models.ForeignKey(Brand, on_delete=models.CASCADE)
     mobile_model = models.CharField(max_length=50)
@@ -115,12 +267,87 @@ class MobilePhone(models.Model):
     description = models.TextField(blank=True)
     categories = models.ManyToManyField(Category, related_name="mobile_phone", blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)], default=0.00)
-    image = models.ImageField(upload_to='mobile_phone_images/', blank=True, null=True)
+    image = models.ImageField(upload_to=ContentHashedUploadTo('mobile_phone_images', 'image'), blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    catalog_entries = GenericRelation('Product', related_query_name='mobile_phone')
+
+    objects = MobilePhoneQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['price', 'id'], name='mobile_price_id_idx'),
+            models.Index(fields=['mobile_released_year', 'id'], name='mobile_year_id_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['brand', 'mobile_model'], name='mobile_unique_brand_model'),
+        ]
 
     def __str__(self):
         return f'{self.brand} -  {self.mobile_model}'
 
 
+class ProductQuerySet(models.QuerySet):
+    def for_listing(self):
+        return self.select_related('brand')
+
+    def in_category(self, category):
+        """
+        Produkty v kategorii a vsech jejich podkategoriich - EXISTS nad vazbou s rozsahem cesty
+        kategorie (index `path`), bez rekurze a bez duplicit u produktu ve vice podkategoriich.
+        """
+        start, end = category_path_range(category.path)
+        return self.filter(Exists(self.model.categories.through.objects.filter(
+            product_id=OuterRef('pk'), category__path__gte=start, category__path__lt=end)))
+
+
+class Product(models.Model):
+    """
+    Spolecny katalog vsech typu produktu - jeden radek za kazdou televizi, mobil atd. se spolecnymi
+    poli (znacka, nazev, cena, obrazek, kategorie). Smiseny vypis, kategorie nebo pokladna tak
+    potrebuji jeden dotaz misto dotazu na kazdy typ. Zdrojem dat zustavaji tabulky typu,
+    radky udrzuje viewer.products (signaly a hromadne operace), mazani obstara GenericRelation.
+    """
+    product_type = models.CharField(max_length=20)
+    object_id = models.PositiveIntegerField()
+    # Vazba na zdrojovy radek pro GenericRelation - smazani produktu smaze i radek katalogu
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    source = GenericForeignKey('content_type', 'object_id')
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name='products')
+    name = models.CharField(max_length=120)
+    description = models.TextField(blank=True)
+    released_year = models.IntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    image = models.ImageField(blank=True, null=True)
+    categories = models.ManyToManyField(Category, related_name='products', blank=True)
+    updated_at = models.DateTimeField(db_index=True)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product_type', 'object_id'], name='product_unique_object'),
+        ]
+        indexes = [
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['released_year', 'id'], name='product_year_id_idx'),
+            models.Index(fields=['content_type', 'object_id'], name='product_content_object_idx'),
+        ]
+
+    @property
+    def type_info(self):
+        from viewer.products import PRODUCT_TYPES  # registr importuje modely
+        return PRODUCT_TYPES[self.product_type]
+
+    def get_absolute_url(self):
+        return self.type_info.get_url(self.object_id)
+
+    def get_cart_url(self):
+        return self.type_info.get_cart_url(self.object_id)
+
+    def __str__(self):
+        return self.name
+
+
 class Profile(models.Model):
     ROLE_CHOICES = [
         ('ADMINISTRATOR', 'Administrator'),
@@ -160,6 +387,68 @@ class Profile(models.Model):
         return f'{self.user.username} Profile'
 
 
+class Cart(models.Model):
+    """Kosik v databazi - v session je jen jeho id (viz viewer.cart)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='carts')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Cart #{self.pk} of {self.user}'
+
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    television = models.ForeignKey(Television, on_delete=models.CASCADE, null=True, blank=True)
+    mobile_phone = models.ForeignKey(MobilePhone, on_delete=models.CASCADE, null=True, blank=True)
+    quantity = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
+    # Kusy odectene ze skladu pro tento kosik a do kdy (viz viewer.stock) - nejvyse `quantity`
+    reserved = models.PositiveIntegerField(default=0)
+    reserved_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Propadle rezervace pro expire_reservations - jen polozky s rezervaci
+            models.Index(fields=['reserved_until'], condition=models.Q(reserved__gt=0),
+                         name='cart_item_reservation_idx'),
+        ]
+        constraints = [
+            # Unikatni indexy jsou zaroven cilem UPSERTu (ON CONFLICT) pri pridani do kosiku
+            models.UniqueConstraint(fields=['cart', 'television'], name='cart_item_unique_television'),
+            models.UniqueConstraint(fields=['cart', 'mobile_phone'], name='cart_item_unique_mobile_phone'),
+            models.CheckConstraint(
+                check=models.Q(television__isnull=True, mobile_phone__isnull=False) |
+                models.Q(television__isnull=False, mobile_phone__isnull=True),
+                name='cart_item_single_product',
+            ),
+        ]
+
+    @property
+    def product(self):
+        return self.television or self.mobile_phone
+
+    def __str__(self):
+        return f'{self.quantity}x {self.product}'
+
+
+class Stock(models.Model):
+    """
+    Volne kusy produktu na sklade (rezervace v kosicich uz jsou odectene). Produkt bez radku
+    se skladem nesleduje a prodava se bez omezeni. Nezaporne `quantity` hlida i CHECK v databazi.
+    """
+    product_type = models.CharField(max_length=20)
+    product_id = models.PositiveIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product_type', 'product_id'], name='stock_unique_product'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_type} #{self.product_id}: {self.quantity} ks'
+
+
 class Order(models.Model):
     ORDER_STATUS_CHOICES = [
         ('submitted', 'Submitted'),
@@ -186,6 +475,128 @@ class Order(models.Model):
     zipcode = models.CharField(max_length=20, blank=True)
     phone_number = models.CharField(max_length=20, blank=True)
     status = models.CharField(max_length=20, choices=ORDER_STATUS_CHOICES, default='submitted')
+    # Denormalizovany soucet polozek v dobe nakupu - seznam objednavek nemusi scitat OrderItem
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Historie objednavek uzivatele - strankovani podle (datum, id) od nejnovejsich, volitelne i podle stavu
+        indexes = [
+            models.Index(fields=['user', '-order_date', '-id'], name='order_user_date_idx'),
+            models.Index(fields=['user', 'status', '-order_date', '-id'], name='order_user_status_date_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.order_id} by {self.user}"
+
+
+class OrderStatusChange(models.Model):
+    """
+    Historie stavu objednavky - jen pribyva (zapisuje viewer.order_status pri kazdem prechodu,
+    hromadne po davkach), existujici zaznamy se nemeni.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_changes')
+    from_status = models.CharField(max_length=20, choices=Order.ORDER_STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.ORDER_STATUS_CHOICES)
+    changed_at = models.DateTimeField()
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Odkud zmena prisla - 'admin', 'command', ...
+    source = models.CharField(max_length=20, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'changed_at'], name='order_status_change_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Order status history is append-only.')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f'{self.order_id}: {self.from_status} -> {self.to_status}'
+
+
+class OrderItem(models.Model):
+    """Polozka objednavky - mnozstvi a cena v okamziku nakupu, nezavisle na aktualni cene produktu."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    television = models.ForeignKey(Television, on_delete=models.SET_NULL, null=True, blank=True)
+    mobile_phone = models.ForeignKey(MobilePhone, on_delete=models.SET_NULL, null=True, blank=True)
+    product_name = models.CharField(max_length=120)
+    quantity = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(television__isnull=True) | models.Q(mobile_phone__isnull=True),
+                name='order_item_single_product',
+            ),
+        ]
+
+    @property
+    def line_total(self):
+        return self.unit_price * self.quantity
+
+    def __str__(self):
+        return f'{self.quantity}x {self.product_name}'
+
+
+class FeedEntry(models.Model):
+    """
+    Predpripraveny radek produktoveho feedu (CSV i XML). Pri dalsim generovani se serializuji
+    jen produkty, jejichz updated_at se od ulozene hodnoty lisi (viz viewer.feeds).
+    """
+    product_type = models.CharField(max_length=20)
+    product_id = models.PositiveIntegerField()
+    updated_at = models.DateTimeField()
+    csv_row = models.TextField()
+    xml_item = models.TextField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product_type', 'product_id'], name='feed_entry_unique_product'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_type} #{self.product_id}'
+
+
+class Job(models.Model):
+    """
+    Uloha na pozadi ve fronte v databazi (viewer.jobs) - zpracovavaji ji procesy prikazu run_workers.
+    Neuspesna uloha se opakuje s rostoucim odstupem, po `max_attempts` pokusech zustane ve stavu failed.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # Napr. 'order_confirmation:<Order.order_id>' - druhe zarazeni stejne ulohy se ignoruje
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Worker vybira pripravene ulohy podle (stav, cas spusteni)
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.pk} ({self.status})'
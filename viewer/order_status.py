@@ -0,0 +1,99 @@
+"""
+Stavy objednavky a povolene prechody mezi nimi. Prechody se provadeji hromadne - jeden
+UPDATE ... WHERE status IN (...) na davku objednavek a zaznamy historie (OrderStatusChange)
+jednim INSERTem - takze i tisice objednavek (sklad: processing -> dispatched -> delivered)
+stoji jen par dotazu.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from viewer.models import Order, OrderStatusChange
+
+TRANSITION_BATCH_SIZE = 1000
+
+STATUSES = dict(Order.ORDER_STATUS_CHOICES)
+
+# Stav -> stavy, do kterych z nej lze prejit (refunded a completed jsou konecne)
+TRANSITIONS = {
+    'submitted': {'pending_payment', 'processing', 'on_hold', 'cancelled'},
+    'pending_payment': {'processing', 'on_hold', 'cancelled'},
+    'processing': {'dispatched', 'on_hold', 'cancelled'},
+    'on_hold': {'pending_payment', 'processing', 'cancelled'},
+    'dispatched': {'delivered', 'returned'},
+    'delivered': {'completed', 'returned', 'refunded'},
+    'returned': {'refunded'},
+    'cancelled': {'refunded'},
+    'refunded': set(),
+    'completed': set(),
+}
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+def allowed_sources(target):
+    """Stavy, ze kterych lze prejit do `target`."""
+    if target not in STATUSES:
+        raise InvalidTransition(f'Unknown order status {target!r}.')
+    return sorted(status for status, targets in TRANSITIONS.items() if target in targets)
+
+
+def can_transition(source, target):
+    return target in TRANSITIONS.get(source, ())
+
+
+def _lock_orders(ids):
+    """
+    Zamkne davku pred ctenim puvodnich stavu. SQLite zamyka celou databazi a transakci, ktera
+    nejdriv cte a pak zapisuje, pri soubehu hned ukonci - prazdny UPDATE ziska zamek pro zapis predem
+    (viz viewer.stock.lock_stock). PostgreSQL zamkne jen radky davky.
+    """
+    orders = Order.objects.filter(pk__in=ids)
+    if connection.vendor == 'sqlite':
+        table = connection.ops.quote_name(Order._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {table} SET status = status WHERE 0')
+    elif connection.features.has_select_for_update:
+        orders = orders.select_for_update()
+    return orders
+
+
+def transition_orders(orders, target, user=None, source='', batch_size=TRANSITION_BATCH_SIZE):
+    """
+    Prevede objednavky z querysetu `orders` do stavu `target`. Objednavky, ze kterych prechod
+    neni povoleny, se preskoci. Po davkach podle id: davka = zamceni, nacteni puvodnich stavu,
+    jeden UPDATE (i updated_at - podmineny GET objednavek) a jeden INSERT historie.
+    Vraci (pocet prevedenych, pocet preskocenych).
+    """
+    sources = allowed_sources(target)
+    changed = skipped = 0
+    last_pk = 0
+    while True:
+        ids = list(orders.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return changed, skipped
+        last_pk = ids[-1]
+        with transaction.atomic():
+            previous = dict(_lock_orders(ids).filter(status__in=sources).values_list('pk', 'status'))
+            now = timezone.now()
+            if previous:
+                Order.objects.filter(pk__in=previous, status__in=sources).update(status=target, updated_at=now)
+                OrderStatusChange.objects.bulk_create(
+                    OrderStatusChange(order_id=pk, from_status=status, to_status=target, changed_at=now,
+                                      changed_by=user, source=source)
+                    for pk, status in previous.items()
+                )
+        changed += len(previous)
+        skipped += len(ids) - len(previous)
+
+
+def transition_order(order, target, user=None, source=''):
+    """Prechod jedne objednavky - nepovoleny prechod vyvola InvalidTransition."""
+    if not can_transition(order.status, target):
+        raise InvalidTransition(f'Order {order.order_id} cannot go from {order.status} to {target}.')
+    changed, _ = transition_orders(Order.objects.filter(pk=order.pk), target, user=user, source=source)
+    if not changed:  # stav se mezitim zmenil jinde
+        raise InvalidTransition(f'Order {order.order_id} is no longer {order.status}.')
+    order.refresh_from_db(fields=['status', 'updated_at'])
+    return order
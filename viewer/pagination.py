@@ -0,0 +1,200 @@
+import base64
+import binascii
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values, previous=False):
+    """Zakoduje hodnoty razeneho klice (napr. cena a id) do retezce pro parametr ?cursor=."""
+    payload = {'k': [_serialize(value) for value in values]}
+    if previous:
+        payload['p'] = 1
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values, previous = payload['k'], bool(payload.get('p'))
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        raise InvalidCursor(f'Neplatny kurzor: {cursor!r}')
+    # Kurzor prichazi od klienta - jen seznam jednoduchych hodnot
+    if not isinstance(values, list) or not all(isinstance(value, (str, int, float)) for value in values):
+        raise InvalidCursor(f'Neplatny kurzor: {cursor!r}')
+    return values, previous
+
+
+def _serialize(value):
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+class KeysetPage:
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.paginator.key_values(self.object_list[-1]))
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.paginator.key_values(self.object_list[0]), previous=True)
+        return None
+
+
+class KeysetPaginator:
+    """
+    Strankovani podle klice (keyset) misto OFFSET. Dalsi stranka se hleda podminkou
+    `(cena, id) > (posledni cena, posledni id)`, takze databaze jen pokracuje v indexu
+    a rychlost nezavisi na tom, jak daleko v katalogu uzivatel je.
+
+    `ordering` je n-tice poli, posledni musi byt unikatni (typicky 'id'), napr. ('-price', '-id').
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = int(per_page)
+
+    def key_values(self, obj):
+        if isinstance(obj, dict):  # radky z .values()
+            return [obj[field.lstrip('-')] for field in self.ordering]
+        values = []
+        for field in self.ordering:
+            value = obj
+            for part in field.lstrip('-').split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        return values
+
+    def _seek_filter(self, values, previous):
+        """Lexikograficke porovnani (a, b) > (x, y) zapsane jako a > x OR (a = x AND b > y)."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != previous
+            condition |= equal & Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _page_queryset(self, cursor):
+        """Dotaz na stranku o radek delsi (pozna se z nej, zda je dalsi stranka) a smer strankovani."""
+        queryset = self.queryset
+        previous = False
+        if cursor:
+            values, previous = decode_cursor(cursor)
+            if len(values) != len(self.ordering):
+                raise InvalidCursor(f'Neplatny kurzor: {cursor!r}')
+            # Hodnoty se prevedou na typy poli uz pri sestaveni podminky - podvrzeny kurzor tu selze
+            try:
+                queryset = queryset.filter(self._seek_filter(values, previous))
+            except (ValidationError, ValueError, TypeError):
+                raise InvalidCursor(f'Neplatny kurzor: {cursor!r}')
+
+        ordering = self.ordering
+        if previous:
+            ordering = tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+        return queryset.order_by(*ordering)[:self.per_page + 1], previous
+
+    def _build_page(self, rows, cursor, previous):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if previous:
+            rows.reverse()
+            return KeysetPage(rows, self, has_next=True, has_previous=has_more)
+        return KeysetPage(rows, self, has_next=has_more, has_previous=bool(cursor))
+
+    def page(self, cursor=None):
+        queryset, previous = self._page_queryset(cursor)
+        return self._build_page(list(queryset), cursor, previous)
+
+    async def apage(self, cursor=None):
+        """page() pro asynchronni pohledy - radky pres asynchronni iteraci querysetu."""
+        queryset, previous = self._page_queryset(cursor)
+        return self._build_page([row async for row in queryset], cursor, previous)
+
+
+class KeysetPaginationMixin:
+    """
+    Mixin pro ListView - nahradi klasicke cislovane stranky odkazy ?cursor=.
+    Kazda volba v `sort_options` musi mit v databazi odpovidajici index.
+    """
+    paginate_by = 20
+    sort_options = {}
+    default_sort = None
+
+    def get_sort(self):
+        sort = self.request.GET.get('sort')
+        return sort if sort in self.sort_options else self.default_sort
+
+    def get_keyset_paginator(self, queryset, page_size):
+        return KeysetPaginator(queryset, self.sort_options[self.get_sort()], page_size)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_keyset_paginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor as exc:
+            raise Http404(str(exc))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    async def apaginate_queryset(self, queryset, page_size):
+        paginator = self.get_keyset_paginator(queryset, page_size)
+        try:
+            page = await paginator.apage(self.request.GET.get('cursor'))
+        except InvalidCursor as exc:
+            raise Http404(str(exc))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_page_url(self, cursor):
+        query = self.request.GET.copy()
+        query['cursor'] = cursor
+        return f'{self.request.path}?{query.urlencode()}'
+
+    def get_pagination_context(self, page):
+        return {
+            'selected_sort': self.get_sort(),
+            'next_page_url': self.get_page_url(page.next_cursor) if page.has_next() else None,
+            'previous_page_url': self.get_page_url(page.previous_cursor) if page.has_previous() else None,
+        }
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(self.get_pagination_context(context['page_obj']))
+        return context
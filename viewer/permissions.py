@@ -0,0 +1,82 @@
+import time
+
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+TV_ADMIN_GROUP = 'tv_admin'
+
+ROLES_VERSION_CACHE_KEY = 'viewer:shop_roles_version'
+ROLES_CACHE_TIMEOUT = 60 * 60
+
+
+def user_roles_version_key(user_id):
+    return f'{ROLES_VERSION_CACHE_KEY}:{user_id}'
+
+
+def roles_version(user_id):
+    """
+    (verze vsech roli, verze roli uzivatele) - obe jsou soucasti klice cache roli. Zmena clenstvi
+    nebo profilu zvysi jen verzi dotceneho uzivatele, prejmenovani nebo smazani skupiny verzi vsech.
+    """
+    keys = [ROLES_VERSION_CACHE_KEY, user_roles_version_key(user_id)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Pocatecni hodnota z casu - po vypadnuti klice z cache se nevrati stara verze se starymi rolemi
+            cache.add(key, int(time.time()), None)
+            versions[key] = cache.get(key)
+    return versions[keys[0]], versions[keys[1]]
+
+
+def bump_roles_version(user_ids=None):
+    """Zneplatni role uzivatelu `user_ids`, bez nich role vsech uzivatelu."""
+    keys = [ROLES_VERSION_CACHE_KEY] if user_ids is None else [user_roles_version_key(pk) for pk in user_ids]
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:  # verze v cache neni - dalsi cteni zalozi novou
+            pass
+
+
+def load_shop_roles(user):
+    """Skupiny uzivatele a role z profilu (napr. {'tv_admin', 'USER'}) jednim dotazem."""
+    roles = set()
+    for group_name, profile_role in User.objects.filter(pk=user.pk).values_list('groups__name', 'profile__role'):
+        roles.update(role for role in (group_name, profile_role) if role)
+    return frozenset(roles)
+
+
+def get_shop_roles(request):
+    """
+    Role prihlaseneho uzivatele - vyhodnoti se nejvyse jednou za request a mezi requesty
+    se drzi ve verzovane cache, takze kontrola opravneni na katalogu nestoji zadny dotaz.
+    """
+    if not hasattr(request, '_shop_roles'):
+        user = request.user
+        if not user.is_authenticated:
+            roles = frozenset()
+        else:
+            all_version, user_version = roles_version(user.pk)
+            key = f'viewer:shop_roles:{all_version}:{user_version}:{user.pk}'
+            roles = cache.get(key)
+            if roles is None:
+                roles = load_shop_roles(user)
+                cache.set(key, roles, ROLES_CACHE_TIMEOUT)
+        request._shop_roles = roles
+    return request._shop_roles
+
+
+def is_tv_admin(request):
+    return TV_ADMIN_GROUP in get_shop_roles(request)
+
+
+def can_manage_tv(request):
+    return request.user.is_superuser or is_tv_admin(request)
+
+
+class TVAdminRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
+    """Umožní přístup pouze členům skupiny 'tv_admin' nebo superuživatelům."""
+
+    def test_func(self):
+        return can_manage_tv(self.request)
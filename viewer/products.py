@@ -0,0 +1,134 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.urls import reverse
+
+from viewer.models import MobilePhone, Product, Television
+
+SYNC_BATCH_SIZE = 2000
+
+
+class ProductType:
+    """
+    Typ produktu ve spolecnem katalogu (viewer.models.Product) - odkud se berou spolecna pole
+    a kam vede odkaz. `search_code` rozlisuje typ v rowid vyhledavaciho indexu (viz viewer.search).
+    Novy typ produktu = novy model, FK na OrderItem a jedna registrace, vypisy, kategorie
+    a pokladna se nemeni.
+    """
+
+    def __init__(self, key, model, model_field, year_field, cart_url, search_code, detail_url=None, list_url=None):
+        self.key = key
+        self.model = model
+        self.search_code = search_code
+        self.model_field = model_field
+        self.year_field = year_field
+        self.cart_url = cart_url
+        self.detail_url = detail_url
+        self.list_url = list_url
+
+    @property
+    def source_fields(self):
+        return ('pk', 'brand_id', 'brand__brand_name', self.model_field, 'description', self.year_field, 'price',
+                'image', 'updated_at')
+
+    def catalog_values(self, row):
+        """Hodnoty radku Product z radku .values() zdrojove tabulky."""
+        return {
+            'product_type': self.key,
+            'object_id': row['pk'],
+            'content_type': ContentType.objects.get_for_model(self.model),
+            'brand_id': row['brand_id'],
+            'name': f'{row["brand__brand_name"]} {row[self.model_field]}',
+            'description': row['description'],
+            'released_year': row[self.year_field],
+            'price': row['price'],
+            'image': row['image'],
+            'updated_at': row['updated_at'],
+        }
+
+    def product_name(self, product):
+        """Nazev produktu jako v Product.name - u instance nactene pres order_products()."""
+        return f'{product.brand.brand_name} {getattr(product, self.model_field)}'
+
+    def order_products(self, pks):
+        """Produkty pro objednavku {pk: produkt} - aktualni cena a nazev ze zdrojove tabulky jednim dotazem."""
+        return (self.model.objects.select_related('brand')
+                .only('pk', 'price', self.model_field, 'brand__brand_name').in_bulk(list(pks)))
+
+    def get_url(self, object_id):
+        if self.detail_url:
+            return reverse(self.detail_url, args=[object_id])
+        return reverse(self.list_url)
+
+    def get_cart_url(self, object_id):
+        return reverse(self.cart_url, args=[object_id])
+
+
+PRODUCT_TYPES = {}
+
+
+def register_product_type(product_type):
+    PRODUCT_TYPES[product_type.key] = product_type
+    return product_type
+
+
+register_product_type(ProductType('television', Television, 'brand_model', 'tv_released_year',
+                                  cart_url='add_to_cart', search_code=0, detail_url='tv_detail'))
+register_product_type(ProductType('mobile_phone', MobilePhone, 'mobile_model', 'mobile_released_year',
+                                  cart_url='add_mobile_to_cart', search_code=1, list_url='mobile_list'))
+
+
+def product_type_for_model(model):
+    for product_type in PRODUCT_TYPES.values():
+        if product_type.model is model:
+            return product_type
+    raise KeyError(model)
+
+
+def sync_products(key, pks=None):
+    """
+    Prepise radky katalogu pro produkty `pks` daneho typu (None = vsechny, po davkach podle id)
+    vcetne kategorii. Pro hromadne operace bez signalu (bulk_create, import katalogu).
+    """
+    product_type = PRODUCT_TYPES[key]
+    source = product_type.model.objects.order_by('pk')
+    if pks is not None:
+        pks = sorted(pks)
+        for start in range(0, len(pks), SYNC_BATCH_SIZE):
+            _sync_batch(product_type, list(source.filter(pk__in=pks[start:start + SYNC_BATCH_SIZE])
+                                           .values(*product_type.source_fields)))
+        return
+    last_pk = 0
+    while True:
+        rows = list(source.filter(pk__gt=last_pk).values(*product_type.source_fields)[:SYNC_BATCH_SIZE])
+        if not rows:
+            break
+        last_pk = rows[-1]['pk']
+        _sync_batch(product_type, rows)
+
+
+@transaction.atomic
+def _sync_batch(product_type, rows):
+    if not rows:
+        return
+    Product.objects.bulk_create(
+        [Product(**product_type.catalog_values(row)) for row in rows],
+        update_conflicts=True, unique_fields=['product_type', 'object_id'],
+        update_fields=['brand_id', 'name', 'description', 'released_year', 'price', 'image', 'updated_at'],
+    )
+    sync_categories(product_type.key, [row['pk'] for row in rows])
+
+
+def sync_categories(key, pks):
+    """Kategorie produktu `pks` zkopiruje z M2M tabulky typu do Product.categories."""
+    field = PRODUCT_TYPES[key].model._meta.get_field('categories')
+    source_column = f'{field.m2m_field_name()}_id'
+    product_ids = dict(Product.objects.filter(product_type=key, object_id__in=pks).values_list('object_id', 'pk'))
+    through = Product.categories.through
+    through.objects.filter(product_id__in=product_ids.values()).delete()
+    through.objects.bulk_create(
+        through(product_id=product_ids[object_id], category_id=category_id)
+        for object_id, category_id in field.remote_field.through.objects.filter(**{f'{source_column}__in': pks})
+        .values_list(source_column, 'category_id')
+        if object_id in product_ids
+    )
+
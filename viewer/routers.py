@@ -0,0 +1,130 @@
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Cas, do kdy klient po svem zapisu cte z primarni databaze (read-your-writes)
+REPLICA_PIN_COOKIE = 'shop_db_pin'
+# Vzdy z primarni databaze - session se zaklada tesne pred pouzitim a replika by ji jeste nemusela mit
+PRIMARY_ONLY_APPS = {'sessions'}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+# Stav routovani aktualniho requestu {'replica': alias nebo None, 'wrote': bool}; mimo request (prikazy,
+# shell) je None a vse jde do primarni databaze
+_request_state = ContextVar('viewer_db_routing', default=None)
+
+
+class ReadReplicaMixin:
+    """
+    Pohled jen pro cteni - dotazy GET/HEAD jdou na repliku (SHOP_DB_REPLICAS), pokud klient
+    nedavno nezapisoval (viz ReplicaRoutingMiddleware). Zapis v pohledu prepne zbytek requestu
+    zpet na primarni databazi.
+    """
+    read_replica = True
+
+
+class ReplicaRouter:
+    """
+    Cteni pohledu s ReadReplicaMixin na repliku vybranou pro cely request (jeden request tak nevidi
+    dve repliky s ruznym zpozdenim), vse ostatni na 'default'. Repliky maji stejna data jako
+    primarni databaze, vazby mezi objekty jsou proto povolene a migrace bezi jen na 'default' -
+    schema na repliky prinasi replikace (lokalne sync_sqlite_replicas).
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is None or state['wrote'] or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        return state['replica'] or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['wrote'] = True
+        # Vzdy explicitne - jinak by Django zapsal objekt nacteny z repliky zpet do repliky
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.SHOP_DB_REPLICAS
+
+
+def _target(alias):
+    settings_dict = connections[alias].settings_dict
+    return settings_dict['ENGINE'], settings_dict.get('HOST'), settings_dict.get('PORT'), str(settings_dict['NAME'])
+
+
+def read_replicas():
+    """
+    Aliasy replik, ze kterych se da cist. Replika, ktera vede do stejne databaze jako primarni
+    (v testech je SQLite replika zrcadlem 'default' - TEST MIRROR), se vynecha.
+    """
+    primary = _target(DEFAULT_DB_ALIAS)
+    return [alias for alias in settings.SHOP_DB_REPLICAS if _target(alias) != primary]
+
+
+def is_pinned(request):
+    """Klient v poslednich SHOP_REPLICA_PIN_SECONDS zapisoval - cte z primarni databaze."""
+    try:
+        return float(request.COOKIES.get(REPLICA_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Vybere databazi pro cteni v requestu. Po kazdem requestu, ktery zapisoval (pokladna, profil,
+    kosik, prihlaseni) nebo byl POST, dostane klient cookie a po dobu SHOP_REPLICA_PIN_SECONDS
+    cte z primarni databaze - vidi svoji objednavku i kdyz replika jeste zaostava.
+    Patri pred SessionMiddleware, aby se zapocital i zapis session.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = {'replica': None, 'wrote': False}
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.pin(request, response, state)
+
+    async def __acall__(self, request):
+        state = {'replica': None, 'wrote': False}
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.pin(request, response, state)
+
+    def pin(self, request, response, state):
+        if (state['wrote'] or request.method not in SAFE_METHODS) and response.status_code < 500:
+            pin_seconds = settings.SHOP_REPLICA_PIN_SECONDS
+            response.set_cookie(REPLICA_PIN_COOKIE, str(int(time.time()) + pin_seconds), max_age=pin_seconds,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _request_state.get()
+        if (state is None or request.method not in ('GET', 'HEAD')
+                or not getattr(getattr(view_func, 'view_class', None), 'read_replica', False) or is_pinned(request)):
+            return
+        replicas = read_replicas()
+        if replicas:
+            state['replica'] = random.choice(replicas)
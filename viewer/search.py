@@ -0,0 +1,171 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from viewer.models import Television
+from viewer.products import PRODUCT_TYPES
+
+SQLITE_FTS_TABLE = 'viewer_product_search'
+
+# Rowid v indexu je `pk * ROWID_TYPES + ProductType.search_code`, takze smazani nebo prepsani
+# jednoho produktu je vyhledani podle primarniho klice, ne prochazeni celeho indexu.
+ROWID_TYPES = 16
+
+# Ciselnik -> produkty, jejichz text v indexu obsahuje jeho nazev: [(typ produktu, nazev FK pole)]
+LOOKUP_DEPENDENCIES = {
+    'Brand': [('television', 'brand'), ('mobile_phone', 'brand')],
+    'TVDisplayTechnology': [('television', 'display_technology')],
+    'TVDisplayResolution': [('television', 'display_resolution')],
+    'TVOperationSystem': [('television', 'operation_system')],
+    'MobileRAM': [('mobile_phone', 'ram')],
+    'MobileUserMemory': [('mobile_phone', 'user_memory')],
+    'MobileConstruction': [('mobile_phone', 'construction')],
+    'MobileDisplay': [('mobile_phone', 'display')],
+}
+
+
+def product_document(product):
+    """Text produktu pro index: (nazev, popis, specifikace)."""
+    if isinstance(product, Television):
+        specs = [product.display_technology.name, product.display_resolution.name, product.operation_system.name,
+                 f'{product.tv_screen_size}"', 'Smart TV' if product.smart_tv else '']
+        return f'{product.brand.brand_name} {product.brand_model}', product.description, ' '.join(specs)
+    specs = [str(product.ram), str(product.user_memory), product.construction.name, product.display.name]
+    return f'{product.brand.brand_name} {product.mobile_model}', product.description, ' '.join(specs)
+
+
+def search_tokens(query):
+    return re.findall(r'\w+', query.lower())[:10]
+
+
+class SearchBackend:
+    """Rozhrani vyhledavaciho indexu - `search` vraci [(typ produktu, pk)] serazene podle relevance."""
+
+    def index_products(self, product_type, pks):
+        pass
+
+    def index_objects(self, product_type, products):
+        """Indexace uz nactenych produktu (i s ciselniky) - bez dalsiho dotazu do databaze."""
+        pass
+
+    def remove_product(self, product_type, pk):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, limit=50):
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """Invertovany index v SQLite FTS5 (tabulka se zaklada migraci 0017)."""
+
+    batch_size = 1000
+
+    def _rowid(self, product_type, pk):
+        return pk * ROWID_TYPES + PRODUCT_TYPES[product_type].search_code
+
+    def _rows(self, product_type, products):
+        for product in products:
+            yield (self._rowid(product_type, product.pk), *product_document(product))
+
+    def _write(self, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {SQLITE_FTS_TABLE} (rowid, title, description, specs) VALUES (%s, %s, %s, %s)', rows
+            )
+
+    def index_products(self, product_type, pks):
+        model = PRODUCT_TYPES[product_type].model
+        self.index_objects(product_type, model.objects.for_detail().filter(pk__in=pks))
+
+    def index_objects(self, product_type, products):
+        self._write(list(self._rows(product_type, products)))
+
+    def remove_product(self, product_type, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = %s', [self._rowid(product_type, pk)])
+
+    @transaction.atomic
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_FTS_TABLE}')
+        for key, product_type in PRODUCT_TYPES.items():
+            batch = []
+            for row in self._rows(key, product_type.model.objects.for_detail().iterator(chunk_size=self.batch_size)):
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    self._write(batch)
+                    batch = []
+            if batch:
+                self._write(batch)
+
+    def search(self, query, limit=50):
+        tokens = search_tokens(query)
+        if not tokens:
+            return []
+        # Kazde slovo jako prefix ("oled"*), vsechna slova musi byt nalezena
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({SQLITE_FTS_TABLE}, 10.0, 1.0, 3.0) LIMIT %s',
+                [match, limit],
+            )
+            rowids = [row[0] for row in cursor.fetchall()]
+        codes = {product_type.search_code: key for key, product_type in PRODUCT_TYPES.items()}
+        return [(codes[rowid % ROWID_TYPES], rowid // ROWID_TYPES) for rowid in rowids]
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """Zalozni backend pro databaze bez FTS - `icontains` nad stejnymi poli, bez indexu."""
+
+    fields = {
+        'television': ('brand__brand_name', 'brand_model', 'description', 'display_technology__name',
+                       'display_resolution__name', 'operation_system__name'),
+        'mobile_phone': ('brand__brand_name', 'mobile_model', 'description', 'construction__name', 'display__name'),
+    }
+
+    def search(self, query, limit=50):
+        tokens = search_tokens(query)
+        if not tokens:
+            return []
+        results = []
+        for key, product_type in PRODUCT_TYPES.items():
+            condition = Q()
+            for token in tokens:
+                token_condition = Q()
+                for field in self.fields[key]:
+                    token_condition |= Q(**{f'{field}__icontains': token})
+                condition &= token_condition
+            pks = product_type.model.objects.filter(condition).values_list('pk', flat=True)[:limit]
+            results += [(key, pk) for pk in pks]
+        return results[:limit]
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    """Backend z nastaveni SHOP_SEARCH_BACKEND, jinak FTS5 na SQLite a zalozni backend jinde."""
+    path = getattr(settings, 'SHOP_SEARCH_BACKEND', None)
+    if path is None:
+        path = ('viewer.search.SQLiteFTSBackend' if connection.vendor == 'sqlite'
+                else 'viewer.search.DatabaseSearchBackend')
+    return import_string(path)()
+
+
+def search_products(query, limit=50):
+    """Vysledky vyhledavani jako dvojice (typ produktu, Television/MobilePhone) v poradi relevance."""
+    hits = get_search_backend().search(query, limit)
+    products = {}
+    for key, product_type in PRODUCT_TYPES.items():
+        pks = [pk for hit_type, pk in hits if hit_type == key]
+        if pks:
+            products[key] = product_type.model.objects.for_listing().in_bulk(pks)
+    return [(product_type, products[product_type][pk])
+            for product_type, pk in hits if pk in products.get(product_type, {})]
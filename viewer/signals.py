@@ -0,0 +1,189 @@
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from viewer.caching import bump_catalog_generation
+from viewer.categories import remove_from_category_tree, update_category_tree
+from viewer.facets import invalidate_facet_index
+from viewer.images import generate_variants
+from viewer.instrumentation import record_query
+from viewer.models import (Brand, Cart, Category, Profile, Television, TVDisplayResolution, TVDisplayTechnology,
+                           TVOperationSystem, MobilePhone, MobileRAM, MobileUserMemory, MobileConstruction,
+                           MobileDisplay)
+from viewer.permissions import bump_roles_version
+from viewer.products import PRODUCT_TYPES, product_type_for_model, sync_categories, sync_products
+from viewer.search import LOOKUP_DEPENDENCIES, get_search_backend
+from viewer.stock import release_cart
+
+
+@receiver([post_save, post_delete], sender=Television)
+@receiver([post_save, post_delete], sender=MobilePhone)
+@receiver([post_save, post_delete], sender=Brand)
+@receiver([post_save, post_delete], sender=TVDisplayTechnology)
+@receiver([post_save, post_delete], sender=TVDisplayResolution)
+@receiver([post_save, post_delete], sender=TVOperationSystem)
+@receiver([post_save, post_delete], sender=MobileRAM)
+@receiver([post_save, post_delete], sender=MobileUserMemory)
+@receiver([post_save, post_delete], sender=MobileConstruction)
+@receiver([post_save, post_delete], sender=MobileDisplay)
+@receiver(m2m_changed, sender=Television.categories.through)
+@receiver(m2m_changed, sender=MobilePhone.categories.through)
+def catalog_changed(sender, **kwargs):
+    """
+    Zmena produktu nebo ciselniku - index facet pro postranni panel se musi prepocitat
+    a stranky katalogu v cache pro neprihlasene jsou neplatne (nova generace).
+    """
+    if kwargs.get('action', 'post_').startswith('post_'):
+        invalidate_facet_index()
+        bump_catalog_generation()
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, **kwargs):
+    """Nova, prejmenovana nebo presunuta kategorie - upravi se strom v cache a stranky s navigaci."""
+    update_category_tree(instance)
+    bump_catalog_generation()
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    remove_from_category_tree(instance)
+    bump_catalog_generation()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Zmena clenstvi ve skupinach - nova verze roli dotcenych uzivatelu."""
+    if not action.startswith('post_'):
+        return
+    if not reverse:  # user.groups.add(...) / remove / clear
+        bump_roles_version([instance.pk])
+    elif pk_set is not None:  # group.user_set.add(...) / remove
+        bump_roles_version(pk_set)
+    else:  # group.user_set.clear() - vycistene uzivatele uz neznamenaji
+        bump_roles_version()
+
+
+@receiver([post_save, post_delete], sender=Group)
+def group_changed(sender, **kwargs):
+    """Nazev skupiny je role - prejmenovani nebo smazani zneplatni role vsech uzivatelu."""
+    bump_roles_version()
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def profile_role_changed(sender, instance, update_fields=None, **kwargs):
+    """Role v profilu - nova verze roli jen jeho uzivatele (ulozeni bez pole role se preskoci)."""
+    if update_fields is None or 'role' in update_fields:
+        bump_roles_version([instance.user_id])
+
+
+@receiver(post_save, sender=Television)
+@receiver(post_save, sender=MobilePhone)
+def index_product(sender, instance, **kwargs):
+    """Prubezna aktualizace vyhledavaciho indexu po ulozeni produktu."""
+    product_type = 'television' if sender is Television else 'mobile_phone'
+    get_search_backend().index_products(product_type, [instance.pk])
+
+
+@receiver(post_delete, sender=Television)
+@receiver(post_delete, sender=MobilePhone)
+def unindex_product(sender, instance, **kwargs):
+    product_type = 'television' if sender is Television else 'mobile_phone'
+    get_search_backend().remove_product(product_type, instance.pk)
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=TVDisplayTechnology)
+@receiver(post_save, sender=TVDisplayResolution)
+@receiver(post_save, sender=TVOperationSystem)
+@receiver(post_save, sender=MobileRAM)
+@receiver(post_save, sender=MobileUserMemory)
+@receiver(post_save, sender=MobileConstruction)
+@receiver(post_save, sender=MobileDisplay)
+def reindex_lookup_products(sender, instance, created, **kwargs):
+    """Prejmenovani znacky nebo specifikace - preindexuji se produkty, ktere ji pouzivaji."""
+    if created:
+        return
+    for product_type, field in LOOKUP_DEPENDENCIES[sender.__name__]:
+        model = PRODUCT_TYPES[product_type].model
+        pks = list(model.objects.filter(**{field: instance}).values_list('pk', flat=True))
+        if pks:
+            get_search_backend().index_products(product_type, pks)
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=TVDisplayTechnology)
+@receiver(post_save, sender=TVDisplayResolution)
+@receiver(post_save, sender=TVOperationSystem)
+@receiver(post_save, sender=MobileRAM)
+@receiver(post_save, sender=MobileUserMemory)
+@receiver(post_save, sender=MobileConstruction)
+@receiver(post_save, sender=MobileDisplay)
+def touch_lookup_products(sender, instance, created, **kwargs):
+    """Nazev ciselniku je soucasti stranky produktu - posunutim updated_at se zmeni ETag a Last-Modified."""
+    if created:
+        return
+    for product_type, field in LOOKUP_DEPENDENCIES[sender.__name__]:
+        products = PRODUCT_TYPES[product_type].model.objects.filter(**{field: instance})
+        products.update(updated_at=timezone.now())
+        if field == 'brand':  # nazev znacky je soucasti Product.name
+            sync_products(product_type, list(products.values_list('pk', flat=True)))
+
+
+@receiver(post_save, sender=Television)
+@receiver(post_save, sender=MobilePhone)
+def sync_catalog_product(sender, instance, **kwargs):
+    """Radek spolecneho katalogu (Product) kopiruje spolecna pole produktu."""
+    sync_products(product_type_for_model(sender).key, [instance.pk])
+
+
+@receiver(m2m_changed, sender=Television.categories.through)
+@receiver(m2m_changed, sender=MobilePhone.categories.through)
+def sync_catalog_categories(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Zmena kategorii produktu (z obou stran vazby) se propise do Product.categories."""
+    if not action.startswith('post_'):
+        return
+    product_model = model if reverse else type(instance)
+    key = product_type_for_model(product_model).key
+    if not reverse:
+        sync_categories(key, [instance.pk])
+    elif action == 'post_clear':
+        instance.products.through.objects.filter(category=instance, product__product_type=key).delete()
+    else:
+        sync_categories(key, pk_set)
+
+
+@receiver(pre_delete, sender=Cart)
+def release_cart_reservations(sender, instance, **kwargs):
+    """Smazany kosik (opusteny, smazany uzivatel) vrati rezervovane kusy do skladu."""
+    release_cart(instance.pk)
+
+
+@receiver(post_save, sender=Television)
+@receiver(post_save, sender=MobilePhone)
+@receiver(post_save, sender=Profile)
+def create_image_variants(sender, instance, **kwargs):
+    """Zmenseniny nahraneho obrazku se vytvori hned po ulozeni (existujici se preskoci)."""
+    image = instance.avatar if sender is Profile else instance.image
+    if image:
+        generate_variants(image.name)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Nastaveni SQLite z SHOP_SQLITE_PRAGMAS - PRAGMA plati pro spojeni (journal_mode=WAL trvale pro soubor)."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SHOP_SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Mereni dotazu pro viewer.instrumentation - jednou na objekt spojeni (znovu se pripojuje pri CONN_MAX_AGE)."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,183 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Exists, F, IntegerField, OuterRef, Q, Value, When
+from django.utils import timezone
+
+from viewer.cart import add_item, remove_item
+from viewer.models import CartItem, Stock
+from viewer.products import PRODUCT_TYPES
+
+SWEEP_BATCH_SIZE = 1000
+
+
+class OutOfStock(Exception):
+    """Nedostatek kusu na sklade - `shortages` je {(typ produktu, id): pocet volnych kusu}."""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(', '.join(f'{product_type} #{product_id}: {available} ks'
+                                   for (product_type, product_id), available in shortages.items()))
+
+
+def reservation_ttl():
+    return timedelta(seconds=settings.SHOP_RESERVATION_TTL)
+
+
+def lock_stock():
+    """
+    Zacatek zapisu do skladu - vola se jako prvni prikaz transakce. SQLite zamyka celou databazi
+    a transakci, ktera nejdriv cte a teprve pak zapisuje, pri soubehu nenecha cekat (hrozil by
+    deadlock) a hned vrati "database is locked". Prazdny UPDATE ziska zamek pro zapis predem,
+    ostatni transakce na nej pak pockaji (timeout databaze). Databaze se zamky radku
+    (PostgreSQL) zamykaji jen dotcene radky pres select_for_update().
+    """
+    if connection.vendor == 'sqlite':
+        table = connection.ops.quote_name(Stock._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {table} SET quantity = quantity WHERE 0')
+
+
+def _product_condition(keys):
+    product_ids = {}
+    for product_type, product_id in keys:
+        product_ids.setdefault(product_type, []).append(product_id)
+    condition = Q(pk__in=[])
+    for product_type, ids in product_ids.items():
+        condition |= Q(product_type=product_type, product_id__in=ids)
+    return condition
+
+
+def _item_key(television_id, mobile_phone_id):
+    return ('television', television_id) if television_id is not None else ('mobile_phone', mobile_phone_id)
+
+
+def take_stock(demand):
+    """
+    Odebere ze skladu kusy `demand` {(typ produktu, id): kusy} - vsechny, nebo zadne: pri nedostatku
+    vyvola OutOfStock. Radky skladu se zamknou v pevnem poradi, soubezne pokladny se stejnymi
+    produkty tak na sebe jen kratce pockaji a nezablokuji se navzajem. Vraci klice produktu, ktere
+    sklad sleduji. Vola se v transakci po lock_stock().
+    """
+    demand = {key: quantity for key, quantity in demand.items() if quantity > 0}
+    if not demand:
+        return set()
+    available = {
+        (product_type, product_id): quantity
+        for product_type, product_id, quantity in Stock.objects.select_for_update()
+        .filter(_product_condition(demand)).order_by('product_type', 'product_id')
+        .values_list('product_type', 'product_id', 'quantity')
+    }
+    shortages = {key: quantity for key, quantity in available.items() if quantity < demand[key]}
+    if shortages:
+        raise OutOfStock(shortages)
+    return_stock({key: -demand[key] for key in available})
+    return set(available)
+
+
+def return_stock(changes):
+    """
+    Zmeni zasoby o `changes` {(typ produktu, id): +-kusy} jednim UPDATE. Produkty bez skladu
+    se preskoci; zaporny stav by zastavil CHECK v databazi.
+    """
+    changes = {key: change for key, change in changes.items() if change}
+    if not changes:
+        return
+    Stock.objects.filter(_product_condition(changes)).update(
+        quantity=F('quantity') + Case(
+            *[When(product_type=product_type, product_id=product_id, then=Value(change))
+              for (product_type, product_id), change in changes.items()],
+            default=Value(0), output_field=IntegerField(),
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+@transaction.atomic
+def reserve_item(cart_id, product_type, product_id, quantity=1):
+    """
+    Prida produkt do kosiku a u sledovaneho produktu kusy rovnou odecte ze skladu jako rezervaci
+    kosiku na SHOP_RESERVATION_TTL. Pri nedostatku vyvola OutOfStock a kosik zustane beze zmeny.
+    """
+    lock_stock()
+    tracked = take_stock({(product_type, product_id): quantity})
+    add_item(cart_id, product_type, product_id, quantity)
+    if tracked:
+        CartItem.objects.filter(cart_id=cart_id, **{f'{product_type}_id': product_id}).update(
+            reserved=F('reserved') + quantity, reserved_until=timezone.now() + reservation_ttl())
+
+
+@transaction.atomic
+def release_item(cart_id, product_type, product_id):
+    """Odebere z kosiku jeden kus - rezervace nad nove mnozstvi se vrati do skladu."""
+    lock_stock()
+    lookup = {'cart_id': cart_id, f'{product_type}_id': product_id}
+    item = CartItem.objects.select_for_update().filter(**lookup).values('quantity', 'reserved').first()
+    if item is None:
+        return
+    remove_item(cart_id, product_type, product_id)
+    excess = item['reserved'] - min(item['reserved'], item['quantity'] - 1)
+    if excess:
+        return_stock({(product_type, product_id): excess})
+        CartItem.objects.filter(**lookup).update(reserved=F('reserved') - excess)
+
+
+def cart_reservations(cart_id):
+    """Rezervovane kusy kosiku {(typ produktu, id): kusy}; polozky se zamknou az do konce transakce."""
+    return {
+        _item_key(television_id, mobile_phone_id): reserved
+        for television_id, mobile_phone_id, reserved in CartItem.objects.select_for_update()
+        .filter(cart_id=cart_id, reserved__gt=0).values_list('television_id', 'mobile_phone_id', 'reserved')
+    }
+
+
+def _release(items):
+    """Vrati do skladu rezervace polozek `items` [(pk, television_id, mobile_phone_id, reserved)]."""
+    changes = Counter()
+    for _, television_id, mobile_phone_id, reserved in items:
+        changes[_item_key(television_id, mobile_phone_id)] += reserved
+    return_stock(changes)
+    CartItem.objects.filter(pk__in=[item[0] for item in items]).update(reserved=0, reserved_until=None)
+    return len(items)
+
+
+@transaction.atomic
+def release_cart(cart_id):
+    """Vsechny rezervace kosiku zpet do skladu (pred smazanim kosiku)."""
+    lock_stock()
+    items = list(CartItem.objects.select_for_update().filter(cart_id=cart_id, reserved__gt=0)
+                 .values_list('pk', 'television_id', 'mobile_phone_id', 'reserved'))
+    return _release(items) if items else 0
+
+
+def expire_reservations(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Vrati do skladu propadle rezervace, po davkach v kratkych transakcich. Polozky, ktere prave
+    zamkla pokladna, se na PostgreSQL preskoci (skip_locked) - po dokonceni nakupu uz rezervaci
+    nemaji, po neuspechu je najde dalsi beh. Vraci pocet uvolnenych polozek.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            lock_stock()
+            items = list(CartItem.objects.select_for_update(skip_locked=True)
+                         .filter(reserved__gt=0, reserved_until__lt=now).order_by('pk')
+                         .values_list('pk', 'television_id', 'mobile_phone_id', 'reserved')[:batch_size])
+            if not items:
+                return released
+            released += _release(items)
+
+
+def purge_orphaned_stock():
+    """
+    Smaze sklad smazanych produktu. Id produktu se znovu nepouzivaji, takze osirely radek nicemu
+    nevadi - maze se hromadne tady misto signalu pri kazdem smazani produktu.
+    """
+    removed = 0
+    for key, product_type in PRODUCT_TYPES.items():
+        removed += Stock.objects.filter(product_type=key).exclude(
+            Exists(product_type.model.objects.filter(pk=OuterRef('product_id')))).delete()[0]
+    return removed
@@ -0,0 +1,37 @@
+"""Ulohy na pozadi (viewer.jobs) - registruji se pri startu aplikace (viewer.apps)."""
+import logging
+
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+
+from viewer.feeds import rebuild_feed
+from viewer.jobs import register_task
+from viewer.models import Order, Profile
+
+logger = logging.getLogger(__name__)
+
+
+@register_task('order_confirmation', per_order=True)
+def send_order_confirmation(order_id):
+    """
+    Potvrzeni objednavky kanalem, ktery si zakaznik zvolil v profilu. E-mail se posila hned,
+    pro postu a telefon zatim neni napojena sluzba - potvrzeni se jen zaznamena do logu.
+    """
+    order = Order.objects.select_related('user').filter(order_id=order_id).first()
+    if order is None:  # objednavka mezitim smazana
+        logger.info('Order %s no longer exists, confirmation skipped.', order_id)
+        return
+    channel = Profile.objects.filter(user=order.user).values_list('communication_channel', flat=True).first()
+    if (channel or 'EMAIL') != 'EMAIL' or not order.user.email:
+        logger.info('Order %s confirmation via %s left for manual processing.', order_id, channel or 'EMAIL')
+        return
+    send_mail(f'Potvrzení objednávky {order.order_id}',
+              render_to_string('order/confirmation_email.txt', {'order': order}),
+              None, [order.user.email])
+
+
+@register_task('refresh_feed')
+def refresh_feed(feed_format):
+    """Pregenerovani zastaraleho feedu (viz feeds.ensure_feed); pokud ho prave generuje jiny proces, nic nedela."""
+    if rebuild_feed(feed_format) is None:
+        logger.info('Feed %s is being generated elsewhere, refresh skipped.', feed_format)
@@ -0,0 +1,41 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from viewer.images import get_manifest
+
+register = template.Library()
+
+
+def _srcset(variants, extension):
+    return ', '.join(f'{default_storage.url(v["name"])} {v["width"]}w' for v in variants if v['format'] == extension)
+
+
+@register.simple_tag
+def responsive_image(image, width, alt='', sizes=None, css_class=''):
+    """
+    Obrazek produktu jako <picture> se zmenseninami ve WebP a JPEG (srcset) a s atributy
+    width/height podle pomeru stran originalu, aby prohlizec vybral nejmensi dostatecny soubor.
+
+    Pouziti: {% responsive_image television.image 350 alt="..." %}
+    """
+    if not image:
+        return ''
+    sizes = sizes or f'{width}px'
+    manifest = get_manifest(image.name)
+    if manifest is None:
+        return format_html('<img src="{}" alt="{}" width="{}" class="{}" loading="lazy">',
+                           image.url, alt, width, css_class)
+
+    height = round(manifest['height'] * int(width) / manifest['width'])
+    jpeg_variants = [v for v in manifest['variants'] if v['format'] == 'jpeg']
+    fallback = next((v for v in jpeg_variants if v['width'] >= int(width)), jpeg_variants[-1])
+    sources = format_html_join(
+        '', '<source type="image/{}" srcset="{}" sizes="{}">',
+        ((extension, _srcset(manifest['variants'], extension), sizes) for extension in ('webp', 'jpeg'))
+    )
+    return format_html(
+        '<picture>{}<img src="{}" alt="{}" width="{}" height="{}" class="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        sources, default_storage.url(fallback['name']), alt, width, height, css_class,
+    )
@@ -1,3 +1,1517 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.messages import constants
+from django.contrib.messages.storage.base import Message
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.template import Context, Template
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection
+from django.http import HttpRequest
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from asgiref.sync import sync_to_async
+from PIL import Image
+
+from viewer.async_views import AsyncTVListView
+from viewer.benchmark import find_regressions, run_benchmark, seed_catalog
+from viewer.categories import CATEGORY_TREE_VERSION_CACHE_KEY, category_tree
+from viewer.cart import cart_lines
+from viewer.checkout import ProductsUnavailable, place_order
+from viewer.facets import tv_facets
+from viewer.feeds import ensure_feed, refresh_feed_entries, write_feed
+from viewer.images import get_manifest
+from viewer.jobs import (TASKS, Task, claim_jobs, enqueue, enqueue_order_tasks, release_stale_jobs, retry_delay,
+                         run_job, work)
+from viewer.instrumentation import REGISTRY, JSONFormatter, QueryRecorder, sql_fingerprint
+from viewer.order_status import (InvalidTransition, allowed_sources, can_transition, transition_order,
+                                  transition_orders)
+from viewer.permissions import roles_version
+from viewer.products import sync_products
+from viewer.routers import REPLICA_PIN_COOKIE, ReplicaRouter
+from viewer.search import search_products
+from viewer.stock import OutOfStock
+from viewer.models import (Brand, Television, TVDisplayResolution, TVDisplayTechnology, TVOperationSystem, MobilePhone,
+                           MobileRAM, MobileUserMemory, MobileConstruction, MobileDisplay, Order, OrderItem, Profile,
+                           Cart, CartItem, FeedEntry, Category, Product, Stock, Job, OrderStatusChange)
+
+
+def create_televisions(count, **lookups):
+    """Hromadne vytvori `count` televizi, aby testy mohly porovnat maly a velky katalog."""
+    start = Television.objects.count()  # nazev modelu je v ramci znacky unikatni
+    televisions = Television.objects.bulk_create(
+        Television(brand_model=f'Model {start + i}', tv_released_year=2020, tv_screen_size=55, refresh_rate=100,
+                   description='Popis televize', price=10000 + i, **lookups)
+        for i in range(count)
+    )
+    # bulk_create neposila signaly - spolecny katalog se doplni stejne jako pri importu
+    sync_products('television', [television.pk for television in televisions])
+
+
+def create_mobiles(count, brand):
+    lookups = {
+        'ram': MobileRAM.objects.get_or_create(size=8)[0],
+        'user_memory': MobileUserMemory.objects.get_or_create(size=128)[0],
+        'construction': MobileConstruction.objects.get_or_create(name='Dotykový')[0],
+        'display': MobileDisplay.objects.get_or_create(name='AMOLED')[0],
+    }
+    mobiles = MobilePhone.objects.bulk_create(
+        MobilePhone(brand=brand, mobile_model=f'Phone {i}', mobile_released_year=2023, mobile_screen_size='0.61',
+                    price=5000 + i, **lookups)
+        for i in range(count)
+    )
+    sync_products('mobile_phone', [mobile.pk for mobile in mobiles])
+
+
+class CatalogQueryCountTests(TestCase):
+    """Kazdy pohled katalogu musi mit stejny pocet dotazu pro 10 i 10 000 televizi (zadne N+1)."""
+
+    SMALL = 10
+    LARGE = 10_000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.lookups = {
+            'brand': Brand.objects.create(brand_name='Samsung'),
+            'display_technology': TVDisplayTechnology.objects.create(name='OLED'),
+            'display_resolution': TVDisplayResolution.objects.create(name='4K Ultra HD'),
+            'operation_system': TVOperationSystem.objects.create(name='Android TV'),
+        }
+
+    def count_queries(self, url):
+        # Vzdy studena cache - mereni zahrnuje i sestaveni indexu facet
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assert_constant_queries(self, url, expected):
+        create_televisions(self.SMALL, **self.lookups)
+        self.assertEqual(self.count_queries(url), expected)
+        create_televisions(self.LARGE - self.SMALL, **self.lookups)
+        self.assertEqual(self.count_queries(url), expected)
+
+    def test_tv_list(self):
+        # validatory (ETag) + vypis + agregace facet + 4 ciselniky + strom kategorii do navigace
+        self.assert_constant_queries(reverse('tv_list'), 8)
+
+    def test_tv_list_with_filters(self):
+        self.assert_constant_queries(reverse('tv_list') + '?brand=Samsung&technology=OLED&resolution=4K+Ultra+HD', 8)
+
+    def test_tv_list_sidebar_from_cached_facets(self):
+        create_televisions(self.SMALL, **self.lookups)
+        self.client.get(reverse('tv_list'))
+        with self.assertNumQueries(2):
+            self.client.get(reverse('tv_list') + '?brand=Samsung')
+
+    def test_filtered_views(self):
+        for url in (reverse('filtered_smart_tv', kwargs={'smart_tv': 'smart'}),
+                    reverse('filtered_tv_by_technology', kwargs={'technology': 'OLED'}),
+                    reverse('filtered_tv_by_resolution', kwargs={'resolution': '4K Ultra HD'}),
+                    reverse('filtered_tv_by_op_system', kwargs={'op_system': 'Android TV'})):
+            with self.subTest(url=url):
+                Television.objects.all().delete()
+                self.assert_constant_queries(url, 3)
+
+    def test_tv_detail(self):
+        create_televisions(self.LARGE, **self.lookups)
+        television = Television.objects.first()
+        self.assertEqual(self.count_queries(reverse('tv_detail', args=[television.pk])), 3)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        lookups = {
+            'brand': Brand.objects.create(brand_name='LG'),
+            'display_technology': TVDisplayTechnology.objects.create(name='LED'),
+            'display_resolution': TVDisplayResolution.objects.create(name='Full HD'),
+            'operation_system': TVOperationSystem.objects.create(name='webOS'),
+        }
+        # Opakujici se ceny a roky, aby se overilo rozhodovani podle id pri shode
+        Television.objects.bulk_create(
+            Television(brand_model=f'Model {i}', tv_released_year=2015 + i % 5, tv_screen_size=43,
+                       refresh_rate=60, price=1000 * (i % 7), **lookups)
+            for i in range(45)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, sort):
+        pks, url = [], reverse('tv_list') + f'?sort={sort}'
+        while url:
+            response = self.client.get(url)
+            pks += [television.pk for television in response.context['object_list']]
+            url = response.context['next_page_url']
+        return pks
+
+    def test_pages_cover_catalog_in_order(self):
+        for sort, ordering in (('price', ('price', 'id')), ('-price', ('-price', '-id')),
+                               ('year', ('tv_released_year', 'id')), ('-year', ('-tv_released_year', '-id'))):
+            with self.subTest(sort=sort):
+                expected = list(Television.objects.order_by(*ordering).values_list('pk', flat=True))
+                self.assertEqual(self.walk(sort), expected)
+
+    def test_previous_page_link(self):
+        first = self.client.get(reverse('tv_list') + '?sort=-price')
+        self.assertIsNone(first.context['previous_page_url'])
+        second = self.client.get(first.context['next_page_url'])
+        back = self.client.get(second.context['previous_page_url'])
+        self.assertEqual(list(back.context['object_list']), list(first.context['object_list']))
+        self.assertIsNone(back.context['previous_page_url'])
+
+    def test_invalid_cursor_returns_404(self):
+        self.assertEqual(self.client.get(reverse('tv_list') + '?cursor=nesmysl').status_code, 404)
+
+    def test_tampered_cursor_returns_404(self):
+        for payload in ({'k': ['abc', 1]}, {'k': 5}, {'k': [1, 'x']}, {'k': [{'a': 1}, 1]}, [1, 2]):
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+            with self.subTest(payload=payload):
+                self.assertEqual(self.client.get(reverse('tv_list') + f'?cursor={cursor}').status_code, 404)
+                self.assertEqual(self.client.get(reverse('api_televisions') + f'?cursor={cursor}').status_code, 400)
+
+
+class FacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        samsung, lg = Brand.objects.create(brand_name='Samsung'), Brand.objects.create(brand_name='LG')
+        Brand.objects.create(brand_name='JVC')
+        oled, qled = TVDisplayTechnology.objects.create(name='OLED'), TVDisplayTechnology.objects.create(name='QLED')
+        resolution = TVDisplayResolution.objects.create(name='4K Ultra HD')
+        op_system = TVOperationSystem.objects.create(name='Tizen')
+        lookups = {'display_resolution': resolution, 'operation_system': op_system}
+        create_televisions(3, brand=samsung, display_technology=qled, **lookups)
+        create_televisions(2, brand=lg, display_technology=oled, **lookups)
+        create_televisions(1, brand=samsung, display_technology=oled, **lookups)
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self, facets, param):
+        facet = next(facet for facet in facets if facet['param'] == param)
+        return {option['value']: option['count'] for option in facet['options']}
+
+    def test_counts_without_selection(self):
+        facets = tv_facets({})
+        self.assertEqual(self.counts(facets, 'brand'), {'JVC': 0, 'LG': 2, 'Samsung': 4})
+        self.assertEqual(self.counts(facets, 'technology'), {'OLED': 3, 'QLED': 3})
+
+    def test_counts_follow_other_facets(self):
+        facets = tv_facets({'technology': ['OLED']})
+        # Znacky se zuzi podle technologie, technologie samotna ukazuje i nezaskrtnute hodnoty
+        self.assertEqual(self.counts(facets, 'brand'), {'JVC': 0, 'LG': 2, 'Samsung': 1})
+        self.assertEqual(self.counts(facets, 'technology'), {'OLED': 3, 'QLED': 3})
+
+    def test_index_invalidated_on_save(self):
+        tv_facets({})
+        television = Television.objects.filter(brand__brand_name='LG').first()
+        television.brand = Brand.objects.get(brand_name='JVC')
+        television.save()
+        self.assertEqual(self.counts(tv_facets({}), 'brand'), {'JVC': 1, 'LG': 1, 'Samsung': 4})
+
+
+class ShopRolesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(name='tv_admin')
+        cls.admin = User.objects.create_user('spravce', password='heslo12345')
+        cls.admin.groups.add(cls.group)
+        cls.customer = User.objects.create_user('zakaznik', password='heslo12345')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_only_tv_admin_can_create(self):
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(reverse('tv_create')).status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('tv_create')).status_code, 200)
+
+    def test_roles_cached_between_requests(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse('tv_list'))
+        # session + uzivatel + validatory + vypis, role uz jsou v cache
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('tv_list'))
+        self.assertContains(response, reverse('tv_create'))
+
+    def test_group_change_invalidates_roles(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('tv_create')).status_code, 200)
+        self.admin.groups.remove(self.group)
+        self.assertEqual(self.client.get(reverse('tv_create')).status_code, 403)
+        self.group.user_set.add(self.admin)
+        self.assertEqual(self.client.get(reverse('tv_create')).status_code, 200)
+
+    def test_profile_change_invalidates_only_its_user(self):
+        admin_version = roles_version(self.admin.pk)
+        profile = Profile.objects.create(user=self.customer, role='ADMINISTRATOR')
+        self.assertEqual(roles_version(self.admin.pk), admin_version)
+        self.client.force_login(self.customer)
+        self.client.get(reverse('tv_list'))
+        self.assertIn('ADMINISTRATOR', self.client.get(reverse('tv_list')).context['shop_roles'])
+        profile.role = 'USER'
+        profile.save()
+        self.assertNotIn('ADMINISTRATOR', self.client.get(reverse('tv_list')).context['shop_roles'])
+
+
+class CheckoutTests(TestCase):
+    """Pocet dotazu pokladny nesmi rust s velikosti kosiku (1, 50 a 500 polozek)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(brand_name='Panasonic')
+        create_televisions(500, brand=brand, display_technology=TVDisplayTechnology.objects.create(name='LED'),
+                           display_resolution=TVDisplayResolution.objects.create(name='Full HD'),
+                           operation_system=TVOperationSystem.objects.create(name='my Home Screen'))
+        create_mobiles(1, brand)
+        cls.user = User.objects.create_user('kupujici', password='heslo12345')
+        Profile.objects.create(user=cls.user, first_name='Jan', last_name='Novák')
+
+    def checkout(self, line_count):
+        self.client.force_login(self.user)
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cart, television_id=pk, quantity=2)
+             for pk in Television.objects.values_list('pk', flat=True)[:line_count]] +
+            [CartItem(cart=cart, mobile_phone=MobilePhone.objects.get(), quantity=1)]
+        )
+        session = self.client.session
+        session['cart_id'] = cart.pk
+        session.save()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('checkout'), {'first_name': 'Jan', 'last_name': 'Novák'})
+        self.assertEqual(response.status_code, 302)
+        order = Order.objects.latest('order_date')
+        self.assertEqual(order.television.count(), line_count)
+        self.assertEqual(order.mobile_phone.count(), 1)
+        self.assertEqual(order.items.count(), line_count + 1)
+        expected_total = sum(item.unit_price * item.quantity for item in order.items.all())
+        self.assertEqual(order.total, expected_total)
+        self.assertEqual(order.items.filter(television__isnull=False).first().quantity, 2)
+        self.assertNotIn('cart_id', self.client.session)
+        self.assertFalse(Cart.objects.filter(pk=cart.pk).exists())
+        return len(ctx.captured_queries)
+
+    def test_constant_queries(self):
+        counts = {line_count: self.checkout(line_count) for line_count in (1, 50, 500)}
+        # SQLite vklada max. 999 parametru na prikaz, 500 radku se tedy zapise po davkach
+        self.assertEqual(counts[50], counts[1])
+        self.assertEqual(counts[500], counts[1] + self.extra_batches(OrderItem, 501) +
+                         self.extra_batches(Order.television.through, 500))
+
+    def test_price_taken_from_product_table(self):
+        television = Television.objects.first()
+        Television.objects.filter(pk=television.pk).update(price=Decimal('1.50'))  # bez signalu, Product ma starou cenu
+        order = place_order(Order(user=self.user), [('television', television.pk, 2)])
+        item = order.items.get()
+        self.assertEqual(item.unit_price, Decimal('1.50'))
+        self.assertEqual(item.product_name, f'Panasonic {television.brand_model}')
+        self.assertEqual(order.total, Decimal('3.00'))
+
+    def test_missing_product_returns_to_cart(self):
+        self.client.force_login(self.user)
+        cart = Cart.objects.create(user=self.user)
+        television = Television.objects.first()
+        CartItem.objects.create(cart=cart, television=television, quantity=1)
+        CartItem.objects.create(cart=cart, mobile_phone=MobilePhone.objects.get(), quantity=1)
+        session = self.client.session
+        session['cart_id'] = cart.pk
+        session.save()
+        lines = list(cart_lines(cart.pk))
+        television.delete()  # pokladna uz ma polozky kosiku nactene
+        with mock.patch('viewer.views.cart_lines', return_value=lines):
+            response = self.client.post(reverse('checkout'), {'first_name': 'Jan', 'last_name': 'Novák'}, follow=True)
+        self.assertRedirects(response, reverse('view_cart'))
+        self.assertContains(response, 'už nejsou v nabídce')
+        self.assertFalse(Order.objects.exists())
+        self.assertTrue(CartItem.objects.filter(cart=cart).exists())
+        with self.assertRaises(ProductsUnavailable):
+            place_order(Order(user=self.user), lines)
+
+    def test_product_type_without_order_item_fails(self):
+        with self.assertRaises(LookupError):
+            place_order(Order(user=self.user), [('tablet', 1, 1)])
+        self.assertFalse(Order.objects.exists())
+
+    def extra_batches(self, model, rows):
+        fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+        return -(-rows // connection.ops.bulk_batch_size(fields, [None] * rows)) - 1
+
+
+class CartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(brand_name='Sony')
+        create_televisions(2, brand=brand, display_technology=TVDisplayTechnology.objects.create(name='LED'),
+                           display_resolution=TVDisplayResolution.objects.create(name='Full HD'),
+                           operation_system=TVOperationSystem.objects.create(name='Google TV'))
+        create_mobiles(1, brand)
+        cls.television, cls.other_television = Television.objects.order_by('pk')
+        cls.mobile = MobilePhone.objects.get()
+        cls.user = User.objects.create_user('nakupujici', password='heslo12345')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_add_upserts_single_row(self):
+        for _ in range(3):
+            self.client.get(reverse('add_to_cart', args=[self.television.pk]))
+        self.client.get(reverse('add_mobile_to_cart', args=[self.mobile.pk]))
+        cart_id = self.client.session['cart_id']
+        self.assertEqual(CartItem.objects.get(cart_id=cart_id, television=self.television).quantity, 3)
+        self.assertEqual(CartItem.objects.get(cart_id=cart_id, mobile_phone=self.mobile).quantity, 1)
+        # session nese jen ukazatel na kosik
+        self.assertNotIn('cart', self.client.session)
+
+    def test_add_unknown_product_returns_404(self):
+        self.assertEqual(self.client.get(reverse('add_to_cart', args=[0])).status_code, 404)
+
+    def test_remove_decrements_then_deletes(self):
+        self.client.get(reverse('add_to_cart', args=[self.television.pk]))
+        self.client.get(reverse('add_to_cart', args=[self.television.pk]))
+        self.client.post(reverse('remove_from_cart', args=[self.television.pk]))
+        self.assertEqual(CartItem.objects.get().quantity, 1)
+        self.client.post(reverse('remove_from_cart', args=[self.television.pk]))
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_totals_computed_in_database(self):
+        self.client.get(reverse('add_to_cart', args=[self.television.pk]))
+        self.client.get(reverse('add_to_cart', args=[self.television.pk]))
+        self.client.get(reverse('add_mobile_to_cart', args=[self.mobile.pk]))
+        response = self.client.get(reverse('view_cart'))
+        self.assertEqual(response.context['total_items'], 3)
+        self.assertEqual(response.context['total_price'], 2 * self.television.price + self.mobile.price)
+
+    def test_legacy_session_cart_is_migrated(self):
+        session = self.client.session
+        session['cart'] = {str(self.other_television.pk): {'name': 'Sony', 'model': 'x', 'price': '1', 'quantity': 2}}
+        session.save()
+        self.client.get(reverse('add_to_cart', args=[self.television.pk]))
+        self.assertEqual(CartItem.objects.get(television=self.other_television).quantity, 2)
+        self.assertNotIn('cart', self.client.session)
+
+
+class OrderHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('stalyzakaznik', password='heslo12345')
+        other = User.objects.create_user('jiny', password='heslo12345')
+        # bulk_create - vsechny objednavky maji stejne datum, poradi rozhoduje id
+        Order.objects.bulk_create(
+            Order(user=cls.user, status='delivered' if i % 3 else 'processing') for i in range(50)
+        )
+        Order.objects.bulk_create(Order(user=other) for _ in range(5))
+
+    def walk(self, url):
+        self.client.force_login(self.user)
+        pks = []
+        while url:
+            response = self.client.get(url)
+            pks += [order.pk for order in response.context['orders']]
+            url = response.context['next_page_url']
+        return pks
+
+    def test_pages_newest_first(self):
+        expected = list(Order.objects.filter(user=self.user)
+                        .order_by('-order_date', '-id').values_list('pk', flat=True))
+        self.assertEqual(self.walk(reverse('order_list')), expected)
+
+    def test_status_filter(self):
+        expected = list(Order.objects.filter(user=self.user, status='processing')
+                        .order_by('-order_date', '-id').values_list('pk', flat=True))
+        self.assertEqual(self.walk(reverse('order_list') + '?status=processing'), expected)
+        self.assertEqual(len(self.walk(reverse('order_list') + '?status=nesmysl')), 50)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(brand_name='Philips')
+        cls.oled = TVDisplayTechnology.objects.create(name='OLED')
+        cls.lookups = {
+            'display_resolution': TVDisplayResolution.objects.create(name='4K Ultra HD'),
+            'operation_system': TVOperationSystem.objects.create(name='Android TV'),
+        }
+
+    def create_television(self, model, description='', technology=None):
+        return Television.objects.create(brand=self.brand, brand_model=model, tv_released_year=2024, tv_screen_size=65,
+                                         refresh_rate=120, display_technology=technology or self.oled,
+                                         description=description, **self.lookups)
+
+    def search(self, query):
+        response = self.client.get(reverse('search'), {'q': query})
+        return [product.pk for _, product in response.context['results']]
+
+    def test_index_updated_from_signals(self):
+        television = self.create_television('65OLED809', 'Ambilight a výborná černá')
+        self.assertEqual(self.search('philips oled'), [television.pk])
+        # bez diakritiky i jako prefix slova
+        self.assertEqual(self.search('cern'), [television.pk])
+        television.description = 'Nový popis'
+        television.save()
+        self.assertEqual(self.search('cerna'), [])
+        television.delete()
+        self.assertEqual(self.search('philips'), [])
+
+    def test_lookup_rename_reindexes_products(self):
+        television = self.create_television('55PUS8500')
+        self.brand.brand_name = 'Sharp'
+        self.brand.save()
+        self.assertEqual(self.search('sharp'), [television.pk])
+
+    def test_rebuild_command(self):
+        create_televisions(3, brand=self.brand, display_technology=self.oled, **self.lookups)
+        self.assertEqual(self.search('philips'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('philips')), 3)
+
+
+class ImageVariantTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.lookups = {
+            'brand': Brand.objects.create(brand_name='TCL'),
+            'display_technology': TVDisplayTechnology.objects.create(name='QLED'),
+            'display_resolution': TVDisplayResolution.objects.create(name='4K Ultra HD'),
+            'operation_system': TVOperationSystem.objects.create(name='Google TV'),
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    def upload(self, size=(1200, 800)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'navy').save(buffer, 'JPEG')
+        return Television.objects.create(brand_model='55C805', tv_released_year=2024, tv_screen_size=55,
+                                         refresh_rate=144, image=SimpleUploadedFile('tv.jpg', buffer.getvalue()),
+                                         **self.lookups)
+
+    def test_variants_created_on_upload(self):
+        television = self.upload()
+        manifest = get_manifest(television.image.name)
+        self.assertEqual((manifest['width'], manifest['height']), (1200, 800))
+        self.assertEqual({(v['width'], v['format']) for v in manifest['variants']},
+                         {(w, f) for w in (160, 320, 640, 960) for f in ('webp', 'jpeg')})
+        for variant in manifest['variants']:
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, variant['name'])))
+
+    def test_template_tag_emits_srcset_and_dimensions(self):
+        television = self.upload()
+        html = Template('{% load product_images %}{% responsive_image image 350 alt="TV" %}').render(
+            Context({'image': television.image}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('_320w.webp 320w', html)
+        self.assertIn('width="350" height="233"', html)
+        self.assertIn('_640w.jpeg', html)
+
+    def test_backfill_command(self):
+        television = self.upload(size=(500, 500))
+        shutil.rmtree(os.path.join(self.media_root, 'variants'))
+        call_command('generate_image_variants', workers=2, stdout=StringIO())
+        manifest = get_manifest(television.image.name)
+        self.assertEqual([v['width'] for v in manifest['variants']], [160, 160, 320, 320])
+        for variant in manifest['variants']:
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, variant['name'])))
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lookups = {
+            'brand': Brand.objects.create(brand_name='Hisense'),
+            'display_technology': TVDisplayTechnology.objects.create(name='ULED'),
+            'display_resolution': TVDisplayResolution.objects.create(name='4K Ultra HD'),
+            'operation_system': TVOperationSystem.objects.create(name='VIDAA'),
+        }
+        create_televisions(3, **cls.lookups)
+        cls.user = User.objects.create_user('prihlaseny', password='heslo12345')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_pages_served_from_cache(self):
+        television = Television.objects.first()
+        for url in (reverse('home'), reverse('tv_list') + '?brand=Hisense&sort=-price',
+                    reverse('tv_detail', args=[television.pk]), reverse('mobile_list'),
+                    reverse('filtered_tv_by_technology', kwargs={'technology': 'ULED'})):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                # stranka v cache se jeste overi jednim dotazem na validatory
+                with self.assertNumQueries(1):
+                    second = self.client.get(url)
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(second['Content-Type'], first['Content-Type'])
+
+    def test_change_from_other_process_not_served_from_cache(self):
+        other = Brand.objects.create(brand_name='Jina')
+        url = reverse('tv_list')
+        self.client.get(url)
+        # Zmena bez signalu (QuerySet.update, jiny proces) - generace katalogu v teto cache se nezvysi
+        Television.objects.filter(pk=Television.objects.first().pk).update(
+            brand_model='Zmeneny jinde', brand=other, updated_at=timezone.now() + timedelta(seconds=1))
+        response = self.client.get(url)
+        self.assertContains(response, 'Zmeneny jinde')
+        brands = next(facet for facet in response.context['facets'] if facet['param'] == 'brand')
+        self.assertEqual({option['value']: option['count'] for option in brands['options']}, {'Hisense': 2, 'Jina': 1})
+
+    def test_pending_messages_not_cached(self):
+        url = reverse('tv_list')
+        self.client.get(url)
+        self.client.cookies['messages'] = CookieStorage(HttpRequest())._encode([Message(constants.ERROR, 'Zprava')])
+        self.assertContains(self.client.get(url), 'Zprava')
+        self.assertNotContains(self.client.get(url), 'Zprava')
+
+    def test_filter_order_is_normalized(self):
+        self.client.get(reverse('tv_list') + '?brand=Hisense&brand=LG&sort=price')
+        with self.assertNumQueries(1):
+            self.client.get(reverse('tv_list') + '?sort=price&brand=LG&brand=Hisense&cursor=')
+
+    def test_catalog_change_invalidates_pages(self):
+        television = Television.objects.first()
+        url = reverse('tv_detail', args=[television.pk])
+        self.client.get(url)
+        television.brand_model = 'Přejmenovaný model'
+        television.save()
+        self.assertContains(self.client.get(url), 'Přejmenovaný model')
+        self.client.get(reverse('tv_list'))
+        Brand.objects.filter(pk=self.lookups['brand'].pk).get().save()
+        with self.assertNumQueries(7):
+            self.client.get(reverse('tv_list'))
+
+    def test_authenticated_users_not_cached(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('tv_list'))
+        response = self.client.get(reverse('tv_list'))
+        self.assertContains(response, reverse('view_cart'))
+
+    def test_file_based_cache_backend(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}):
+            self.client.get(reverse('mobile_list'))
+            with self.assertNumQueries(1):
+                self.client.get(reverse('mobile_list'))
+            create_mobiles(1, self.lookups['brand'])
+            MobilePhone.objects.get().save()
+            self.assertContains(self.client.get(reverse('mobile_list')), 'Phone 0')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lookups = {
+            'brand': Brand.objects.create(brand_name='Philips'),
+            'display_technology': TVDisplayTechnology.objects.create(name='OLED'),
+            'display_resolution': TVDisplayResolution.objects.create(name='4K Ultra HD'),
+            'operation_system': TVOperationSystem.objects.create(name='Google TV'),
+        }
+        create_televisions(3, **cls.lookups)
+        cls.user = User.objects.create_user('kupujici', password='heslo12345')
+        cls.order = Order.objects.create(user=cls.user, status='submitted')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeat_visit_gets_304(self):
+        television = Television.objects.first()
+        for url in (reverse('tv_list') + '?brand=Philips', reverse('tv_detail', args=[television.pk]),
+                    reverse('mobile_list')):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                with self.assertNumQueries(1):
+                    repeated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(repeated.status_code, 304)
+                self.assertEqual(repeated.content, b'')
+
+    def test_product_change_changes_etag(self):
+        television = Television.objects.first()
+        url = reverse('tv_detail', args=[television.pk])
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        Brand.objects.get().save()  # prejmenovani ciselniku posune updated_at produktu
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        listing_etag = self.client.get(reverse('tv_list'))['ETag']
+        Television.objects.last().delete()
+        self.assertNotEqual(self.client.get(reverse('tv_list'))['ETag'], listing_etag)
+
+    def test_detail_etag_follows_catalog_and_category_tree(self):
+        url = reverse('tv_detail', args=[Television.objects.first().pk])
+        etag = self.client.get(url)['ETag']
+        TVOperationSystem.objects.create(name='webOS')  # novy ciselnik, produkt se nemeni
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        cache.incr(CATEGORY_TREE_VERSION_CACHE_KEY)  # navigace kategorii v hlavicce
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_invalid_detail_pk_returns_404(self):
+        self.assertEqual(self.client.get('/tv/abc').status_code, 404)
+        self.assertEqual(self.client.get(reverse('tv_detail', args=[0])).status_code, 404)
+
+    def test_order_detail_private(self):
+        url = reverse('order_detail', args=[self.order.order_id])
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.order.status = 'dispatched'
+        self.order.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.client.force_login(User.objects.create_user('cizi', password='heslo12345'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 404)
+
+    def test_images_named_by_content_hash(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(buffer, 'JPEG')
+        with override_settings(MEDIA_ROOT=media_root):
+            television = Television.objects.first()
+            television.image = SimpleUploadedFile('foto.JPG', buffer.getvalue(), content_type='image/jpeg')
+            television.save()
+        self.assertRegex(television.image.name, r'^television_images/[0-9a-f]{16}\.jpg$')
+
+
+class CatalogAPITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lookups = {
+            'brand': Brand.objects.create(brand_name='Sony'),
+            'display_technology': TVDisplayTechnology.objects.create(name='OLED'),
+            'display_resolution': TVDisplayResolution.objects.create(name='4K Ultra HD'),
+            'operation_system': TVOperationSystem.objects.create(name='Google TV'),
+        }
+        create_televisions(25, **cls.lookups)
+        create_mobiles(3, cls.lookups['brand'])
+
+    def test_sparse_fields_and_pages(self):
+        url = reverse('api_televisions') + '?fields=id,price&limit=10&sort=-price'
+        prices = []
+        while url:
+            data = self.client.get(url).json()
+            self.assertTrue(all(set(item) == {'id', 'price'} for item in data['results']))
+            prices += [item['price'] for item in data['results']]
+            url = data['next']
+        self.assertEqual(prices, [f'{10000 + i}.00' for i in reversed(range(25))])
+
+    def test_filters_and_unknown_field(self):
+        data = self.client.get(reverse('api_televisions') + '?brand=LG&fields=brand').json()
+        self.assertEqual(data['results'], [])
+        data = self.client.get(reverse('api_mobiles') + '?fields=model,ram').json()
+        self.assertEqual(data['results'][0], {'model': 'Phone 0', 'ram': 8})
+        self.assertEqual(self.client.get(reverse('api_televisions') + '?fields=id,heslo').status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_televisions') + '?cursor=xyz').status_code, 400)
+
+    def test_ndjson_stream(self):
+        response = self.client.get(reverse('api_televisions') + '?format=ndjson&fields=model')
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(rows[0], {'model': 'Model 0'})
+
+
+class ProductFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(brand_name='TCL')
+        create_televisions(5, brand=cls.brand, display_technology=TVDisplayTechnology.objects.create(name='QLED'),
+                           display_resolution=TVDisplayResolution.objects.create(name='4K Ultra HD'),
+                           operation_system=TVOperationSystem.objects.create(name='Google TV'))
+        create_mobiles(2, cls.brand)
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def test_only_changed_products_serialized(self):
+        call_command('generate_feeds', stdout=StringIO())
+        self.assertEqual(FeedEntry.objects.count(), 7)
+        out = StringIO()
+        call_command('generate_feeds', stdout=out)
+        self.assertIn('0 products serialized, 0 removed', out.getvalue())
+
+        self.brand.brand_name = 'TCL Electronics'
+        self.brand.save()
+        MobilePhone.objects.first().delete()
+        out = StringIO()
+        call_command('generate_feeds', '--format', 'csv', stdout=out)
+        self.assertIn('6 products serialized, 1 removed', out.getvalue())
+
+    def test_feed_replaced_without_leftovers(self):
+        refresh_feed_entries()
+        name = write_feed('csv')
+        self.assertEqual(write_feed('csv'), name)
+        self.assertEqual(default_storage.listdir('feeds')[1], ['products.csv.gz'])
+        with default_storage.open(name) as stored:
+            self.assertEqual(len(gzip.decompress(stored.read()).decode().splitlines()), 8)
+
+    def test_stale_feed_served_and_refreshed_in_background(self):
+        refresh_feed_entries()
+        write_feed('csv')
+        self.brand.brand_name = 'TCL Electronics'
+        self.brand.save()
+        with override_settings(SHOP_FEED_MAX_AGE=0), mock.patch('viewer.feeds.write_feed') as write:
+            self.assertEqual(ensure_feed('csv'), 'feeds/products.csv.gz')
+            self.assertEqual(ensure_feed('csv'), 'feeds/products.csv.gz')
+        write.assert_not_called()
+        self.assertEqual(Job.objects.filter(task='refresh_feed').count(), 1)
+        self.assertEqual(work(once=True), 1)
+        with default_storage.open('feeds/products.csv.gz') as stored:
+            self.assertIn('TCL Electronics', gzip.decompress(stored.read()).decode())
+
+    def test_feed_being_generated_elsewhere(self):
+        cache.add('viewer:feed_lock:csv', 1)
+        with mock.patch('viewer.feeds.write_feed') as write:
+            TASKS['refresh_feed'].func('csv')
+        write.assert_not_called()
+
+    def test_feed_endpoint(self):
+        response = self.client.get(reverse('product_feed', args=['csv']), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(lines[0], 'type,id,brand,title,description,specs,price,url,image')
+        self.assertEqual(len(lines), 8)
+
+        response = self.client.get(reverse('product_feed', args=['xml']))
+        xml = b''.join(response.streaming_content).decode()
+        self.assertTrue(xml.startswith('<?xml'))
+        self.assertEqual(xml.count('<product>'), 7)
+        self.assertIn('<brand>TCL</brand>', xml)
+        self.assertEqual(self.client.get(reverse('product_feed', args=['pdf'])).status_code, 404)
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def import_file(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_catalog', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_upsert_in_batches(self):
+        header = ('brand,model,released_year,screen_size,smart_tv,refresh_rate,technology,resolution,'
+                  'operation_system,price')
+        rows = [f'Brand {i % 3},TV {i},2022,55,true,120,OLED,4K Ultra HD,webOS,{20000 + i}' for i in range(250)]
+        path = self.write_file('tv.csv', '\n'.join([header, *rows, 'Brand 0,TV X,1990,55,true,120,OLED,4K,webOS,1']))
+        out, err = self.import_file(path, '--batch-size', '100')
+        self.assertIn('250 rows imported, 1 skipped', out)
+        self.assertIn('Row 251', err)
+        self.assertEqual(Television.objects.count(), 250)
+        self.assertEqual(Brand.objects.count(), 3)
+
+        # Opakovany import aktualizuje existujici produkty podle (znacka, model)
+        path = self.write_file('tv2.csv', '\n'.join([header, rows[0].replace(',20000', ',15000')]))
+        self.import_file(path)
+        self.assertEqual(Television.objects.count(), 250)
+        self.assertEqual(Television.objects.get(brand_model='TV 0').price, 15000)
+        self.assertEqual([product.brand_model for _, product in search_products('tv 249')], ['TV 249'])
+        self.assertEqual(tv_facets({})[0]['options'][0]['count'], 84)
+
+    def test_jsonl_mobiles(self):
+        path = self.write_file('mobiles.jsonl', '\n'.join(json.dumps({
+            'brand': 'Xiaomi', 'model': f'Redmi {i}', 'released_year': 2023, 'screen_size': '0.65', 'ram': 8,
+            'user_memory': 256, 'construction': 'Dotykový', 'display': 'AMOLED', 'price': '7999.90',
+        }) for i in range(3)))
+        out, _ = self.import_file(path, '--type', 'mobile_phone')
+        self.assertIn('3 rows imported', out)
+        self.assertEqual(MobileRAM.objects.get().size, 8)
+        self.assertEqual(MobilePhone.objects.filter(brand__brand_name='Xiaomi').count(), 3)
+
+
+class ProductCatalogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(brand_name='Samsung')
+        create_televisions(3, brand=cls.brand, display_technology=TVDisplayTechnology.objects.create(name='QLED'),
+                           display_resolution=TVDisplayResolution.objects.create(name='8K'),
+                           operation_system=TVOperationSystem.objects.create(name='Tizen'))
+        create_mobiles(3, cls.brand)
+        cls.category = Category.objects.create(name='Výprodej')
+        for television in Television.objects.all():
+            television.categories.add(cls.category)
+        cls.category.mobile_phone.add(*MobilePhone.objects.all())
+
+    def setUp(self):
+        cache.clear()
+
+    def test_catalog_follows_products(self):
+        self.assertEqual(Product.objects.count(), 6)
+        television = Television.objects.first()
+        television.price = 999
+        television.save()
+        self.assertEqual(Product.objects.get(product_type='television', object_id=television.pk).price, 999)
+        self.brand.brand_name = 'Samsung Electronics'
+        self.brand.save()
+        self.assertEqual(Product.objects.filter(name__startswith='Samsung Electronics ').count(), 6)
+        Television.objects.filter(pk=television.pk).delete()
+        self.assertEqual(Product.objects.count(), 5)
+        self.assertEqual(self.category.products.count(), 5)
+
+    def test_mixed_category_listing_single_query(self):
+        url = reverse('category_products', args=[self.category.pk]) + '?sort=price'
+        # validatory + kategorie + produkty vsech typu + strom kategorii (studena cache)
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        prices = [product.price for product in response.context['products']]
+        self.assertEqual(len(prices), 6)
+        self.assertEqual(prices, sorted(prices))
+        self.assertContains(response, reverse('tv_detail', args=[Television.objects.first().pk]))
+        self.category.televisions.clear()
+        self.assertEqual(len(self.client.get(url).context['products']), 3)
+
+    def test_home_lists_all_product_types(self):
+        response = self.client.get(reverse('home'))
+        self.assertEqual({product.product_type for product in response.context['products']},
+                         {'television', 'mobile_phone'})
+
+
+class CategoryTreeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.electronics = Category.objects.create(name='Elektronika')
+        cls.tv = Category.objects.create(name='Televize', parent=cls.electronics)
+        cls.oled = Category.objects.create(name='OLED', parent=cls.tv)
+        cls.phones = Category.objects.create(name='Mobily', parent=cls.electronics)
+        cls.sale = Category.objects.create(name='Výprodej')
+        brand = Brand.objects.create(brand_name='LG')
+        create_televisions(4, brand=brand, display_technology=TVDisplayTechnology.objects.create(name='OLED'),
+                           display_resolution=TVDisplayResolution.objects.create(name='4K'),
+                           operation_system=TVOperationSystem.objects.create(name='webOS'))
+        create_mobiles(2, brand)
+        televisions = list(Television.objects.order_by('pk'))
+        cls.oled.televisions.add(*televisions[:2])
+        cls.tv.televisions.add(*televisions[1:3])  # televisions[1] ve dvou kategoriich podstromu
+        cls.phones.mobile_phone.add(*MobilePhone.objects.all())
+        cls.sale.televisions.add(televisions[3])
+
+    def setUp(self):
+        cache.clear()
+
+    def listed(self, category):
+        return Product.objects.in_category(category).count()
+
+    def test_paths_and_subtree(self):
+        self.oled.refresh_from_db()
+        self.assertEqual(self.oled.path_ids, [self.electronics.pk, self.tv.pk, self.oled.pk])
+        self.assertEqual(self.oled.depth, 2)
+        self.assertEqual(set(Category.objects.subtree(self.electronics)),
+                         {self.electronics, self.tv, self.oled, self.phones})
+        self.assertEqual(self.listed(self.electronics), 5)
+        self.assertEqual(self.listed(self.tv), 3)
+        self.assertEqual(self.listed(self.oled), 2)
+
+    def test_move_rewrites_subtree(self):
+        self.tv.parent = self.sale
+        self.tv.save()
+        self.oled.refresh_from_db()
+        self.assertEqual(self.oled.path_ids, [self.sale.pk, self.tv.pk, self.oled.pk])
+        self.assertEqual(self.listed(self.sale), 4)
+        self.assertEqual(self.listed(self.electronics), 2)
+
+    def test_move_under_own_descendant_rejected(self):
+        self.electronics.parent = self.oled
+        with self.assertRaises(ValueError):
+            self.electronics.save()
+        with self.assertRaises(ValidationError):
+            self.electronics.full_clean()
+
+    def test_navigation_tree_cached_and_updated_incrementally(self):
+        self.assertEqual([node.name for node in category_tree()], ['Elektronika', 'Výprodej'])
+        with self.assertNumQueries(0):
+            tree = category_tree()
+        self.assertEqual([node.name for node in tree.breadcrumbs(self.oled.pk)], ['Elektronika', 'Televize', 'OLED'])
+
+        self.tv.parent = self.sale
+        self.tv.save()
+        self.assertEqual([node.name for node in category_tree().breadcrumbs(self.oled.pk)],
+                         ['Výprodej', 'Televize', 'OLED'])
+        self.phones.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual([node.name for node in category_tree().get(self.electronics.pk).children], [])
+
+    def test_concurrent_tree_change_not_lost(self):
+        category_tree()
+        incr = cache.incr
+
+        def concurrent_incr(key, *args, **kwargs):
+            if key == CATEGORY_TREE_VERSION_CACHE_KEY:  # jiny proces mezitim zmenil kategorii
+                Category.objects.filter(pk=self.sale.pk).update(name='Akce')
+                incr(key)
+            return incr(key, *args, **kwargs)
+
+        self.tv.parent = self.sale
+        with mock.patch.object(cache, 'incr', side_effect=concurrent_incr):
+            self.tv.save()
+        self.assertEqual([node.name for node in category_tree().breadcrumbs(self.oled.pk)],
+                         ['Akce', 'Televize', 'OLED'])
+
+    def test_category_page_lists_subtree_with_breadcrumbs(self):
+        response = self.client.get(reverse('category_products', args=[self.electronics.pk]))
+        self.assertEqual(len(response.context['products']), 5)
+        self.assertEqual([node.name for node in response.context['subcategories']], ['Mobily', 'Televize'])
+        response = self.client.get(reverse('category_products', args=[self.oled.pk]))
+        self.assertEqual([node.name for node in response.context['breadcrumbs']], ['Elektronika', 'Televize', 'OLED'])
+        self.assertContains(response, reverse('category_products', args=[self.tv.pk]))
+
+
+class StockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(brand_name='Philips')
+        create_televisions(2, brand=brand, display_technology=TVDisplayTechnology.objects.create(name='Ambilight'),
+                           display_resolution=TVDisplayResolution.objects.create(name='4K'),
+                           operation_system=TVOperationSystem.objects.create(name='Titan OS'))
+        cls.television, cls.untracked = Television.objects.order_by('pk')
+        cls.user = User.objects.create_user('skladnik', password='heslo12345')
+        Profile.objects.create(user=cls.user, first_name='Jan', last_name='Novák')
+
+    def setUp(self):
+        Stock.objects.create(product_type='television', product_id=self.television.pk, quantity=2)
+        self.client.force_login(self.user)
+
+    def stock(self):
+        return Stock.objects.get(product_id=self.television.pk).quantity
+
+    def add(self, television=None):
+        return self.client.get(reverse('add_to_cart', args=[(television or self.television).pk]), follow=True)
+
+    def checkout(self):
+        return self.client.post(reverse('checkout'), {'first_name': 'Jan', 'last_name': 'Novák'})
+
+    def test_add_to_cart_reserves_stock(self):
+        self.add()
+        self.add()
+        item = CartItem.objects.get()
+        self.assertEqual((item.quantity, item.reserved, self.stock()), (2, 2, 0))
+        self.assertContains(self.add(), 'Požadované množství už není skladem.')
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+        self.client.post(reverse('remove_from_cart', args=[self.television.pk]))
+        self.assertEqual(self.stock(), 1)
+        # Produkt bez skladu se prodava bez omezeni a nic nerezervuje
+        self.add(self.untracked)
+        self.assertEqual(CartItem.objects.get(television=self.untracked).reserved, 0)
+
+    def test_checkout_consumes_reservation(self):
+        self.add()
+        self.add(self.untracked)
+        self.assertEqual(self.checkout().status_code, 302)
+        self.assertEqual(self.stock(), 1)
+        self.assertEqual(Order.objects.get().items.get(television=self.television).quantity, 1)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_expired_reservation_returns_to_stock(self):
+        self.add()
+        self.add()
+        CartItem.objects.update(reserved_until=timezone.now() - timedelta(seconds=1))
+        out = StringIO()
+        call_command('expire_reservations', stdout=out)
+        self.assertIn('1 reservations released', out.getvalue())
+        self.assertEqual(self.stock(), 2)
+        # Mezitim kus koupil nekdo jiny - pokladna s propadlou rezervaci objednavku nevytvori
+        place_order(Order(user=self.user), [('television', self.television.pk, 1)])
+        response = self.checkout()
+        self.assertContains(response, 'Požadované množství už není skladem.')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.stock(), 1)
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+    def test_no_overselling_without_cart(self):
+        place_order(Order(user=self.user), [('television', self.television.pk, 2)])
+        with self.assertRaises(OutOfStock):
+            place_order(Order(user=self.user), [('television', self.television.pk, 1),
+                                                ('television', self.untracked.pk, 1)])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.stock(), 0)
+
+    def test_deleted_cart_releases_reservation(self):
+        self.add()
+        Cart.objects.all().delete()
+        self.assertEqual(self.stock(), 2)
+
+
+class StockConcurrencyTests(TransactionTestCase):
+    """Soubezne nakupy z vice vlaken - testovaci databaze je v souboru (viz DATABASES v nastaveni)."""
+
+    def test_parallel_checkouts_do_not_oversell(self):
+        for direct in (False, True):
+            with self.subTest(direct=direct):
+                out = StringIO()
+                call_command('stress_checkout', workers=8, orders=60, stock=20, direct=direct, stdout=out)
+                sold, left = map(int, re.search(r'sold (\d+) units, (-?\d+) left', out.getvalue()).groups())
+                self.assertGreaterEqual(left, 0)
+                self.assertEqual((sold, left), (20, 0))
+
+
+class DatabaseProfileTests(TestCase):
+    def test_sqlite_pragmas_applied_to_new_connections(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Jen SQLite.')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            levels = {'OFF': 0, 'NORMAL': 1, 'FULL': 2, 'EXTRA': 3}
+            self.assertEqual(cursor.fetchone()[0], levels[settings.SHOP_SQLITE_PRAGMAS['synchronous']])
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.DATABASES['default']['OPTIONS']['timeout'] * 1000)
+
+
+@override_settings(SHOP_DB_REPLICAS=['replica1'])
+@mock.patch('viewer.routers.read_replicas', lambda: ['replica1'])
+class ReplicaRoutingTests(TestCase):
+    """
+    Rozhodnuti routeru pro cteni se zaznamenava a dotazy jdou dal do 'default' - v testech
+    alias repliky neexistuje (lokalne se repliky zkouseji pres SHOP_DB_REPLICAS a sync_sqlite_replicas).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='heslo12345')
+        Profile.objects.create(user=cls.user, first_name='Jan', last_name='Novák')
+        create_televisions(1, brand=Brand.objects.create(brand_name='Sony'),
+                           display_technology=TVDisplayTechnology.objects.create(name='OLED'),
+                           display_resolution=TVDisplayResolution.objects.create(name='4K Ultra HD'),
+                           operation_system=TVOperationSystem.objects.create(name='Google TV'))
+        cls.tv = Television.objects.get()
+
+    def setUp(self):
+        cache.clear()
+        self.read_aliases = []
+        original = ReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            self.read_aliases.append(original(router, model, **hints))
+            return 'default'
+
+        patcher = mock.patch.object(ReplicaRouter, 'db_for_read', db_for_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, url):
+        self.read_aliases.clear()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return set(self.read_aliases)
+
+    def test_catalog_reads_go_to_replica(self):
+        self.assertIn('replica1', self.get(reverse('tv_list')))
+        self.assertIn('replica1', self.get(reverse('tv_detail', args=[self.tv.pk])))
+        self.assertIn('replica1', self.get(reverse('mobile_list')))
+
+    def test_views_with_writes_read_primary(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.get(reverse('view_cart')), {'default'})
+        self.assertEqual(self.get(reverse('edit_profile')), {'default'})
+
+    def test_order_history_sticks_to_primary_after_write(self):
+        self.client.force_login(self.user)
+        self.assertIn('replica1', self.get(reverse('order_list')))
+
+        response = self.client.post(reverse('edit_profile'), {'first_name': 'Petr'})
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+        self.assertEqual(self.get(reverse('order_list')), {'default'})
+        self.assertEqual(self.get(reverse('tv_list')), {'default'})
+
+    def test_write_during_get_pins_client(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('add_to_cart', args=[self.tv.pk]))
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+
+        response = self.client.get(reverse('tv_list'))
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_reads_outside_requests_and_migrations_use_primary(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Television), 'default')
+        self.assertTrue(router.allow_migrate('default', 'viewer'))
+        self.assertFalse(router.allow_migrate('replica1', 'viewer'))
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_catalog(brands=3, televisions=30, mobiles=10, users=4, orders=20, seed=1)
+
+    def test_seed_catalog(self):
+        self.assertEqual(len(self.data.television_ids), 30)
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(Order.objects.filter(user_id__in=self.data.user_ids).count(), 20)
+        self.assertEqual(Stock.objects.count(), 40)
+
+    def test_all_scenarios_run_without_errors(self):
+        results = run_benchmark(self.data, requests=4, warmup=1)
+        self.assertEqual(results['meta']['dataset']['televisions'], 30)
+        for name, metrics in results['scenarios'].items():
+            with self.subTest(name):
+                self.assertEqual(metrics['requests'], 4)
+                self.assertEqual(metrics['errors'], 0)
+                self.assertGreater(metrics['queries_max'], 0)
+        self.assertEqual(Order.objects.filter(user_id__in=self.data.user_ids).count(), 20 + 5)
+
+    def test_regressions_over_threshold(self):
+        baseline = {'scenarios': {'tv_list': {'requests': 100, 'errors': 0, 'throughput_rps': 100.0, 'p50_ms': 10.0,
+                                              'p99_ms': 30.0, 'queries_max': 5}}}
+        within = {'scenarios': {'tv_list': {**baseline['scenarios']['tv_list'], 'p50_ms': 11.5}}}
+        self.assertEqual(find_regressions(within, baseline, threshold=0.2), [])
+
+        slower = {'scenarios': {'tv_list': {**baseline['scenarios']['tv_list'], 'throughput_rps': 70.0,
+                                            'queries_max': 6}}}
+        regressions = find_regressions(slower, baseline, threshold=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn('throughput_rps', regressions[0])
+        self.assertIn('queries_max 5 -> 6', regressions[1])
+
+
+class PerformanceInstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_televisions(6, brand=Brand.objects.create(brand_name='Philips'),
+                           display_technology=TVDisplayTechnology.objects.create(name='OLED'),
+                           display_resolution=TVDisplayResolution.objects.create(name='4K Ultra HD'),
+                           operation_system=TVOperationSystem.objects.create(name='Android TV'))
+
+    def setUp(self):
+        cache.clear()
+        REGISTRY.clear()
+
+    @override_settings(SHOP_PERF_SAMPLE_RATE=1.0, SHOP_METRICS_PUBLIC=True)
+    def test_sampled_request_is_measured_in_detail(self):
+        with self.assertLogs('viewer.instrumentation', 'INFO') as logs:
+            response = self.client.get(reverse('tv_list'))
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", tpl;dur=')
+
+        entry = json.loads(JSONFormatter().format(logs.records[-1]))
+        self.assertEqual(entry['view'], 'tv_list')
+        self.assertEqual(entry['status'], 200)
+        self.assertGreater(entry['queries'], 0)
+        self.assertGreater(entry['template_ms'], 0)
+        self.assertEqual(entry['response_bytes'], len(response.content))
+
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('shop_requests_total{view="tv_list",status="200"} 1', metrics)
+        self.assertIn('shop_request_duration_seconds_count{view="tv_list"} 1', metrics)
+        self.assertIn('shop_sampled_requests_total{view="tv_list"} 1', metrics)
+        self.assertIn(f'shop_db_queries_total{{view="tv_list"}} {entry["queries"]}', metrics)
+
+    @override_settings(SHOP_PERF_SAMPLE_RATE=0.0, SHOP_METRICS_PUBLIC=True)
+    def test_unsampled_request_only_counts_duration(self):
+        response = self.client.get(reverse('tv_list'))
+        self.assertNotIn('Server-Timing', response)
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('shop_requests_total{view="tv_list",status="200"} 1', metrics)
+        self.assertIn('shop_sampled_requests_total{view="tv_list"} 0', metrics)
+
+    def test_repeated_queries_share_fingerprint(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for television in Television.objects.all():
+                Brand.objects.get(pk=television.brand_id)
+        self.assertEqual(recorder.count, 7)
+        self.assertEqual(recorder.duplicates, 5)
+        [(fingerprint, count)] = recorder.repeated(5)
+        self.assertEqual(count, 6)
+        self.assertIn('viewer_brand', fingerprint)
+        self.assertEqual(sql_fingerprint('SELECT 1 FROM t WHERE id IN (%s, %s, %s) LIMIT 21'),
+                         sql_fingerprint('SELECT 1 FROM t WHERE id IN (%s) LIMIT 21'))
+
+    @override_settings(SHOP_METRICS_TOKEN='tajne')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer tajne')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer jine').status_code, 401)
+
+    def test_metrics_closed_by_default(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.client.force_login(User.objects.create_user('zakaznik', password='heslo12345'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.client.force_login(User.objects.create_user('obsluha', password='heslo12345', is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+        self.client.logout()
+        with override_settings(SHOP_METRICS_PUBLIC=True):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+
+@override_settings(ROOT_URLCONF='OnlineShop.asgi_urls')
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_televisions(3, brand=Brand.objects.create(brand_name='Philips'),
+                           display_technology=TVDisplayTechnology.objects.create(name='OLED'),
+                           display_resolution=TVDisplayResolution.objects.create(name='4K Ultra HD'),
+                           operation_system=TVOperationSystem.objects.create(name='Android TV'))
+        cls.television = Television.objects.order_by('pk').first()
+        cls.user = User.objects.create_user('async', password='heslo12345')
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_catalog_list_and_detail(self):
+        response = await self.async_client.get(reverse('tv_list'), {'brand': 'Philips'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.resolver_match.func.view_class, AsyncTVListView)
+        self.assertContains(response, 'Model 0')
+        self.assertEqual(len(response.context['object_list']), 3)
+
+        response = await self.async_client.get(reverse('tv_detail', args=[self.television.pk]))
+        self.assertContains(response, self.television.brand_model)
+        cached = await self.async_client.get(reverse('tv_detail', args=[self.television.pk]),
+                                             **{'if-none-match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+        await cache.aincr(CATEGORY_TREE_VERSION_CACHE_KEY)
+        changed = await self.async_client.get(reverse('tv_detail', args=[self.television.pk]),
+                                              **{'if-none-match': response['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual((await self.async_client.get(reverse('tv_detail', args=[0]))).status_code, 404)
+        self.assertEqual((await self.async_client.get('/tv/abc')).status_code, 404)
+
+    async def test_add_to_cart_and_cart(self):
+        self.assertEqual((await self.async_client.get(reverse('view_cart'))).status_code, 302)
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(reverse('add_to_cart', args=[self.television.pk]) + '?from_cart=1')
+        self.assertRedirects(response, reverse('view_cart'), fetch_redirect_response=False)
+        await self.async_client.get(reverse('add_to_cart', args=[self.television.pk]))
+
+        response = await self.async_client.get(reverse('view_cart'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_items'], 2)
+        self.assertEqual(response.context['total_price'], self.television.price * 2)
+
+    def test_asgi_benchmark_driver(self):
+        # ASGIHandler po requestu zavira spojeni - s databazi v souboru by zavrel i spojeni testu
+        # (test klient to vypina stejne)
+        for signal in (request_started, request_finished):
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+        data = seed_catalog(brands=2, televisions=10, mobiles=2, users=2, orders=2, seed=1)
+        scenarios = ['tv_list', 'add_to_cart', 'cart']
+        concurrent = run_benchmark(data, scenarios=scenarios, driver='asgi', requests=4, warmup=1, concurrency=2)
+        asgi = run_benchmark(data, scenarios=scenarios, driver='asgi', requests=4, warmup=1)
+        client = run_benchmark(data, scenarios=scenarios, driver='client', requests=4, warmup=1)
+        for name in scenarios:
+            with self.subTest(name):
+                self.assertEqual((concurrent['scenarios'][name]['requests'], concurrent['scenarios'][name]['errors']),
+                                 (4, 0))
+                # Asynchronni pohledy nepridavaji dotazy
+                self.assertEqual(asgi['scenarios'][name]['queries_max'], client['scenarios'][name]['queries_max'])
+
+
+class JobQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(brand_name='Philips')
+        create_televisions(1, brand=brand, display_technology=TVDisplayTechnology.objects.create(name='OLED'),
+                           display_resolution=TVDisplayResolution.objects.create(name='4K'),
+                           operation_system=TVOperationSystem.objects.create(name='Titan OS'))
+        cls.television = Television.objects.get()
+        cls.user = User.objects.create_user('zakaznik', email='zakaznik@example.com', password='heslo12345')
+        Profile.objects.create(user=cls.user, first_name='Jan', last_name='Novák')
+
+    def setUp(self):
+        self.failures = []
+        TASKS['test_flaky'] = Task('test_flaky', self.flaky, max_attempts=3)
+        self.addCleanup(TASKS.pop, 'test_flaky')
+
+    def flaky(self, fail):
+        if len(self.failures) < fail:
+            self.failures.append(fail)
+            raise RuntimeError('SMTP server unavailable')
+
+    def test_checkout_enqueues_confirmation_once(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('add_to_cart', args=[self.television.pk]))
+        self.client.post(reverse('checkout'), {'first_name': 'Jan', 'last_name': 'Novák'})
+        order = Order.objects.get()
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.payload, job.idempotency_key),
+                         ('order_confirmation', {'order_id': str(order.order_id)},
+                          f'order_confirmation:{order.order_id}'))
+        self.assertEqual(len(mail.outbox), 0)  # request na odeslani neceka
+
+        enqueue_order_tasks(order)  # stejny klic - znovu se nezaradi
+        self.assertEqual(Job.objects.count(), 1)
+
+        out = StringIO()
+        call_command('run_workers', processes=1, once=True, stdout=out)
+        self.assertIn('1 jobs processed', out.getvalue())
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+        self.assertEqual(mail.outbox[0].to, ['zakaznik@example.com'])
+        self.assertIn(self.television.brand_model, mail.outbox[0].body)
+
+    def test_failed_job_retried_with_backoff(self):
+        enqueue('test_flaky', {'fail': 5})
+        with self.assertLogs('viewer.jobs', 'WARNING'):
+            self.assertFalse(run_job(claim_jobs()[0]))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('SMTP server unavailable', job.last_error)
+        self.assertAlmostEqual((job.run_at - timezone.now()).total_seconds(), settings.SHOP_JOBS_RETRY_DELAY, delta=5)
+        self.assertEqual(claim_jobs(), [])  # jeste neni na rade
+        self.assertEqual(retry_delay(2), settings.SHOP_JOBS_RETRY_DELAY * 2)
+
+        for attempt in (2, 3):
+            Job.objects.update(run_at=timezone.now())
+            with self.assertLogs('viewer.jobs', 'WARNING'):
+                run_job(claim_jobs()[0])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+
+    def test_retry_succeeds_and_stale_job_requeued(self):
+        enqueue('test_flaky', {'fail': 1}, key='flaky')
+        enqueue('test_flaky', {'fail': 1}, key='flaky')
+        [job] = claim_jobs()
+        # Worker spadl - po SHOP_JOBS_LOCK_TIMEOUT se uloha vrati do fronty
+        Job.objects.update(locked_at=timezone.now() - timedelta(seconds=settings.SHOP_JOBS_LOCK_TIMEOUT + 1))
+        self.assertEqual(release_stale_jobs(), 1)
+        with self.assertLogs('viewer.jobs', 'WARNING'):
+            self.assertFalse(run_job(claim_jobs()[0]))
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(work(once=True), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error), (Job.DONE, 3, ''))
+        # Dokonceni puvodnim workerem uz ulohu neprepise
+        self.assertTrue(run_job(job))
+        self.assertEqual(Job.objects.get().attempts, 3)
+
+
+    def test_once_mode_runs_maintenance(self):
+        enqueue('test_flaky', {'fail': 0}, key='stale')
+        enqueue('test_flaky', {'fail': 0}, key='old')
+        claim_jobs()
+        Job.objects.filter(idempotency_key='stale').update(
+            locked_at=timezone.now() - timedelta(seconds=settings.SHOP_JOBS_LOCK_TIMEOUT + 1))
+        Job.objects.filter(idempotency_key='old').update(
+            status=Job.DONE, updated_at=timezone.now() - timedelta(days=settings.SHOP_JOBS_KEEP_DAYS + 1))
+        self.assertEqual(work(once=True), 1)
+        self.assertEqual(list(Job.objects.values_list('idempotency_key', 'status')), [('stale', Job.DONE)])
+
+
+class JobWorkerPoolTests(TransactionTestCase):
+    """Vic procesu workeru nad jednou frontou - testovaci databaze je v souboru (viz DATABASES v nastaveni)."""
+
+    def test_each_job_runs_once(self):
+        user = User.objects.create_user('pool', email='pool@example.com')
+        for order in Order.objects.bulk_create([Order(user=user) for _ in range(60)]):
+            enqueue_order_tasks(order)
+        out = StringIO()
+        call_command('run_workers', processes=3, batch_size=5, once=True, stdout=out)
+        self.assertIn('60 jobs processed by 3 workers', out.getvalue())
+        self.assertEqual(list(Job.objects.values_list('status', 'attempts').distinct()), [(Job.DONE, 1)])
+
+
+class OrderStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('skladnik2', password='heslo12345')
+        cls.admin = User.objects.create_superuser('spravce', password='heslo12345')
+        Order.objects.bulk_create([Order(user=cls.user, status='processing') for _ in range(5)]
+                                  + [Order(user=cls.user, status='submitted') for _ in range(2)])
+
+    def test_bulk_transition_is_batched_and_logged(self):
+        before = timezone.now()
+        with CaptureQueriesContext(connection) as queries:
+            changed, skipped = transition_orders(Order.objects.all(), 'dispatched', user=self.admin,
+                                                 source='test', batch_size=4)
+        self.assertEqual((changed, skipped), (5, 2))
+        # Na davku jeden UPDATE objednavek a jeden INSERT historie
+        statements = [query['sql'].split(' SET ')[0].split(' (')[0] for query in queries.captured_queries
+                      if query['sql'].startswith(('UPDATE', 'INSERT')) and 'WHERE 0' not in query['sql']]
+        self.assertEqual(statements, ['UPDATE "viewer_order"', 'INSERT INTO "viewer_orderstatuschange"'] * 2)
+        self.assertEqual(Order.objects.filter(status='dispatched', updated_at__gte=before).count(), 5)
+        self.assertEqual(set(Order.objects.exclude(status='dispatched').values_list('status', flat=True)),
+                         {'submitted'})
+        change = OrderStatusChange.objects.select_related('changed_by').first()
+        self.assertEqual((change.from_status, change.to_status, change.changed_by, change.source),
+                         ('processing', 'dispatched', self.admin, 'test'))
+        self.assertEqual(OrderStatusChange.objects.count(), 5)
+        with self.assertRaises(ValueError):
+            change.save()
+
+    def test_single_transition_validated(self):
+        order = Order.objects.filter(status='submitted').first()
+        with self.assertRaises(InvalidTransition):
+            transition_order(order, 'delivered')
+        with self.assertRaises(InvalidTransition):
+            transition_orders(Order.objects.all(), 'shipped')
+        self.assertEqual(transition_order(order, 'cancelled').status, 'cancelled')
+        self.assertFalse(can_transition('cancelled', 'processing'))
+        self.assertEqual(allowed_sources('refunded'), ['cancelled', 'delivered', 'returned'])
+
+    def test_admin_action_and_command(self):
+        self.client.force_login(self.admin)
+        orders = Order.objects.order_by('pk')
+        response = self.client.post(reverse('admin:viewer_order_changelist'), {
+            'action': 'transition_to_dispatched',
+            '_selected_action': [order.pk for order in orders[:6]],
+        }, follow=True)
+        messages_text = [str(message) for message in response.context['messages']]
+        self.assertIn('5 objednávek převedeno', messages_text[0])
+        self.assertIn('1 objednávek přeskočeno', messages_text[1])
+        self.assertEqual(OrderStatusChange.objects.filter(source='admin').count(), 5)
+        self.assertContains(self.client.get(reverse('admin:viewer_order_change', args=[orders[0].pk])),
+                            'dispatched')
+
+        out = StringIO()
+        call_command('transition_orders', '--from', 'dispatched', '--to', 'delivered', stdout=out)
+        self.assertIn('5 orders changed to delivered, 0 skipped', out.getvalue())
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as ids:
+            ids.write('\n'.join(str(order.order_id) for order in orders[4:]))
+            ids.flush()
+            call_command('transition_orders', '--order-ids-file', ids.name, '--to', 'completed', stdout=out)
+        self.assertIn('1 orders changed to completed, 2 skipped', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('transition_orders', '--to', 'completed')
@@ -1,9 +1,17 @@
+import gzip
 import logging
-
-from django.http import Http404
+import re
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.static import serve
 from django.views.generic import TemplateView, DetailView, ListView, CreateView, UpdateView, DeleteView, FormView, View
-from viewer.models import Television, MobilePhone, Order, Profile
-from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from viewer.models import Category, Television, MobilePhone, Order, Product, Profile
+from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView, LogoutView, PasswordChangeView
 from django.contrib.auth import login
 from django.urls import reverse_lazy, reverse
@@ -11,9 +19,50 @@ from django.shortcuts import get_object_or_404, redirect, render
 from viewer.forms import (TVForm, CustomAuthenticationForm, CustomPasswordChangeForm, ProfileForm, SignUpForm,
                           OrderForm, BrandForm)
 from django.contrib.auth.decorators import login_required
+from viewer.caching import AnonymousPageCacheMixin, ConditionalGetMixin, listing_validators, object_validators
+from viewer.cart import cart_items, cart_lines, cart_totals, clear_cart, get_cart_id
+from viewer.categories import category_tree
+from viewer.checkout import PRODUCT_MODELS, ProductsUnavailable, place_order
+from viewer.facets import TV_FACETS, tv_facets
+from viewer.feeds import FEED_FORMATS, ensure_feed
+from viewer.instrumentation import REGISTRY
+from viewer.pagination import KeysetPaginationMixin
+from viewer.permissions import TVAdminRequiredMixin
+from viewer.routers import ReadReplicaMixin
+from viewer.search import search_products
+from viewer.stock import OutOfStock, release_item, reserve_item
 
 logger = logging.getLogger(__name__)
 
+# Soubory pojmenovane hashem obsahu (viz ContentHashedUploadTo) i jejich zmenseniny se nikdy nemeni
+HASHED_MEDIA_RE = re.compile(r'(^|/)[0-9a-f]{16}[._][^/]*$')
+
+# Razeni katalogu - kazda volba ma v databazi index (viz Meta.indexes u Television a MobilePhone)
+TV_SORT_OPTIONS = {
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'year': ('tv_released_year', 'id'),
+    '-year': ('-tv_released_year', '-id'),
+}
+
+MOBILE_SORT_OPTIONS = {
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'year': ('mobile_released_year', 'id'),
+    '-year': ('-mobile_released_year', '-id'),
+}
+
+# Smisene vypisy ze spolecneho katalogu (Product)
+PRODUCT_SORT_OPTIONS = {
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'year': ('released_year', 'id'),
+    '-year': ('-released_year', '-id'),
+}
+HOME_PRODUCT_COUNT = 12
+OUT_OF_STOCK_MESSAGE = 'Požadované množství už není skladem.'
+PRODUCTS_UNAVAILABLE_MESSAGE = 'Některé produkty z košíku už nejsou v nabídce. Zkontrolujte prosím košík.'
+
 
 class ProfileView(LoginRequiredMixin, TemplateView):
     template_name = 'profile_detail.html'
@@ -38,119 +87,118 @@ class SubmittablePasswordChangeView(PasswordChangeView):
     form_class = CustomPasswordChangeForm
 
 
-class BaseView(TemplateView):
+class BaseView(ReadReplicaMixin, ConditionalGetMixin, AnonymousPageCacheMixin, TemplateView):
     template_name = 'home.html'
     extra_context = {}
 
+    def get_validators(self):
+        return listing_validators(Product)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Nejnovejsi produkty vsech typu jednim dotazem nad spolecnym katalogem
+        context['products'] = Product.objects.for_listing().order_by('-released_year', '-id')[:HOME_PRODUCT_COUNT]
+        return context
+
 
-class BrandCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
+class BrandCreateView(TVAdminRequiredMixin, CreateView):
     template_name = 'television/brand_create.html'
     form_class = BrandForm
     success_url = reverse_lazy('tv_create')
 
-    def test_func(self):
-        # Umožní přístup pouze členům skupiny 'tv_admin' nebo superuživatelům
-        return self.request.user.is_superuser or self.request.user.groups.filter(name='tv_admin').exists()
-
     def form_invalid(self, form):
         logger.warning('User provided invalid data.')
         return super().form_invalid(form)
 
 
-class TVListView(ListView):
+def tv_list_queryset(request):
+    """Všechny televize (i se značkou v jednom dotazu) filtrované podle zaškrtnutých políček."""
+    return Television.objects.for_listing().filter_catalog(
+        brands=request.GET.getlist('brand'),
+        technologies=request.GET.getlist('technology'),
+        resolutions=request.GET.getlist('resolution'),
+        op_systems=request.GET.getlist('os'),
+    )
+
+
+def tv_list_context(request, version=None):
+    return {
+        'selected_brand': request.GET.getlist('brand'),
+        'selected_technology': request.GET.getlist('technology'),
+        'selected_resolution': request.GET.getlist('resolution'),
+        # Facety pro postranní panel i s počty - z předpočítaného indexu, ne dotaz na každé políčko
+        'facets': tv_facets({param: request.GET.getlist(param) for param, *_ in TV_FACETS}, version),
+    }
+
+
+class TVListView(ReadReplicaMixin, ConditionalGetMixin, AnonymousPageCacheMixin, KeysetPaginationMixin, ListView):
     template_name = 'tv_list.html'
     model = Television
     context_object_name = 'object_list'  # Kontext pro šablonu
+    sort_options = TV_SORT_OPTIONS
+    default_sort = 'price'
+
+    def get_validators(self):
+        return listing_validators(Television)
 
     def get_queryset(self):
-        # Získání všech televizí
-        queryset = Television.objects.all()
-
-        # Filtrování podle značek
-        selected_brand = self.request.GET.getlist('brand')
-        if selected_brand:
-            queryset = queryset.filter(brand__brand_name__in=selected_brand)
-
-        # Filtrování podle technologie
-        selected_technology = self.request.GET.getlist('technology')
-        if selected_technology:
-            queryset = queryset.filter(display_technology__name__in=selected_technology)
-
-        # Filtrování podle rozliseni displeje
-        selected_resolution = self.request.GET.getlist('resolution')
-        if selected_resolution:
-            queryset = queryset.filter(display_resolution__name__in=selected_resolution)
-        return queryset
+        return tv_list_queryset(self.request)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
-        # Kontrola, zda uživatel patří do skupiny 'tv_admin', pokud je přihlášen (pro podminkovani v html)
-        context['is_tv_admin'] = user.groups.filter(name='tv_admin').exists()
-        context['selected_brand'] = self.request.GET.getlist('brand')
-        context['selected_technology'] = self.request.GET.getlist('technology')
-        context['selected_resolution'] = self.request.GET.getlist('resolution')
+        context.update(tv_list_context(self.request, getattr(self, 'content_version', None)))
         return context
 
 
-class TVDetailView(DetailView):
+class TVDetailView(ReadReplicaMixin, ConditionalGetMixin, AnonymousPageCacheMixin, DetailView):
     template_name = 'tv_detail.html'
     model = Television
+    queryset = Television.objects.for_detail()
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        user = self.request.user
-        # Kontrola, zda uživatel patří do skupiny 'tv_admin', pokud je přihlášen (pro podminkovani v html)
-        context['is_tv_admin'] = user.groups.filter(name='tv_admin').exists()
-        return context
+    def get_validators(self):
+        return object_validators(Television.objects.filter(pk=self.kwargs['pk']))
 
 
-class TVCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
+class TVCreateView(TVAdminRequiredMixin, CreateView):
     template_name = 'tv_creation.html'
     form_class = TVForm
     success_url = reverse_lazy('tv_list')
 
-    def test_func(self):
-        # Umožní přístup pouze členům skupiny 'tv_admin' nebo superuživatelům
-        return self.request.user.is_superuser or self.request.user.groups.filter(name='tv_admin').exists()
-
     def form_invalid(self, form):
         logger.warning('User provided invalid data.')
         return super().form_invalid(form)
 
 
-class TVUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class TVUpdateView(TVAdminRequiredMixin, UpdateView):
     template_name = 'tv_creation.html'
     model = Television
     form_class = TVForm
     success_url = reverse_lazy('tv_list')
 
-    def test_func(self):
-        # Umožní přístup pouze členům skupiny 'tv_admin' nebo superuživatelům
-        return self.request.user.is_superuser or self.request.user.groups.filter(name='tv_admin').exists()
-
     def form_invalid(self, form):
         logger.warning('User provided invalid data while updating a movie.')
         return super().form_invalid(form)
 
 
-class TVDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class TVDeleteView(TVAdminRequiredMixin, DeleteView):
     template_name = 'tv_delete.html'
     model = Television
     success_url = reverse_lazy('tv_list')
 
-    def test_func(self):
-        """"Umožní přístup pouze členům skupiny 'tv_admin' nebo superuživatelům"""
-        return self.request.user.is_superuser or self.request.user.groups.filter(name='tv_admin').exists()
-
 
-class FilteredTelevisionListView(ListView):
+class FilteredTelevisionListView(ReadReplicaMixin, ConditionalGetMixin, AnonymousPageCacheMixin,
+                                 KeysetPaginationMixin, ListView):
     model = Television
     template_name = 'tv_list_filter.html'
     context_object_name = 'televisions'
+    sort_options = TV_SORT_OPTIONS
+    default_sort = 'price'
+
+    def get_validators(self):
+        return listing_validators(Television)
 
     def get_queryset(self):
-        queryset = Television.objects.all()  # Základní queryset se všemi televizemi
+        queryset = Television.objects.for_listing()  # Základní queryset se všemi televizemi
 
         smart_tv = self.kwargs.get('smart_tv')
         if smart_tv == 'smart':
@@ -216,55 +264,92 @@ def signup(request):
     return render(request, 'signup.html', {'form': form})
 
 
-class MobileListView(ListView):
+class SearchView(ReadReplicaMixin, TemplateView):
+    template_name = 'search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        context['query'] = query
+        # Fulltextový index (FTS5) místo icontains přes celé tabulky
+        context['results'] = search_products(query) if query else []
+        return context
+
+
+class MobileListView(ReadReplicaMixin, ConditionalGetMixin, AnonymousPageCacheMixin, KeysetPaginationMixin, ListView):
     template_name = 'mobile_list.html'
     model = MobilePhone
+    queryset = MobilePhone.objects.for_listing()
     context_object_name = 'object_list'
+    sort_options = MOBILE_SORT_OPTIONS
+    default_sort = 'price'
 
+    def get_validators(self):
+        return listing_validators(MobilePhone)
 
-class AddToCartView(LoginRequiredMixin, View):
-    def get(self, request, television_id):
-        """Získáme televizi podle ID"""
-        television = get_object_or_404(Television, id=television_id)
 
-        """Inicializujeme košík, pokud ještě neexistuje"""
-        cart = request.session.get('cart', {})
+class CategoryProductsView(ReadReplicaMixin, ConditionalGetMixin, AnonymousPageCacheMixin,
+                           KeysetPaginationMixin, ListView):
+    template_name = 'category_products.html'
+    context_object_name = 'products'
+    sort_options = PRODUCT_SORT_OPTIONS
+    default_sort = 'price'
 
-        """v teto casti to bez prevedeni na str nenavysovalo pocet v kosiku
-        protoze "V session (která je založena na JSON-u), klíče jsou obvykle řetězce..."""
-        if str(television_id) in cart:
-            cart[str(television_id)]['quantity'] += 1
-        else:
-            cart[television_id] = {'name': television.brand.brand_name,
-                                   'model': television.brand_model,
-                                   'price': str(television.price),
-                                   'quantity': 1}
+    def get_validators(self):
+        return listing_validators(Product)
 
-        # Uložíme košík do session
-        request.session['cart'] = cart
+    def get_queryset(self):
+        # Televize, mobily i dalsi typy v kategorii a jejich podkategoriich - jeden dotaz
+        # se strankovanim podle (cena, id)
+        self.category = get_object_or_404(Category, pk=self.kwargs['pk'])
+        return Product.objects.for_listing().in_category(self.category)
 
-        """Kontrola, zda přidáváme z košíku nebo ze stránky televize"""
-        if 'from_cart' in request.GET:
-            return redirect('view_cart')
-        else:
-            return redirect('tv_detail', pk=television_id)
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['category'] = self.category
+        # Drobeckova navigace a podkategorie ze stromu v cache
+        tree = context['category_tree'] = category_tree()
+        context['breadcrumbs'] = tree.breadcrumbs(self.category.pk)
+        node = tree.get(self.category.pk)
+        context['subcategories'] = node.children if node else []
+        return context
+
+
+def add_to_cart_redirect(request, product_type, product_id):
+    """Zpět do košíku, pokud se přidávalo z něj, jinak na stránku produktu"""
+    if 'from_cart' in request.GET:
+        return redirect('view_cart')
+    elif product_type == 'television':
+        return redirect('tv_detail', pk=product_id)
+    return redirect('mobile_list')
+
+
+class AddToCartView(LoginRequiredMixin, View):
+    product_type = 'television'
+
+    def get(self, request, product_id):
+        """Ověříme, že produkt existuje"""
+        model = PRODUCT_MODELS[self.product_type]
+        if not model.objects.filter(pk=product_id).exists():
+            raise Http404
+
+        """Do košíku v databázi přidáme kus jedním UPSERTem a zarezervujeme ho na skladě"""
+        try:
+            reserve_item(get_cart_id(request, create=True), self.product_type, product_id)
+        except OutOfStock:
+            messages.error(request, OUT_OF_STOCK_MESSAGE)
+
+        return add_to_cart_redirect(request, self.product_type, product_id)
 
 
 class RemoveFromCartView(LoginRequiredMixin, View):
-    def post(self, request, television_id):
-        """Získání košíku ze session"""
-        cart = request.session.get('cart', {})
-
-        """Pokud existuje položka v košíku, snižte její množství"""
-        if str(television_id) in cart:
-            if cart[str(television_id)]['quantity'] > 1:
-                cart[str(television_id)]['quantity'] -= 1
-            else:
-                """Pokud je množství 1, odstraňte položku z košíku"""
-                del cart[str(television_id)]
-
-        """Uložíme košík do session"""
-        request.session['cart'] = cart
+    product_type = 'television'
+
+    def post(self, request, product_id):
+        """Pokud existuje položka v košíku, snižte její množství (poslední kus ji odstraní)"""
+        cart_id = get_cart_id(request)
+        if cart_id is not None:
+            release_item(cart_id, self.product_type, product_id)
         return redirect('view_cart')
 
 
@@ -272,15 +357,15 @@ class CartView(LoginRequiredMixin, View):
     template_name = 'order/cart.html'
 
     def get(self, request):
-        """Získání košíku ze session"""
-        cart = request.session.get('cart', {})
+        """Získání košíku z databáze podle id v session"""
+        cart_id = get_cart_id(request)
 
-        """Výpočet celkové ceny a počtu položek"""
-        total_price = sum(float(item['price']) * int(item['quantity']) for item in cart.values())
-        total_items = sum(int(item['quantity']) for item in cart.values())
+        """Výpočet celkové ceny a počtu položek (v databázi, v Decimal)"""
+        items = cart_items(cart_id) if cart_id is not None else []
+        total_items, total_price = cart_totals(cart_id) if cart_id is not None else (0, 0)
 
         return render(request, self.template_name, {
-            'cart': cart,
+            'items': items,
             'total_price': total_price,
             'total_items': total_items,
         })
@@ -325,21 +410,19 @@ class CheckoutView(LoginRequiredMixin, FormView):
         self.order = form.save(commit=False)
         self.order.user = self.request.user  # Přiřaďte uživatele k objednávce
 
-        # Nejprve uložíme objednávku
-        self.order.save()
-
-        """ Zpracování položek z košíku """
-        cart = self.request.session.get('cart', {})
-        for television_id in cart:
-            television = Television.objects.get(id=television_id)
-            self.order.television.add(television)
-
-        """Nastavení stavu objednávky"""
-        self.order.status = 'submitted'
-        self.order.save()
+        """ Uložení objednávky i všech položek z košíku najednou v jedné transakci """
+        cart_id = get_cart_id(self.request)
+        try:
+            place_order(self.order, cart_lines(cart_id) if cart_id is not None else [], cart_id=cart_id)
+        except OutOfStock:
+            form.add_error(None, OUT_OF_STOCK_MESSAGE)
+            return self.form_invalid(form)
+        except ProductsUnavailable:
+            messages.error(self.request, PRODUCTS_UNAVAILABLE_MESSAGE)
+            return redirect('view_cart')
 
         """Vyčištění košíku"""
-        self.request.session['cart'] = {}
+        clear_cart(self.request)
 
         return super().form_valid(form)
 
@@ -364,9 +447,13 @@ class CreateOrderView(LoginRequiredMixin, CreateView):
         television = self.get_televison()
         order = form.save(commit=False)
         order.user = self.request.user
-        order.television = television
-        order.status = 'submitted'
-        order.save()
+        try:
+            place_order(order, [('television', television.pk, 1)])
+        except OutOfStock:
+            form.add_error(None, OUT_OF_STOCK_MESSAGE)
+            return self.form_invalid(form)
+        except ProductsUnavailable:  # televize smazana behem odesilani formulare
+            raise Http404
 
         """Po úspěšném uložení přesměrujeme na stránku úspěchu"""
         return redirect('order_success', order_id=order.order_id)
@@ -395,20 +482,43 @@ class OrderSuccessView(LoginRequiredMixin, DetailView):
         return order
 
 
-class OrderListView(LoginRequiredMixin, ListView):
+class OrderListView(ReadReplicaMixin, LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Order
     template_name = 'order/order_list.html'
     context_object_name = 'orders'
+    sort_options = {'-date': ('-order_date', '-id')}
+    default_sort = '-date'
+
+    def get_status(self):
+        status = self.request.GET.get('status')
+        return status if status in dict(Order.ORDER_STATUS_CHOICES) else None
 
     def get_queryset(self):
-        """Zobrazí pouze objednávky aktuálně přihlášeného uživatele"""
-        return Order.objects.filter(user=self.request.user)
+        """Zobrazí pouze objednávky aktuálně přihlášeného uživatele (cena je uložená v Order.total)"""
+        queryset = Order.objects.filter(user=self.request.user).only('order_id', 'order_date', 'status', 'total')
+
+        """Filtrování podle stavu - využije index (user, status, order_date)"""
+        status = self.get_status()
+        if status:
+            queryset = queryset.filter(status=status)
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['status_choices'] = Order.ORDER_STATUS_CHOICES
+        context['selected_status'] = self.get_status()
+        return context
 
 
-class OrderDetailView(LoginRequiredMixin, DetailView):
+class OrderDetailView(ReadReplicaMixin, LoginRequiredMixin, ConditionalGetMixin, DetailView):
     model = Order
     template_name = 'order/order_detail.html'
     context_object_name = 'order'
+    private_cache = True
+
+    def get_validators(self):
+        # Cizi objednavka validatory nedostane, 404 vrati get_object
+        return object_validators(Order.objects.filter(order_id=self.kwargs['order_id'], user=self.request.user))
 
     def get_object(self):
         """Získáme objednávku podle order_id předaného v URL"""
@@ -417,4 +527,57 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
         """Ověření, zda je uživatel vlastníkem objednávky"""
         if order.user != self.request.user:
             raise Http404("Nemáte oprávnění k zobrazení této objednávky.")
-        return order
\ No newline at end of file
+        return order
+
+
+def _gunzip_chunks(stored, chunk_size=64 * 1024):
+    with stored, gzip.open(stored) as feed:
+        yield from iter(lambda: feed.read(chunk_size), b'')
+
+
+class ProductFeedView(View):
+    """
+    CSV/XML feed celeho katalogu pro srovnavace cen. Posila se hotovy gzip soubor z uloziste
+    (klientum bez gzip se rozbaluje prubezne), takze pamet nezavisi na velikosti katalogu.
+    """
+
+    def get(self, request, feed_format):
+        if feed_format not in FEED_FORMATS:
+            raise Http404('Neznamy format feedu.')
+        stored = default_storage.open(ensure_feed(feed_format))
+        content_type = f'{FEED_FORMATS[feed_format]}; charset=utf-8'
+        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            response = FileResponse(stored, content_type=content_type, filename=f'products.{feed_format}')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = StreamingHttpResponse(_gunzip_chunks(stored), content_type=content_type)
+        patch_vary_headers(response, ['Accept-Encoding'])
+        patch_cache_control(response, public=True, max_age=settings.SHOP_FEED_MAX_AGE)
+        return response
+
+
+def serve_media(request, path, document_root=None):
+    """Media pri vyvoji (DEBUG) - obrazky s hashem v nazvu smi prohlizec cachovat navzdy."""
+    response = serve(request, path, document_root=document_root)
+    if HASHED_MEDIA_RE.search(path):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+class MetricsView(View):
+    """
+    Metriky vykonu po pohledech (viewer.instrumentation) v textovem formatu Prometheus. Jen s hlavickou
+    Authorization: Bearer <SHOP_METRICS_TOKEN>, pro prihlasenou obsluhu (is_staff) nebo pri DEBUG;
+    verejne jen s SHOP_METRICS_PUBLIC.
+    """
+
+    def has_access(self, request):
+        token = settings.SHOP_METRICS_TOKEN
+        if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return True
+        return settings.SHOP_METRICS_PUBLIC or settings.DEBUG or request.user.is_staff
+
+    def get(self, request):
+        if not self.has_access(request):
+            return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+        return HttpResponse(REGISTRY.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')